@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Benchmarks for the corpus, preprocessing and evaluation hot paths.
+
+Run with `make bench`, or `python -m benchmarks.bench --help` for the
+options. Every run is appended to a JSON history file and compared against
+the last run with the same parameters, so regressions show up between
+commits.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from collections import namedtuple
+
+import click
+import dulwich.repo
+from gensim.models import LdaModel
+
+from src import utils
+from src import synthetic
+from src.main import (Config, create_corpus, create_model,
+                      create_evaluation_distinctiveness,
+                      create_corpus_stats,
+                      create_evaluation_corpora_cosine,
+                      create_evaluation_perplexity)
+from src.objcache import cache_objects
+from src.results import ResultStore
+from src.corpora import GitCorpus, MultiTextCorpus, ChangesetCorpus
+from src.preprocessing import (split, remove_stops, tokenize, to_unicode,
+                               get_stops)
+
+import logging
+logger = logging.getLogger('mct.bench')
+
+# best wall time of `mct --help`, which must not pull in the modeling stack
+STARTUP_TARGET = 0.15
+
+
+def timed(fn, repeat):
+    """ Run `fn` `repeat` times, returning the best and mean wall times. """
+    times = list()
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        fn()
+        times.append(timeit.default_timer() - start)
+
+    return dict(best=min(times), mean=sum(times) / len(times), repeat=repeat)
+
+
+def consume(iterable):
+    for doc in iterable:
+        for _ in doc:
+            pass
+
+
+def startup():
+    """ Run `mct --help` in a fresh interpreter. """
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call([sys.executable, '-c',
+                               'import src; src.main()', '--help'],
+                              stdout=devnull)
+
+
+def make_config(repo, path, num_topics, passes):
+    Project = namedtuple('Project', 'name full_name url release commit')
+    head = repo.head()
+
+    config = Config()
+    config.path = path
+    config.repo = repo
+    config.project = Project('synthetic', 'Synthetic', '', '', head)
+    config.num_topics = num_topics
+    config.passes = passes
+    config.corpus_fname = path + 'synthetic-' + head[:8] + '-%s.mallet'
+    config.results = ResultStore(path + 'results.sqlite',
+                                 project='synthetic', commit=head)
+    config.model_fname = (path + 'synthetic-' + head[:8] + '-' +
+                          str(passes) + 'passes-' + str(config.alpha) +
+                          'alpha-' + str(num_topics) + 'topics-%s.lda')
+    return config
+
+
+def run_benchmarks(workdir, num_topics, passes, repeat, **kwargs):
+    results = dict()
+    repo = synthetic.generate(os.path.join(workdir, 'synthetic'), **kwargs)
+    head = repo[repo.head()]
+    text = ' '.join(repo[entry.sha].as_raw_string() for entry in
+                    repo.object_store.iter_tree_contents(head.tree))
+    tokens = tokenize(text)
+    words = list(split(tokens))
+
+    def bench(name, fn):
+        logger.info('Benchmarking %s' % name)
+        results[name] = timed(fn, repeat)
+
+    def cached_repo():
+        # a new cache every run, so hits only come from within the walk
+        cached = dulwich.repo.Repo(repo.path)
+        cache_objects(cached, 64 * 2 ** 20)
+        return cached
+
+    bench('main --help', startup)
+    bench('preprocessing.split', lambda: consume([split(tokens)]))
+    bench('preprocessing.remove_stops',
+          lambda: consume([remove_stops(words, get_stops())]))
+    bench('GitCorpus.preprocess',
+          lambda: consume([GitCorpus().preprocess(text)]))
+    bench('preprocessing.to_unicode', lambda: to_unicode(text))
+    bench('ChangesetCorpus.__iter__',
+          lambda: consume(ChangesetCorpus(repo, lazy_dict=True)))
+    bench('ChangesetCorpus.__iter__ (object cache)',
+          lambda: consume(ChangesetCorpus(cached_repo(), lazy_dict=True)))
+    bench('ChangesetCorpus.get_texts',
+          lambda: consume(ChangesetCorpus(repo, lazy_dict=True).get_texts()))
+    bench('MultiTextCorpus.get_texts',
+          lambda: consume(MultiTextCorpus(repo, lazy_dict=True).get_texts()))
+
+    config = make_config(repo, workdir + '/', num_topics, passes)
+    for Kind in [MultiTextCorpus, ChangesetCorpus]:
+        create_corpus(config, Kind)
+        create_model(config, Kind)
+
+    model = LdaModel.load(config.model_fname % ChangesetCorpus.__name__)
+    bench('utils.score',
+          lambda: utils.score(model, utils.kullback_leibler_divergence))
+    bench('create_evaluation_distinctiveness',
+          lambda: create_evaluation_distinctiveness(config,
+                                                         ChangesetCorpus))
+    bench('create_corpus_stats',
+          lambda: create_corpus_stats(config, ChangesetCorpus))
+    bench('create_evaluation_corpora_cosine',
+          lambda: create_evaluation_corpora_cosine(config,
+                                                        MultiTextCorpus,
+                                                        ChangesetCorpus))
+    bench('create_evaluation_perplexity',
+          lambda: create_evaluation_perplexity(config, ChangesetCorpus))
+
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD']).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(fname):
+    if not os.path.exists(fname):
+        return list()
+
+    with open(fname) as f:
+        return json.load(f)
+
+
+def compare(previous, current, tolerance):
+    """ Print each result next to the previous run, returning the names of
+    the benchmarks that got slower by more than `tolerance`.
+
+    """
+    regressions = list()
+    for name in sorted(current):
+        now = current[name]['best']
+        line = '%-36s %10.4fs' % (name, now)
+        if previous is not None and name in previous:
+            before = previous[name]['best']
+            ratio = now / before if before else float('inf')
+            line += ' %8.2fx' % ratio
+            if ratio > 1.0 + tolerance:
+                line += '  REGRESSION'
+                regressions.append(name)
+
+        print(line)
+
+    return regressions
+
+
+@click.command()
+@click.option('--commits', default=50, help="Commits in the synthetic repo")
+@click.option('--files', default=20, help="Files in the synthetic repo")
+@click.option('--max-lines', default=80, help="Most lines per synthetic file")
+@click.option('--merge-ratio', default=0.05)
+@click.option('--rename-ratio', default=0.01)
+@click.option('--num-topics', default=10)
+@click.option('--passes', default=1)
+@click.option('--repeat', default=3, help="Runs per benchmark, best is kept")
+@click.option('--history', default='benchmarks/history.json',
+              help="JSON file the results are appended to")
+@click.option('--tolerance', default=0.2,
+              help="Slowdown ratio over the last run reported as regression")
+@click.option('--verbose', is_flag=True)
+def bench(commits, files, max_lines, merge_ratio, rename_ratio, num_topics,
+          passes, repeat, history, tolerance, verbose):
+    """
+    Benchmarks the mct hot paths on a synthetic repository
+    """
+    logging.basicConfig(format='%(asctime)s : %(levelname)s : ' +
+                        '%(name)s : %(funcName)s : %(message)s')
+    logging.root.setLevel(level=logging.INFO if verbose else logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    repo_params = dict(commits=commits, files=files, max_lines=max_lines,
+                       merge_ratio=merge_ratio, rename_ratio=rename_ratio)
+    params = dict(repo_params, num_topics=num_topics, passes=passes,
+                  repeat=repeat)
+
+    workdir = tempfile.mkdtemp(prefix='mct-bench-')
+    try:
+        results = run_benchmarks(workdir, num_topics, passes, repeat,
+                                 **repo_params)
+    finally:
+        shutil.rmtree(workdir)
+
+    runs = load_history(history)
+    previous = None
+    for run in reversed(runs):
+        if run['params'] == params:
+            previous = run['results']
+            break
+
+    regressions = compare(previous, results, tolerance)
+    if results['main --help']['best'] > STARTUP_TARGET:
+        print('main --help took over the %.2fs startup target' %
+              STARTUP_TARGET)
+        regressions.append('main --help')
+
+    runs.append(dict(revision=git_revision(), timestamp=time.time(),
+                     params=params, results=results))
+    with open(history, 'w') as f:
+        json.dump(runs, f, indent=2, sort_keys=True)
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    bench()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Scaling curves for corpus building on synthetic histories.
+
+Generates (or reuses) one synthetic repository per history size and times a
+full `get_texts` pass of `ChangesetCorpus` and `MultiTextCorpus` over each,
+writing one CSV row per size and corpus kind.
+"""
+
+import csv
+import os
+import sys
+import timeit
+
+import click
+import dulwich.repo
+
+from src import synthetic
+from src.corpora import MultiTextCorpus, ChangesetCorpus
+
+import logging
+logger = logging.getLogger('mct.bench')
+
+
+def corpus_pass(repo, Kind):
+    corpus = Kind(repo, lazy_dict=True)
+    documents = 0
+    tokens = 0
+    start = timeit.default_timer()
+    for doc in corpus.get_texts():
+        documents += 1
+        tokens += sum(1 for _ in doc)
+
+    return timeit.default_timer() - start, documents, tokens
+
+
+@click.command()
+@click.option('--sizes', default='1000,10000,100000,1000000',
+              help="Comma separated history sizes, in commits")
+@click.option('--files-per-commit', default=0.1,
+              help="Files in the final snapshot per commit of history")
+@click.option('--repos', default='benchmarks/repos',
+              help="Directory the synthetic repositories are kept in")
+@click.option('--output', default='-', help="CSV file to write, - for stdout")
+def scaling(sizes, files_per_commit, repos, output):
+    """
+    Measures corpus building time against history size
+    """
+    logging.basicConfig(format='%(asctime)s : %(levelname)s : ' +
+                        '%(name)s : %(funcName)s : %(message)s')
+    logging.root.setLevel(level=logging.INFO)
+
+    out = sys.stdout if output == '-' else open(output, 'w')
+    w = csv.writer(out)
+    w.writerow(['commits', 'kind', 'seconds', 'documents', 'tokens'])
+
+    for size in [int(x) for x in sizes.split(',')]:
+        path = os.path.join(repos, 'synthetic-%d' % size)
+        if os.path.exists(path):
+            repo = dulwich.repo.Repo(path)
+        else:
+            files = max(10, int(size * files_per_commit))
+            repo = synthetic.generate(path, commits=size, files=files)
+
+        for Kind in [MultiTextCorpus, ChangesetCorpus]:
+            seconds, documents, tokens = corpus_pass(repo, Kind)
+            w.writerow([size, Kind.__name__, seconds, documents, tokens])
+            out.flush()
+
+    if out is not sys.stdout:
+        out.close()
+
+
+if __name__ == '__main__':
+    scaling()
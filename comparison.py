@@ -1,36 +1,43 @@
-from gensim.corpora import MalletCorpus, Dictionary
-import sys 
-
-def read_project_data(mtc,csc, fname): 
-    d1 = Dictionary.load(mtc + ".dict") 
-    d2 = Dictionary.load(csc + ".dict")
-    #d3 = Dictionary.load('data/postgresql-d4f8dde3-CommitLogCorpus.mallet.dict')
-    
-    MultiTextCorpus = MalletCorpus(mtc, d1) 
-    ChangesetCorpus = MalletCorpus(csc, d2)
-    #CommitLogCorpus = MalletCorpus('data/postgresql-d4f8dde3-CommitLogCorpus.mallet', d3)
-    
-    u1 = set(d1.values())
-    u2 = set(d2.values())
-    #u3 = set(d3.values())
-    
-    common = u1.intersection(u2)
-    uc_set = (len(u1),len(u2))
-
-    u1_uniq = u1.difference(common)
-    u2_uniq = u2.difference(common)
-    print(u1_uniq)
-    
-    fname = "common_words_comparison.txt"
+"""
+Compares the MultiTextCorpus and ChangesetCorpus vocabularies of one
+project, appending the summary to common_words_comparison.txt.
+
+    python comparison.py data/jodatime-b0fcbb95-MultiTextCorpus.mallet \
+        data/jodatime-b0fcbb95-ChangesetCorpus.mallet
+
+`mct <project> compare_vocab` compares every project and corpus kind.
+"""
+
+from collections import OrderedDict
+import os.path
+import sys
+
+from src.docindex import DocumentIndex
+from src.vocab import Vocabulary
+
+
+def read_project_data(mtc, csc, fname="common_words_comparison.txt"):
+    vocabulary = Vocabulary.from_corpora(OrderedDict([('mtc', mtc),
+                                                      ('csc', csc)]))
+    overlap = vocabulary.overlap()
+
+    print(vocabulary.unique('mtc'))
+
     with open(fname, 'a') as f:
-        parts = mtc.split("-")
+        parts = os.path.basename(mtc).split("-")
         f.write(str(parts[0]) + "\n")
-        f.write("length of MultiTextCorpus: " + str(len(MultiTextCorpus)) + "\n")
-        f.write("length of ChangesetCorpus: " + str(len(ChangesetCorpus)) + "\n" + "\n")
+        f.write("length of MultiTextCorpus: " +
+                str(len(DocumentIndex.open(mtc))) + "\n")
+        f.write("length of ChangesetCorpus: " +
+                str(len(DocumentIndex.open(csc))) + "\n" + "\n")
         f.write("(MTC,CSC)  in common" + "\n")
-        f.write(str(uc_set) + " " + str(len(common)))
+        f.write(str((overlap[0, 0], overlap[1, 1])) + " " +
+                str(overlap[0, 1]))
         f.write('\n' + '\n')
-        #f.write("note: the length of the multitext corpus and changeset corpus is off by 2. specifically ~ set([u'rapha', u'lalev']) these words occur in the snapshot & not the changeset.")
 
-read_project_data('data/jodatime-b0fcbb95-MultiTextCorpus.mallet','data/jodatime-b0fcbb95-ChangesetCorpus.mallet') 
 
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+
+    read_project_data(sys.argv[1], sys.argv[2])
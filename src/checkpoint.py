@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for checkpointing corpus builds and model training, so that a run that
+gets killed can pick up where it left off.
+
+A corpus build writes its documents in chunks to `<corpus>.checkpoint/`.
+Along with every chunk it saves what the chunk changed: the words it added
+to the dictionary, their document frequencies, and whatever else the
+caller needs to carry over. A checkpoint therefore costs the same late in
+a large build as early on, and resuming replays the chunks in order. The
+id of the last document written says where the history walk resumes.
+Training saves the model after every pass to `<model>.checkpoint/`. In
+both, a `progress` file written last, by rename, names the newest complete
+checkpoint.
+"""
+
+import cPickle as pickle
+import os
+import shutil
+
+import numpy
+from gensim import utils as gensim_utils
+from gensim.corpora import Dictionary
+from gensim.models import LdaModel
+
+from convergence import train_pass
+from docindex import DocumentIndex
+
+import logging
+logger = logging.getLogger('mct.checkpoint')
+
+
+class Checkpoint(object):
+    """
+    A directory of checkpoint files for building `fname`, tagged with `key`
+    (e.g. the commit and settings built with). Progress saved under a
+    different key is ignored.
+    """
+
+    def __init__(self, fname, key=None):
+        self.fname = fname
+        self.path = fname + '.checkpoint'
+        self.key = key
+
+    def load(self):
+        """ The last saved progress, or None to start from scratch. """
+        try:
+            with open(os.path.join(self.path, 'progress'), 'rb') as f:
+                progress = pickle.load(f)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return None
+
+        if progress.get('key') != self.key:
+            logger.warning('Ignoring checkpoint %s of %s' %
+                           (self.path, progress.get('key')))
+            return None
+
+        logger.info('Resuming from checkpoint %s' % self.path)
+        return progress
+
+    def save(self, progress):
+        progress = dict(progress, key=self.key)
+        fname = os.path.join(self.path, 'progress')
+        with open(fname + '.tmp', 'wb') as f:
+            pickle.dump(progress, f, pickle.HIGHEST_PROTOCOL)
+
+        os.rename(fname + '.tmp', fname)
+
+    def clear(self):
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+
+    def _file(self, name):
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        return os.path.join(self.path, name)
+
+
+class CorpusCheckpoint(Checkpoint):
+    """
+    Serializes a stream of (bag-of-words, metadata) pairs to a Mallet corpus
+    `every` documents at a time.
+    """
+
+    def __init__(self, fname, key=None, every=10000):
+        super(CorpusCheckpoint, self).__init__(fname, key)
+        self.every = every
+
+    def load(self):
+        """ The last saved progress with the dictionary rebuilt as 'id2word'
+        and the `state()` of every chunk, in order, as 'states'.
+
+        """
+        progress = super(CorpusCheckpoint, self).load()
+        if progress is None:
+            return None
+
+        id2word = Dictionary()
+        states = list()
+        for chunk in range(progress['chunks']):
+            with open(self._chunk(chunk, 'state'), 'rb') as f:
+                delta = pickle.load(f)
+
+            id2word.token2id.update(delta['tokens'])
+            for id_, df in delta['dfs'].iteritems():
+                id2word.dfs[id_] = id2word.dfs.get(id_, 0) + df
+            states.append(delta['state'])
+
+        (id2word.num_docs, id2word.num_pos,
+         id2word.num_nnz) = progress['counts']
+        return dict(progress, id2word=id2word, states=states)
+
+    def serialize(self, documents, id2word, progress=None, state=None):
+        """ Write `documents` to the corpus file, continuing the chunks of
+        `progress` if given. After every chunk, `state()` is saved with it,
+        and should return only what changed since its last call.
+
+        """
+        chunks = 0
+        self._documents = 0
+        if progress is not None:
+            chunks = progress['chunks']
+            self._documents = progress['documents']
+
+        # what the dictionary was at the last chunk
+        self._dfs = dict(id2word.dfs)
+        self._num_terms = len(id2word.token2id)
+
+        buf = list()
+        for doc, meta in documents:
+            buf.append((doc, meta))
+            if len(buf) >= self.every:
+                self._save_chunk(chunks, buf, id2word, state)
+                chunks += 1
+                buf = list()
+
+        if buf:
+            self._save_chunk(chunks, buf, id2word, state)
+            chunks += 1
+
+        self._join(chunks)
+
+    def _chunk(self, chunk, suffix):
+        return self._file('chunk-%06d.%s' % (chunk, suffix))
+
+    def _save_chunk(self, chunk, buf, id2word, state):
+        index = DocumentIndex.serialize(self._chunk(chunk, 'mallet'), buf,
+                                        id2word)
+        index.save(self._chunk(chunk, 'mallet.docs'))
+
+        tokens = dict((token, id_) for token, id_ in
+                      id2word.token2id.iteritems()
+                      if id_ >= self._num_terms)
+        dfs = dict((id_, df - self._dfs.get(id_, 0)) for id_, df in
+                   id2word.dfs.iteritems() if df != self._dfs.get(id_, 0))
+        self._dfs.update(id2word.dfs)
+        self._num_terms = len(id2word.token2id)
+        with open(self._chunk(chunk, 'state'), 'wb') as f:
+            pickle.dump(dict(tokens=tokens, dfs=dfs,
+                             state=state() if state is not None else None),
+                        f, pickle.HIGHEST_PROTOCOL)
+
+        self._documents += len(buf)
+        self.save(dict(chunks=chunk + 1,
+                       documents=self._documents,
+                       last=buf[-1][1][0],
+                       counts=(id2word.num_docs, id2word.num_pos,
+                               id2word.num_nnz)))
+
+    def _join(self, chunks):
+        """ Concatenate the chunks into the corpus file, its index and its
+        document index.
+
+        """
+        index = DocumentIndex([], [], [])
+        with open(self.fname + '.tmp', 'wb') as out:
+            for chunk in range(chunks):
+                index.extend(DocumentIndex.load(self._chunk(chunk,
+                                                            'mallet.docs')),
+                             out.tell())
+                with open(self._chunk(chunk, 'mallet'), 'rb') as f:
+                    shutil.copyfileobj(f, out)
+
+        gensim_utils.pickle([int(offset) for offset in index.offsets],
+                            self.fname + '.index')
+        os.rename(self.fname + '.tmp', self.fname)
+        index.save(self.fname + '.docs')
+        logger.info('Joined %d chunks of %d documents into %s' %
+                    (chunks, len(index), self.fname))
+
+
+class ModelCheckpoint(Checkpoint):
+    """
+    Trains an `LdaModel` one pass at a time, saving it after every pass.
+    """
+
+    def train(self, corpus, passes, convergence=None, **kwargs):
+        """ An `LdaModel` trained for `passes` over `corpus`, continuing from
+        the last saved pass if there is one. Training pass by pass updates
+        the model exactly as a single `passes`-pass run would.
+
+        With a `Convergence`, training stops early once it has converged,
+        and its curve is saved and restored along with the model.
+
+        """
+        progress = self.load()
+        if progress is not None:
+            model = LdaModel.load(os.path.join(self.path, progress['model']))
+            numpy.random.set_state(progress['random'])
+            done = progress['passes']
+            if convergence is not None:
+                convergence.curve = list(progress.get('curve') or [])
+        else:
+            model = LdaModel(id2word=kwargs.pop('id2word'), **kwargs)
+            done = 0
+
+        for pass_ in range(done, passes):
+            if convergence is not None and convergence.converged:
+                break
+
+            train_pass(model, corpus, pass_ == 0)
+            if convergence is not None:
+                convergence.update(model)
+
+            name = 'pass-%03d' % (pass_ + 1)
+            model.save(self._file(name))
+            self.save(dict(passes=pass_ + 1, model=name,
+                           random=numpy.random.get_state(),
+                           curve=convergence.curve
+                           if convergence is not None else None))
+            self._remove(progress)
+            progress = dict(model=name)
+
+        return model
+
+    def _remove(self, progress):
+        if progress is None:
+            return
+
+        for suffix in ('', '.state'):
+            fname = os.path.join(self.path, progress['model'] + suffix)
+            if os.path.exists(fname):
+                os.remove(fname)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for measuring topic coherence from document co-occurrence counts.
+
+Both measures only need how many documents contain each top word and each
+pair of top words. `Cooccurrence` counts those in one pass over a corpus,
+restricted to the union of the top words of every topic, by accumulating
+the product of sparse document-word indicator matrices chunk by chunk.
+"""
+
+import itertools
+import math
+
+import numpy
+import scipy.sparse
+
+import utils
+
+import logging
+logger = logging.getLogger('mct.coherence')
+
+
+class Cooccurrence(object):
+    """
+    Document frequencies of the words in `word_ids` and of their pairs,
+    counted over `corpus`.
+    """
+
+    def __init__(self, word_ids, corpus, chunksize=10000):
+        self.columns = dict((id_, i) for i, id_ in
+                            enumerate(sorted(set(word_ids))))
+        self.num_docs = 0
+
+        size = len(self.columns)
+        counts = scipy.sparse.csr_matrix((size, size), dtype=numpy.int64)
+        corpus = iter(corpus)
+        while True:
+            chunk = list(itertools.islice(corpus, chunksize))
+            if not chunk:
+                break
+
+            rows = list()
+            cols = list()
+            for row, doc in enumerate(chunk):
+                for id_, _ in doc:
+                    if id_ in self.columns:
+                        rows.append(row)
+                        cols.append(self.columns[id_])
+
+            docs = scipy.sparse.csr_matrix(
+                (numpy.ones(len(rows), dtype=numpy.int64), (rows, cols)),
+                shape=(len(chunk), size))
+            docs.data[:] = 1  # a document counts once per word
+            counts = counts + docs.T * docs
+            self.num_docs += len(chunk)
+
+        # the diagonal holds the document frequencies
+        self.counts = counts.tocsr()
+        self.df = self.counts.diagonal()
+        logger.info('Counted co-occurrences of %d words in %d documents' %
+                    (size, self.num_docs))
+
+    def doc_freq(self, id_):
+        return self.df[self.columns[id_]]
+
+    def co_doc_freq(self, a, b):
+        return self.counts[self.columns[a], self.columns[b]]
+
+    def umass(self, topic):
+        """ UMass coherence of `topic`, its word ids most probable first
+        (Mimno et al. 2011).
+
+        """
+        score = 0.0
+        for m in range(1, len(topic)):
+            for l in range(m):
+                df = self.doc_freq(topic[l])
+                if df == 0:
+                    continue
+
+                score += math.log((self.co_doc_freq(topic[m], topic[l]) + 1.0)
+                                  / df)
+
+        return score
+
+    def npmi(self, topic):
+        """ Mean normalized pointwise mutual information of the word pairs
+        of `topic` (Bouma 2009). Words never seen together score -1.
+
+        """
+        scores = list()
+        n = float(self.num_docs)
+        if not n:
+            return 0.0
+
+        for a, b in itertools.combinations(topic, 2):
+            p_ab = self.co_doc_freq(a, b) / n
+            if p_ab == 0:
+                scores.append(-1.0)
+            elif p_ab == 1:
+                scores.append(1.0)
+            else:
+                p_a = self.doc_freq(a) / n
+                p_b = self.doc_freq(b) / n
+                scores.append(math.log(p_ab / (p_a * p_b)) / -math.log(p_ab))
+
+        if not scores:
+            return 0.0
+
+        return sum(scores) / len(scores)
+
+
+def top_ids(model, topn=10):
+    """ The ids of the `topn` most probable words of every topic. """
+    return [[int(id_) for id_ in numpy.argsort(topic)[::-1][:topn]]
+            for _, topic in utils.norm_phi(model)]
+
+
+def coherence(model, corpus, topn=10):
+    """ UMass and NPMI scores of every topic of `model` over `corpus`. """
+    topics = top_ids(model, topn)
+    counts = Cooccurrence(itertools.chain.from_iterable(topics), corpus)
+    return ([counts.umass(topic) for topic in topics],
+            [counts.npmi(topic) for topic in topics])
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for a compact, read-only export of a trained topic model.
+
+`LdaModel.save` pickles the whole training state, float64 lambda and
+sufficient statistics included, and loading it reads all of that back. An
+export keeps only what evaluating and inferring need:
+
+    <fname>.json           header: num_topics, alpha, corpus hash, commit, ...
+    <fname>.phi.npy        normalized topic-word matrix, float32
+    <fname>.top-ids.npy    optional ids of the top words of every topic
+    <fname>.top-probs.npy  and their probabilities
+
+The matrices are memory-mapped on load, so opening an export costs a few
+file reads whatever the vocabulary size.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy
+from scipy.special import psi
+
+import logging
+logger = logging.getLogger('mct.compact')
+
+VERSION = 1
+
+GAMMA_THRESHOLD = 0.001
+
+
+class CompactModel(object):
+    """
+    A model exported by `CompactModel.export`, usable wherever the
+    evaluations, similarity index and server use an `LdaModel`: it has
+    `num_topics`, `alpha`, `id2word`, `show_topic`, `inference` and
+    `model[bow]`.
+    """
+
+    def __init__(self, header, phi, top_ids=None, top_probs=None,
+                 id2word=None):
+        self.header = header
+        self.phi = phi
+        self.top_ids = top_ids
+        self.top_probs = top_probs
+        self.num_topics = header['num_topics']
+        self.num_terms = header['num_terms']
+        self.alpha = numpy.asarray(header['alpha'])
+        self.iterations = header['iterations']
+        self._id2word = id2word
+        self._expElogbeta = None
+
+    @classmethod
+    def export(cls, model, fname, corpus_fname=None, commit=None, top_n=0):
+        """ Write `model` to `fname`, recording the corpus it was trained on
+        and the `commit` it was built from. With `top_n`, also store the
+        `top_n` most probable words of every topic.
+
+        """
+        lam = model.state.get_lambda()
+        totals = lam.sum(axis=1)
+        phi = (lam / totals[:, numpy.newaxis]).astype(numpy.float32)
+
+        header = dict(version=VERSION,
+                      num_topics=model.num_topics,
+                      num_terms=model.num_terms,
+                      alpha=[float(a) for a in model.alpha],
+                      iterations=model.iterations,
+                      topic_totals=[float(t) for t in totals],
+                      commit=commit,
+                      corpus=corpus_fname,
+                      corpus_sha1=None,
+                      dictionary=None,
+                      top_n=0)
+
+        if corpus_fname is not None:
+            header['corpus_sha1'] = file_sha1(corpus_fname)
+            if os.path.exists(corpus_fname + '.dict'):
+                header['dictionary'] = corpus_fname + '.dict'
+
+        save_array(fname + '.phi.npy', phi)
+        if top_n:
+            top_n = min(top_n, model.num_terms)
+            top_ids = numpy.argsort(-phi, axis=1)[:, :top_n].astype(
+                numpy.int32)
+            top_probs = phi[numpy.arange(model.num_topics)[:, numpy.newaxis],
+                            top_ids]
+            save_array(fname + '.top-ids.npy', top_ids)
+            save_array(fname + '.top-probs.npy', top_probs)
+            header['top_n'] = top_n
+
+        # header last, a .json on disk means the export is complete
+        with open(fname + '.json.tmp', 'w') as f:
+            json.dump(header, f, indent=2, sort_keys=True)
+
+        os.rename(fname + '.json.tmp', fname + '.json')
+        logger.info('Exported %d topics over %d terms to %s' %
+                    (model.num_topics, model.num_terms, fname))
+
+        return cls.load(fname, id2word=model.id2word)
+
+    @classmethod
+    def load(cls, fname, id2word=None):
+        with open(fname + '.json') as f:
+            header = json.load(f)
+
+        if header.get('version') != VERSION:
+            raise ValueError('export version %s, expected %s' %
+                             (header.get('version'), VERSION))
+
+        phi = numpy.load(fname + '.phi.npy', mmap_mode='r')
+        top_ids = top_probs = None
+        if header['top_n']:
+            top_ids = numpy.load(fname + '.top-ids.npy', mmap_mode='r')
+            top_probs = numpy.load(fname + '.top-probs.npy', mmap_mode='r')
+
+        return cls(header, phi, top_ids, top_probs, id2word)
+
+    @property
+    def id2word(self):
+        """ The dictionary, only read from disk when first asked for. """
+        if self._id2word is None and self.header['dictionary']:
+            from gensim.corpora import Dictionary
+            self._id2word = Dictionary.load(self.header['dictionary'])
+
+        return self._id2word
+
+    def get_lambda(self):
+        """ The unnormalized topic-word weights, recovered from phi and the
+        stored topic totals up to float32 precision.
+
+        """
+        totals = numpy.asarray(self.header['topic_totals'])
+        return self.phi * totals[:, numpy.newaxis]
+
+    @property
+    def expElogbeta(self):
+        if self._expElogbeta is None:
+            lam = self.get_lambda()
+            self._expElogbeta = numpy.exp(
+                psi(lam) - psi(lam.sum(axis=1))[:, numpy.newaxis])
+
+        return self._expElogbeta
+
+    def show_topic(self, topicid, topn=10):
+        """ (probability, word) pairs of the `topn` most probable words of
+        `topicid`, as `LdaModel.show_topic` gives them.
+
+        """
+        if self.top_ids is not None and topn <= self.header['top_n']:
+            best = zip(self.top_probs[topicid][:topn],
+                       self.top_ids[topicid][:topn])
+        else:
+            topic = self.phi[topicid]
+            best = [(topic[id_], id_)
+                    for id_ in numpy.argsort(topic)[::-1][:topn]]
+
+        return [(float(p), self.id2word[int(id_)]) for p, id_ in best]
+
+    def inference(self, chunk):
+        """ Estimate gamma for every document of `chunk`, with the same
+        variational updates as `LdaModel.inference`. Returns (gamma, None).
+
+        """
+        chunk = list(chunk)
+        gamma = numpy.random.gamma(100., 1. / 100.,
+                                   (len(chunk), self.num_topics))
+        for d, doc in enumerate(chunk):
+            ids = [id_ for id_, _ in doc]
+            cts = numpy.array([cnt for _, cnt in doc], dtype=numpy.float64)
+            gammad = gamma[d, :]
+            expElogthetad = numpy.exp(dirichlet_expectation(gammad))
+            expElogbetad = self.expElogbeta[:, ids]
+            phinorm = numpy.dot(expElogthetad, expElogbetad) + 1e-100
+
+            for _ in range(self.iterations):
+                lastgamma = gammad
+                gammad = self.alpha + expElogthetad * numpy.dot(
+                    cts / phinorm, expElogbetad.T)
+                expElogthetad = numpy.exp(dirichlet_expectation(gammad))
+                phinorm = numpy.dot(expElogthetad, expElogbetad) + 1e-100
+                if numpy.mean(abs(gammad - lastgamma)) < GAMMA_THRESHOLD:
+                    break
+
+            gamma[d, :] = gammad
+
+        return gamma, None
+
+    def __getitem__(self, bow, eps=0.01):
+        gamma, _ = self.inference([bow])
+        theta = gamma[0] / gamma[0].sum()
+        return [(topicid, p) for topicid, p in enumerate(theta) if p >= eps]
+
+
+def dirichlet_expectation(alpha):
+    return psi(alpha) - psi(numpy.sum(alpha))
+
+
+def save_array(fname, array):
+    with open(fname + '.tmp', 'wb') as f:
+        numpy.save(f, array)
+
+    os.rename(fname + '.tmp', fname)
+
+
+def file_sha1(fname, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(fname, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for training LDA models until they converge instead of for a fixed
+number of passes.
+
+A small sample of the documents is held out of training. After every pass
+the per-word bound of the model on that sample is computed, and training
+stops once held-out perplexity improves by less than `tolerance` (a
+fraction) from one pass to the next. The sample is drawn with a fixed seed,
+so every pass, and every rerun, is measured on the same documents.
+"""
+
+import csv
+import random
+
+from gensim.models import LdaModel
+
+import logging
+logger = logging.getLogger('mct.convergence')
+
+SAMPLE_FRACTION = 0.05
+SAMPLE_MOST = 1000
+
+
+def split(corpus, size=None, seed=0):
+    """ Split the `CorpusView` `corpus` into views of the training documents
+    and of `size` held-out documents, by default 5% of the corpus up to
+    1000 documents.
+
+    """
+    if size is None:
+        size = min(SAMPLE_MOST, max(1, int(SAMPLE_FRACTION * len(corpus))))
+
+    held_out = sorted(random.Random(seed).sample(xrange(len(corpus)), size))
+    chosen = set(held_out)
+    training = [p for p in xrange(len(corpus)) if p not in chosen]
+    return corpus.subset(training), corpus.subset(held_out)
+
+
+def train_pass(model, corpus, first):
+    """ Update `model` with one more pass over `corpus`, `first` telling
+    whether it is the first.
+
+    """
+    if not first:
+        # update() counts the corpus as new documents every call, which
+        # would change how each pass is blended in
+        model.state.numdocs -= len(corpus)
+
+    model.update(corpus, passes=1)
+
+
+class Convergence(object):
+    """
+    The held-out per-word bound after each training pass, on the
+    documents of `held_out`. Converged once at least `min_passes` passes
+    were made and the last one improved perplexity by less than
+    `tolerance`.
+    """
+
+    def __init__(self, held_out, tolerance=0.01, min_passes=2):
+        self.held_out = held_out
+        self.tolerance = tolerance
+        self.min_passes = min_passes
+        self.curve = list()
+
+    @property
+    def passes(self):
+        return len(self.curve)
+
+    @property
+    def improvement(self):
+        """ The relative drop in held-out perplexity of the last pass. """
+        if len(self.curve) < 2:
+            return None
+
+        before, after = [2.0 ** -bound for bound in self.curve[-2:]]
+        return (before - after) / before
+
+    @property
+    def converged(self):
+        return (self.passes >= self.min_passes and
+                self.improvement is not None and
+                self.improvement < self.tolerance)
+
+    def update(self, model):
+        """ Measure `model` after another pass, returning whether it has
+        converged.
+
+        """
+        self.curve.append(model.log_perplexity(self.held_out))
+        logger.info('Pass %d: held-out perplexity %.3f' %
+                    (self.passes, 2 ** -self.curve[-1]))
+        return self.converged
+
+    def train(self, corpus, passes, **kwargs):
+        """ An `LdaModel` trained on `corpus` until it converges, for at
+        most `passes` passes.
+
+        """
+        model = LdaModel(**kwargs)
+        for pass_ in range(passes):
+            train_pass(model, corpus, pass_ == 0)
+            if self.update(model):
+                break
+
+        logger.info('Trained for %d of at most %d passes' %
+                    (self.passes, passes))
+        return model
+
+    def save(self, fname):
+        with open(fname, 'w') as f:
+            w = csv.writer(f)
+            w.writerow(['pass', 'bound', 'perplexity', 'improvement'])
+            previous = None
+            for number, bound in enumerate(self.curve, 1):
+                perplexity = 2.0 ** -bound
+                improvement = ''
+                if previous is not None:
+                    improvement = (previous - perplexity) / previous
+                w.writerow([number, bound, perplexity, improvement])
+                previous = perplexity
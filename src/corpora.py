@@ -11,7 +11,9 @@
 Code for generating the corpora.
 """
 
+from array import array
 from StringIO import StringIO
+import random
 import re
 
 import gensim
@@ -19,16 +21,11 @@ import dulwich
 import dulwich.repo
 import dulwich.patch
 
-from preprocessing import tokenize, split, remove_stops, read_stops, to_unicode
+from preprocessing import tokenize, split, remove_stops, get_stops, to_unicode
 
 import logging
 logger = logging.getLogger('mct.corpora')
 
-STOPS = read_stops([
-    'data/english_stops.txt',
-    'data/java_reserved.txt',
-])
-
 
 class GitCorpus(gensim.interfaces.CorpusABC):
     """
@@ -46,7 +43,7 @@ class GitCorpus(gensim.interfaces.CorpusABC):
 
     def __init__(self, repo=None, ref='HEAD', remove_stops=True,
                  split=True, lower=True, min_len=3, max_len=40,
-                 lazy_dict=False):
+                 lazy_dict=False, history=None, pipeline=None, paths=None):
 
         logger.info('Creating %s corpus out of source files for commit %s' % (
             self.__class__.__name__, ref))
@@ -58,9 +55,13 @@ class GitCorpus(gensim.interfaces.CorpusABC):
         self.min_len = min_len
         self.max_len = max_len
         self.lazy_dict = lazy_dict
+        self.history = history  # a HistoryIndex of repo, if available
+        self.pipeline = pipeline  # a Pipeline to run get_texts stages on
+        self.paths = paths  # a PathFilter of the files to read, if scoped
 
         self.id2word = gensim.corpora.Dictionary()
         self.metadata = False
+        self.resume_after = None  # id of the last document already built
 
         # ensure ref is a str otherwise dulwich cries
         if type(ref) is unicode:
@@ -91,13 +92,46 @@ class GitCorpus(gensim.interfaces.CorpusABC):
             words = (word.lower() for word in words)
 
         if self.remove_stops:
-            words = remove_stops(words, STOPS)
+            words = remove_stops(words, get_stops())
 
         def include(word):
             return len(word) >= self.min_len and len(word) <= self.max_len
         words = (word for word in words if include(word))
         return words
 
+    def _walk_commits(self, reverse=False, messages=True):
+        """ Yield the commits reachable from HEAD, newest first, reading them
+        from the history index instead of the object store when there is one.
+
+        """
+        if self.history is not None:
+            commits = self.history.walk(messages=messages)
+            if reverse:
+                commits = reversed(list(commits))
+        else:
+            commits = (walk_entry.commit for walk_entry in
+                       self.repo.get_walker(reverse=reverse))
+
+        for commit in self._resume(commits, lambda c: c.id):
+            yield commit
+
+    def _tree_contents(self, tree):
+        """ The files of `tree`, without walking the directories outside
+        `paths`.
+
+        """
+        if self.paths is None:
+            return self.repo.object_store.iter_tree_contents(tree)
+
+        return self.paths.iter_tree_contents(self.repo.object_store, tree)
+
+    def _resume(self, items, key):
+        """ Skip `items` through the one whose `key` is `resume_after`. """
+        if self.resume_after is None:
+            return items
+
+        return skip_through(items, key, self.resume_after)
+
     def __iter__(self):
         """
         The function that defines a corpus.
@@ -109,10 +143,46 @@ class GitCorpus(gensim.interfaces.CorpusABC):
             if self.metadata:
                 meta = text[1]
                 text = text[0]
-                yield (self.id2word.doc2bow(text, allow_update=self.lazy_dict),
-                       meta)
+                yield self.bow(self.intern(text)), meta
             else:
-                yield self.id2word.doc2bow(text, allow_update=self.lazy_dict)
+                yield self.bow(self.intern(text))
+
+    def intern(self, words):
+        """ The word ids of `words`, as an `array('i')`. With `lazy_dict`,
+        unseen words are added to `id2word` first, in the order
+        `Dictionary.doc2bow` would give them ids. Otherwise they are dropped.
+
+        """
+        token2id = self.id2word.token2id
+        words = list(words)
+        if self.lazy_dict:
+            new = set(unicode(word) for word in words if word not in token2id)
+            for word in sorted(new):
+                token2id[word] = len(token2id)
+
+            return array('i', [token2id[word] for word in words])
+
+        return array('i', [token2id[word] for word in words
+                           if word in token2id])
+
+    def bow(self, ids):
+        """ The bag-of-words of the word `ids` of one document, counting it
+        in the statistics of `id2word` when building it lazily.
+
+        """
+        counts = dict()
+        for id_ in ids:
+            counts[id_] = counts.get(id_, 0) + 1
+
+        if self.lazy_dict:
+            dfs = self.id2word.dfs
+            self.id2word.num_docs += 1
+            self.id2word.num_pos += len(ids)
+            self.id2word.num_nnz += len(counts)
+            for id_ in counts:
+                dfs[id_] = dfs.get(id_, 0) + 1
+
+        return sorted(counts.items())
 
     def get_texts(self):
         """
@@ -131,11 +201,56 @@ class GitCorpus(gensim.interfaces.CorpusABC):
 
 
 class MultiTextCorpus(GitCorpus):
+    def _document_id(self, entry):
+        return entry.path
+
+    def _fetch(self, entry):
+        document = self.repo.object_store.get_raw(entry.sha)[1]
+        if dulwich.patch.is_binary(document):
+            document = None
+
+        return self._document_id(entry), document
+
+    def _tokenize(self, item):
+        fname, document = item
+        if document is None:
+            return fname, None
+
+        return fname, list(self.preprocess(document, [fname, self.ref]))
+
     def get_texts(self):
+        if self.pipeline is not None:
+            return self._get_pipelined_texts()
+
+        return self._get_texts()
+
+    def _entries(self):
+        return self._resume(self._tree_contents(self.ref_tree),
+                            lambda entry: entry.path)
+
+    def _get_pipelined_texts(self):
         length = 0
+        entries = self._entries()
 
-        for entry in self.repo.object_store.iter_tree_contents(self.ref_tree):
-            fname = entry.path
+        for fname, words in self.pipeline.run(self, entries,
+                                              ('fetch', '_fetch'),
+                                              ('tokenize', '_tokenize')):
+            if words is None:
+                continue
+
+            length += 1
+            if self.metadata:
+                yield words, (fname, u'en')
+            else:
+                yield words
+
+        self.length = length  # only reset after iteration is done.
+
+    def _get_texts(self):
+        length = 0
+
+        for entry in self._entries():
+            fname = self._document_id(entry)
             document = self.repo.object_store.get_raw(entry.sha)[1]
             if dulwich.patch.is_binary(document):
                 continue
@@ -151,7 +266,105 @@ class MultiTextCorpus(GitCorpus):
         self.length = length  # only reset after iteration is done.
 
 
+class SnapshotCorpus(MultiTextCorpus):
+    """
+    A corpus of the files of several snapshots of a repository, e.g. its
+    releases, where each document is a unique blob, named by its SHA.
+
+    A blob shared by several snapshots is read and tokenized only once.
+    After iterating, `snapshots` lists the (path, blob) pairs of every ref,
+    binary blobs included although they have no document. Blobs in `known`
+    are listed but not read at all, so a corpus can be extended with new
+    refs at the cost of only their changed files.
+    """
+
+    def __init__(self, repo=None, refs=(), known=None, **kwargs):
+        self.refs = [ref.encode('utf-8') if type(ref) is unicode else ref
+                     for ref in refs]
+        self.commits = dict()
+        if repo is not None:
+            self.commits = dict((ref, resolve_ref(repo, ref))
+                                for ref in self.refs)
+
+        self.known = set(known or ())
+        self.snapshots = dict()
+
+        ref = 'HEAD'
+        if self.refs:
+            ref = self.commits[self.refs[-1]]
+
+        super(SnapshotCorpus, self).__init__(repo, ref, **kwargs)
+
+    def _document_id(self, entry):
+        return entry.sha
+
+    def _entries(self):
+        return self._resume(self._new_blobs(), lambda entry: entry.sha)
+
+    def _new_blobs(self):
+        seen = set(self.known)
+        self.snapshots = dict()
+        for ref in self.refs:
+            tree = self.repo[self.commits[ref]].tree
+            listing = self.snapshots[ref] = list()
+            for entry in self._tree_contents(tree):
+                listing.append((entry.path, entry.sha))
+                if entry.sha not in seen:
+                    seen.add(entry.sha)
+                    yield entry
+
+
 class ChangesetCorpus(GitCorpus):
+    """
+    A corpus where each document is the set of diff lines of a commit.
+
+    Oversized commits (mass reformats, license header changes, ...) can be
+    bounded with the `max_*` options. When a limit is hit, the excess is
+    either cut off (`limit_strategy='truncate'`) or uniformly sampled
+    (`limit_strategy='sample'`, seeded per commit so rebuilds are stable).
+    Every such decision is recorded in `self.limits`, keyed by commit id.
+    """
+
+    def __init__(self, repo=None, ref='HEAD', max_file_lines=None,
+                 max_file_tokens=None, max_commit_files=None,
+                 max_commit_tokens=None, limit_strategy='truncate',
+                 **kwargs):
+
+        if limit_strategy not in ('truncate', 'sample'):
+            raise ValueError("limit_strategy must be 'truncate' or 'sample'")
+
+        self.max_file_lines = max_file_lines
+        self.max_file_tokens = max_file_tokens
+        self.max_commit_files = max_commit_files
+        self.max_commit_tokens = max_commit_tokens
+        self.limit_strategy = limit_strategy
+        self.limits = dict()
+
+        super(ChangesetCorpus, self).__init__(repo, ref, **kwargs)
+
+    def _limit(self, items, limit, commit, scope, target, decisions):
+        """ Bound the list `items` to at most `limit` entries, adding the
+        decision to `decisions` when anything had to be dropped.
+
+        """
+        if limit is None or len(items) <= limit:
+            return items
+
+        if self.limit_strategy == 'sample':
+            rng = random.Random(commit + target)
+            keep = sorted(rng.sample(xrange(len(items)), limit))
+            bounded = [items[i] for i in keep]
+        else:
+            bounded = items[:limit]
+
+        self._decide(decisions, commit, scope, target, limit, len(items))
+        return bounded
+
+    def _decide(self, decisions, commit, scope, target, kept, total):
+        logger.debug('%s %s limit hit for %s %s: kept %s of %s' % (
+            self.limit_strategy, scope, commit, target, kept, total))
+        decisions.append((scope, target, self.limit_strategy, kept, total))
+
     def _get_diff(self, changeset):
         """ Return a text representing a `git diff` for the files in the
         changeset.
@@ -164,53 +377,66 @@ class ChangesetCorpus(GitCorpus):
         return patch_file.getvalue()
 
     def _walk_changes(self, reverse=False):
-        """ Returns one file change at a time, not the entire diff.
+        """ Returns the file changes of one commit at a time, over all of its
+        parents, along with the list of limit decisions made for it.
+
+        The diffs themselves are not computed here, so that changes dropped
+        by `max_commit_files` never get diffed.
 
         """
 
-        for walk_entry in self.repo.get_walker(reverse=reverse):
-            commit = walk_entry.commit
+        for commit in self._walk_commits(reverse=reverse, messages=False):
+            decisions = list()
+            changes = self._commit_changes(commit, decisions)
+            if changes:
+                yield commit.id, changes, decisions
 
-            # initial revision, has no parent
-            if len(commit.parents) == 0:
-                for changes in dulwich.diff_tree.tree_changes(
-                        self.repo.object_store, None, commit.tree
-                ):
-                    diff = self._get_diff(changes)
-                    yield commit.id, None, diff
+    def _commit_changes(self, commit, decisions):
+        changes = list()
 
-            for parent in commit.parents:
-                # do I need to know the parent id?
+        # initial revision, has no parent
+        if len(commit.parents) == 0:
+            for change in self._tree_changes(commit, None):
+                changes.append((None, change))
 
-                for changes in dulwich.diff_tree.tree_changes(
-                    self.repo.object_store, self.repo[parent].tree, commit.tree
-                ):
-                    diff = self._get_diff(changes)
-                    yield commit.id, parent, diff
+        for parent in commit.parents:
+            # do I need to know the parent id?
 
-    def get_texts(self):
-        length = 0
-        unified = re.compile(r'^[+ -].*')
-        current = None
-        low = list()  # collecting the list of words
+            for change in self._tree_changes(commit, parent):
+                changes.append((parent, change))
 
-        for commit, parent, diff in self._walk_changes():
-            # write out once all diff lines for commit have been collected
-            # this is over all parents and all files of the commit
-            if current is None:
-                # set current for the first commit, clear low
-                current = commit
-                low = list()
-            elif current != commit:
-                # new commit seen, yield the collected low
-                if self.metadata:
-                    yield low, (current, u'en')
-                else:
-                    yield low
+        return self._limit(changes, self.max_commit_files,
+                           commit.id, 'commit_files', '', decisions)
 
-                length += 1
-                current = commit
-                low = list()
+    def _tree_changes(self, commit, parent):
+        if self.history is not None:
+            changes = self.history.tree_changes(commit.id, parent)
+            if self.paths is not None:
+                # the index has every path, but only selected ones get diffed
+                changes = self.paths.select_changes(changes)
+
+            return changes
+
+        parent_tree = None
+        if parent is not None:
+            parent_tree = self.repo[parent].tree
+
+        if self.paths is not None:
+            return self.paths.tree_changes(self.repo.object_store,
+                                           parent_tree, commit.tree)
+
+        return dulwich.diff_tree.tree_changes(self.repo.object_store,
+                                              parent_tree, commit.tree)
+
+    def _diff_documents(self, commit, changes, decisions):
+        """ Yield the changed lines of each file change as one document, with
+        the info used for logging and the path it came from.
+
+        """
+        unified = re.compile(r'^[+ -].*')
+
+        for parent, change in changes:
+            diff = self._get_diff(change)
 
             # to process out whitespace only changes, the rest of this
             # loop will need to be structured differently. possibly need
@@ -229,30 +455,145 @@ class ChangesetCorpus(GitCorpus):
             # commit_fn = diff_lines[1][4:]
 
             lines = diff_lines[2:]  # chop off file names hashtag rebel
+            lines = self._limit(lines, self.max_file_lines, commit,
+                                'file_lines', diff_lines[1][4:], decisions)
             lines = [line[1:] for line in lines]  # remove unified markers
             document = ' '.join(lines)
 
+            yield (document, [commit, str(parent), diff_lines[0]],
+                   diff_lines[1][4:])
+
+    def _collect_words(self, commit, documents, decisions):
+        """ Tokenize the documents of one commit into a single list of words,
+        applying the token limits.
+
+        """
+        low = list()  # collecting the list of words
+        seen = 0  # tokens seen for this commit
+        truncated = False  # whether tokens or files were left unread
+        rng = random.Random(commit)
+
+        for document, info, target in documents:
+            # once truncated, the rest of the commit is not worth diffing
+            if (self.max_commit_tokens is not None and
+                    self.limit_strategy == 'truncate' and
+                    seen >= self.max_commit_tokens):
+                truncated = True
+                break
+
             # call the tokenizer
-            words = self.preprocess(document,
-                                    [commit, str(parent), diff_lines[0]])
-            low.extend(words)
-
-        length += 1
-        if self.metadata:
-            # have reached the end, yield whatever was collected last
-            yield low, (current, u'en')
+            words = self.preprocess(document, info)
+
+            if self.max_file_tokens is not None:
+                words = self._limit(list(words), self.max_file_tokens,
+                                    commit, 'file_tokens', target, decisions)
+
+            for word in words:
+                seen += 1
+                if (self.max_commit_tokens is None or
+                        len(low) < self.max_commit_tokens):
+                    low.append(word)
+                elif self.limit_strategy == 'sample':
+                    # reservoir sampling keeps a uniform sample of the commit
+                    i = rng.randint(0, seen - 1)
+                    if i < self.max_commit_tokens:
+                        low[i] = word
+                else:
+                    truncated = True
+                    break
+
+        if truncated or (self.max_commit_tokens is not None and
+                         seen > self.max_commit_tokens):
+            # truncation stops reading early, so the real total is unknown
+            if self.limit_strategy == 'truncate':
+                seen = None
+
+            self._decide(decisions, commit, 'commit_tokens', '',
+                         len(low), seen)
+
+        return low
+
+    def commit_words(self, commit_id):
+        """ The words of the changeset of a single commit. """
+        commit = self.repo[commit_id]
+        decisions = list()
+        changes = self._commit_changes(commit, decisions)
+        documents = self._diff_documents(commit.id, changes, decisions)
+        return self._collect_words(commit.id, documents, decisions)
+
+    def _fetch(self, item):
+        commit, changes, decisions = item
+        documents = list(self._diff_documents(commit, changes, decisions))
+        return commit, documents, decisions
+
+    def _tokenize(self, item):
+        commit, documents, decisions = item
+        low = self._collect_words(commit, documents, decisions)
+        return commit, low, decisions
+
+    def get_texts(self):
+        length = 0
+        self.limits = dict()
+
+        if self.pipeline is not None:
+            texts = self.pipeline.run(self, self._walk_changes(),
+                                      ('fetch', '_fetch'),
+                                      ('tokenize', '_tokenize'))
         else:
-            yield low
+            # diff lazily, so truncated commits skip the rest of their diffs
+            texts = (self._tokenize((commit, self._diff_documents(
+                commit, changes, decisions), decisions))
+                for commit, changes, decisions in self._walk_changes())
+
+        for commit, low, decisions in texts:
+            if decisions:
+                self.limits[commit] = decisions
+
+            length += 1
+            if self.metadata:
+                yield low, (commit, u'en')
+            else:
+                yield low
 
         self.length = length  # only reset after iteration is done.
 
 
 class CommitLogCorpus(GitCorpus):
+    def commit_words(self, commit_id):
+        """ The words of the message of a single commit. """
+        commit = self.repo[commit_id]
+        return list(self.preprocess(commit.message, [commit.id]))
+
+    def _tokenize(self, item):
+        commit_id, message = item
+        return commit_id, list(self.preprocess(message, [commit_id]))
+
     def get_texts(self):
+        if self.pipeline is not None:
+            return self._get_pipelined_texts()
+
+        return self._get_texts()
+
+    def _get_pipelined_texts(self):
+        length = 0
+
+        messages = ((commit.id, commit.message)
+                    for commit in self._walk_commits())
+
+        for commit_id, words in self.pipeline.run(self, messages,
+                                                  ('tokenize', '_tokenize')):
+            length += 1
+            if self.metadata:
+                yield words, (commit_id, u'en')
+            else:
+                yield words
+
+        self.length = length  # only reset after iteration is done.
+
+    def _get_texts(self):
         length = 0
 
-        for walk_entry in self.repo.get_walker():
-            commit = walk_entry.commit
+        for commit in self._walk_commits():
             words = self.preprocess(commit.message, [commit.id])
 
             length += 1
@@ -263,3 +604,28 @@ class CommitLogCorpus(GitCorpus):
                 yield words
 
         self.length = length  # only reset after iteration is done.
+
+
+def resolve_ref(repo, ref):
+    """ The commit SHA a branch, tag or SHA names in `repo`. """
+    for name in (ref, 'refs/tags/' + ref, 'refs/heads/' + ref):
+        if name in repo.refs:
+            return repo.get_peeled(name)
+
+    if ref in repo.object_store:
+        return repo.object_store.peel_sha(ref).id
+
+    raise KeyError('unknown ref %s' % ref)
+
+
+def skip_through(items, key, last):
+    """ Yield the `items` after the one whose `key` is `last`. """
+    items = iter(items)
+    for item in items:
+        if key(item) == last:
+            break
+    else:
+        logger.warning('Could not find %s to resume after' % last)
+
+    for item in items:
+        yield item
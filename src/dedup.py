@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for dropping near-duplicate documents while a corpus is built.
+
+Cherry-picks, backports and reverts make near-identical changesets, and
+copied files near-identical file documents. Every document gets a MinHash
+signature of its set of word ids; signatures are cut into bands, and only
+documents sharing a band are compared. A document whose estimated Jaccard
+similarity to an earlier kept document reaches the threshold is dropped
+and recorded as a duplicate of it.
+"""
+
+import numpy
+
+import logging
+logger = logging.getLogger('mct.dedup')
+
+PRIME = (1 << 31) - 1  # word ids and hash parameters stay below this
+
+
+class Deduplicator(object):
+    """
+    Wraps a corpus yielding (bag-of-words, metadata) pairs, passing through
+    only documents that are not near-duplicates of one already seen.
+
+    `duplicates` maps the id of every dropped document to the id of the
+    document it duplicates and their estimated similarity.
+    """
+
+    def __init__(self, corpus, threshold=0.9, num_perm=128, bands=None,
+                 seed=0):
+        self.corpus = corpus
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands or choose_bands(num_perm, threshold)
+        self.rows = num_perm // self.bands
+
+        rng = numpy.random.RandomState(seed)
+        self.a = rng.randint(1, PRIME, num_perm).astype(numpy.int64)
+        self.b = rng.randint(0, PRIME, num_perm).astype(numpy.int64)
+
+        self.signatures = dict()
+        self.buckets = [dict() for _ in range(self.bands)]
+        self.duplicates = dict()
+        self._added = list()  # since the last call to changes()
+        self._dropped = dict()
+
+    def __iter__(self):
+        for doc, meta in self.corpus:
+            if doc:
+                id_ = meta[0]
+                signature = self.signature([word_id for word_id, _ in doc])
+                match = self.match(signature)
+                if match is not None:
+                    self.duplicates[id_] = match
+                    self._dropped[id_] = match
+                    continue
+
+                self.add(id_, signature)
+
+            yield doc, meta
+
+        logger.info('Dropped %d near-duplicate documents' %
+                    len(self.duplicates))
+
+    def __len__(self):
+        return len(self.corpus)
+
+    def signature(self, word_ids):
+        ids = numpy.array(word_ids, dtype=numpy.int64)
+        hashes = (numpy.outer(self.a, ids) + self.b[:, numpy.newaxis]) % PRIME
+        return hashes.min(axis=1).astype(numpy.uint32)
+
+    def bands_of(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:
+                                  (band + 1) * self.rows].tostring()
+
+    def match(self, signature):
+        """ The (id, similarity) of the first kept document at least
+        `threshold` similar to `signature`, or None.
+
+        """
+        seen = set()
+        for band, key in self.bands_of(signature):
+            for id_ in self.buckets[band].get(key, ()):
+                if id_ in seen:
+                    continue
+
+                seen.add(id_)
+                similarity = float((self.signatures[id_] == signature).mean())
+                if similarity >= self.threshold:
+                    return id_, similarity
+
+        return None
+
+    def changes(self):
+        """ What was seen since the last call, so that a resumed build can
+        `restore` it without saving everything seen so far every time.
+
+        """
+        changes = dict(signatures=self._added, duplicates=self._dropped)
+        self._added = list()
+        self._dropped = dict()
+        return changes
+
+    def restore(self, changes):
+        """ Replay the `changes` of an interrupted build, in order. """
+        for change in changes:
+            for id_, signature in change['signatures']:
+                self.add(id_, signature)
+            self.duplicates.update(change['duplicates'])
+
+        self._added = list()
+        self._dropped = dict()
+
+    def add(self, id_, signature):
+        self.signatures[id_] = signature
+        self._added.append((id_, signature))
+        for band, key in self.bands_of(signature):
+            self.buckets[band].setdefault(key, list()).append(id_)
+
+
+def choose_bands(num_perm, threshold):
+    """ The number of bands, a divisor of `num_perm`, whose LSH threshold
+    (1/b)^(1/r) is closest to `threshold` without exceeding it, so pairs
+    at the threshold are likely to become candidates.
+
+    """
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+
+        if (1.0 / bands) ** (bands / float(num_perm)) <= threshold:
+            return bands
+
+    return num_perm
+
+
+def resolve(doc_topic, duplicates):
+    """ Give every duplicate in `duplicates` the entry of the document it
+    was collapsed onto in `doc_topic`.
+
+    """
+    for id_, (kept, _) in duplicates.items():
+        if kept in doc_topic:
+            doc_topic[id_] = doc_topic[kept]
+
+    return doc_topic
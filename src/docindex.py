@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for random access into serialized Mallet corpora.
+
+A `.mallet` file can only be read front to back, and even its length takes
+a pass over every line. The document index is a sidecar `<corpus>.docs`
+CSV with the byte offset, id (commit SHA, path or blob SHA) and token count
+of every document, in corpus order. With it a corpus knows its length,
+finds a document by id, and reads any subset of documents by seeking
+straight to them.
+"""
+
+import csv
+import os
+
+import numpy
+from gensim import utils as gensim_utils
+from gensim.corpora import MalletCorpus
+
+import logging
+logger = logging.getLogger('mct.docindex')
+
+
+class DocumentIndex(object):
+    """
+    The offsets, ids and token counts of the documents of a Mallet corpus.
+    Documents are referred to by their position in the corpus.
+    """
+
+    def __init__(self, offsets, ids, tokens):
+        self.offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        self.ids = ids
+        self.tokens = numpy.asarray(tokens, dtype=numpy.int64)
+        self._positions = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, id_):
+        """ The position of the document `id_`, raising KeyError if there is
+        no such document.
+
+        """
+        if self._positions is None:
+            self._positions = dict((i, p) for p, i in enumerate(self.ids))
+
+        return self._positions[id_]
+
+    def positions(self, ids):
+        """ The positions of those of `ids` in the corpus, in corpus order. """
+        found = list()
+        for id_ in ids:
+            try:
+                found.append(self.position(id_))
+            except KeyError:
+                pass
+
+        return sorted(set(found))
+
+    @classmethod
+    def open(cls, fname):
+        """ The index of the Mallet corpus `fname`, building it first if
+        it is missing or older than the corpus.
+
+        """
+        if (os.path.exists(fname + '.docs') and
+                os.path.getmtime(fname + '.docs') >=
+                os.path.getmtime(fname)):
+            return cls.load(fname + '.docs')
+
+        index = cls.build(fname)
+        index.save(fname + '.docs')
+        return index
+
+    @classmethod
+    def build(cls, fname):
+        """ Index the Mallet corpus `fname` in one pass over its lines. """
+        offsets = list()
+        ids = list()
+        tokens = list()
+        with open(fname, 'rb') as f:
+            offset = 0
+            for line in iter(f.readline, b''):
+                fields = [field for field in line.strip().split(b' ')
+                          if field]
+                offsets.append(offset)
+                ids.append(gensim_utils.to_unicode(fields[0]))
+                tokens.append(len(fields) - 2)
+                offset += len(line)
+
+        logger.info('Indexed %d documents of %s' % (len(ids), fname))
+        return cls(offsets, ids, tokens)
+
+    @classmethod
+    def serialize(cls, fname, documents, id2word):
+        """ Write the (document, metadata) pairs `documents` to the Mallet
+        corpus `fname` and its `.index` of offsets, like
+        `MalletCorpus.serialize`, and return their index, noted on the way
+        instead of read back from the file.
+
+        """
+        ids = list()
+        tokens = list()
+
+        def noted():
+            for doc, meta in documents:
+                ids.append(gensim_utils.to_unicode('%s' % meta[0]))
+                tokens.append(sum(int(count) for _, count in doc))
+                yield doc, meta
+
+        offsets = MalletCorpus.save_corpus(fname, noted(), id2word=id2word,
+                                           metadata=True)
+        gensim_utils.pickle(offsets, fname + '.index')
+        return cls(offsets, ids, tokens)
+
+    def extend(self, other, base):
+        """ Add the documents of `other`, whose offsets are relative to
+        `base`, after those of this index.
+
+        """
+        self.offsets = numpy.concatenate([self.offsets, other.offsets + base])
+        self.ids = self.ids + other.ids
+        self.tokens = numpy.concatenate([self.tokens, other.tokens])
+        self._positions = None
+
+    def save(self, fname):
+        with open(fname + '.tmp', 'w') as f:
+            w = csv.writer(f)
+            w.writerow(['offset', 'id', 'tokens'])
+            for offset, id_, tokens in zip(self.offsets, self.ids,
+                                           self.tokens):
+                w.writerow([offset, gensim_utils.to_utf8(id_), tokens])
+
+        os.rename(fname + '.tmp', fname)
+
+    @classmethod
+    def load(cls, fname):
+        offsets = list()
+        ids = list()
+        tokens = list()
+        with open(fname) as f:
+            reader = csv.reader(f)
+            next(reader)
+            for offset, id_, count in reader:
+                offsets.append(int(offset))
+                ids.append(gensim_utils.to_unicode(id_))
+                tokens.append(int(count))
+
+        return cls(offsets, ids, tokens)
+
+
+class CorpusView(object):
+    """
+    The documents of the Mallet corpus `fname` at `positions` (by default
+    all of them), in bag-of-words form for `id2word`. Documents are read by
+    offset, so a view only touches the lines it yields.
+
+    Like `MalletCorpus`, yields (document, (id, language)) pairs when
+    `metadata` is set.
+    """
+
+    def __init__(self, fname, id2word, index=None, positions=None):
+        self.fname = fname
+        self.id2word = id2word
+        self.index = index if index is not None else DocumentIndex.open(fname)
+        self.positions = positions
+        self.metadata = False
+
+    def __len__(self):
+        if self.positions is None:
+            return len(self.index)
+
+        return len(self.positions)
+
+    def __iter__(self):
+        with open(self.fname, 'rb') as f:
+            if self.positions is None:
+                for line in f:
+                    yield self.line2doc(line)
+            else:
+                for position in self.positions:
+                    f.seek(self.index.offsets[position])
+                    yield self.line2doc(f.readline())
+
+    def __getitem__(self, position):
+        with open(self.fname, 'rb') as f:
+            f.seek(self.index.offsets[position])
+            return self.line2doc(f.readline())
+
+    @property
+    def ids(self):
+        """ The ids of the documents of the view, in order. """
+        if self.positions is None:
+            return list(self.index.ids)
+
+        return [self.index.ids[position] for position in self.positions]
+
+    @property
+    def tokens(self):
+        """ The total number of tokens in the documents of the view. """
+        if self.positions is None:
+            return int(self.index.tokens.sum())
+
+        return int(self.index.tokens[list(self.positions)].sum())
+
+    def subset(self, positions):
+        """ A view of the documents at `positions` of this view. """
+        if self.positions is not None:
+            positions = [self.positions[p] for p in positions]
+
+        view = CorpusView(self.fname, self.id2word, self.index,
+                          list(positions))
+        view.metadata = self.metadata
+        return view
+
+    def select(self, ids):
+        """ A view of the documents named by `ids`, in corpus order,
+        leaving out ids the corpus does not have.
+
+        """
+        positions = self.index.positions(ids)
+        if self.positions is not None:
+            within = set(self.positions)
+            positions = [p for p in positions if p in within]
+
+        view = CorpusView(self.fname, self.id2word, self.index, positions)
+        view.metadata = self.metadata
+        return view
+
+    def line2doc(self, line):
+        """ Parse one Mallet line as `MalletCorpus.line2doc` does, words
+        counted in order of first appearance.
+
+        """
+        fields = [word for word in
+                  gensim_utils.to_unicode(line).strip().split(' ') if word]
+        token2id = self.id2word.token2id
+        counts = dict()
+        order = list()
+        for word in fields[2:]:
+            id_ = token2id.get(word)
+            if id_ is None:
+                continue
+
+            if id_ in counts:
+                counts[id_] += 1
+            else:
+                counts[id_] = 1
+                order.append(id_)
+
+        doc = [(id_, counts[id_]) for id_ in order]
+        if self.metadata:
+            return doc, (fields[0], fields[1])
+
+        return doc
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for a persistent index of the commit graph and its tree diffs.
+
+Walking the history means decompressing and parsing every commit, and
+diffing every (parent, commit) pair means decompressing their trees. The
+index stores the result of one such walk for a given HEAD, so later corpus
+builds only read the index and the blobs they actually diff.
+
+An index is two files in `<controldir>/mct-history/`, named after HEAD:
+
+    <head>.idx       marshalled header, commit list and changed paths
+    <head>.messages  commit messages back to back, located by offset
+"""
+
+import marshal
+import os
+from collections import namedtuple
+
+import dulwich.diff_tree
+from dulwich.diff_tree import TreeChange
+from dulwich.objects import TreeEntry
+
+import logging
+logger = logging.getLogger('mct.history')
+
+VERSION = 1
+
+IndexedCommit = namedtuple('IndexedCommit', 'id parents message')
+
+
+class HistoryIndex(object):
+    """
+    The commits reachable from `head`, in the same order as
+    `repo.get_walker()` yields them (newest first), with their parents,
+    message offsets, and the changed paths of every (parent, commit) pair.
+
+    Root commits are paired with a parent of None.
+    """
+
+    def __init__(self, fname, head, commits, changes):
+        self.fname = fname
+        self.head = head
+        self.commits = commits  # (id, parents, offset, length)
+        self.changes = changes  # (parent or '', id) => change tuples
+
+    def __len__(self):
+        return len(self.commits)
+
+    @classmethod
+    def open(cls, repo, path=None):
+        """ Load the index for the current HEAD of `repo`, building it first
+        if needed. Changed paths of pairs already in an index for an earlier
+        HEAD are reused rather than diffed again.
+
+        """
+        if path is None:
+            path = os.path.join(repo.controldir(), 'mct-history')
+
+        head = repo.head()
+        fname = os.path.join(path, head)
+        if os.path.exists(fname + '.idx'):
+            try:
+                return cls.load(fname)
+            except (ValueError, EOFError, TypeError) as e:
+                logger.warning('Rebuilding unreadable index %s: %s' %
+                               (fname, str(e)))
+
+        previous = cls.latest(path)
+        return cls.build(repo, fname, previous)
+
+    @classmethod
+    def load(cls, fname):
+        with open(fname + '.idx', 'rb') as f:
+            header = marshal.load(f)
+            if header.get('version') != VERSION:
+                raise ValueError('index version %s, expected %s' %
+                                 (header.get('version'), VERSION))
+
+            commits = marshal.load(f)
+            changes = marshal.load(f)
+
+        logger.info('Opened history index of %d commits at %s' %
+                    (len(commits), fname))
+        return cls(fname, header['head'], commits, changes)
+
+    @classmethod
+    def latest(cls, path):
+        """ The most recently written index under `path`, if any. """
+        if not os.path.isdir(path):
+            return None
+
+        fnames = [os.path.join(path, f[:-len('.idx')])
+                  for f in os.listdir(path) if f.endswith('.idx')]
+        for fname in sorted(fnames, key=lambda f: -os.path.getmtime(
+                f + '.idx')):
+            try:
+                return cls.load(fname)
+            except (ValueError, EOFError, TypeError):
+                continue
+
+        return None
+
+    @classmethod
+    def build(cls, repo, fname, previous=None):
+        logger.info('Building history index at %s' % fname)
+        path = os.path.dirname(fname)
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        reused = dict()
+        if previous is not None:
+            reused = previous.changes
+
+        commits = list()
+        changes = dict()
+        offset = 0
+        with open(fname + '.messages.tmp', 'wb') as messages:
+            for walk_entry in repo.get_walker():
+                commit = walk_entry.commit
+                messages.write(commit.message)
+                commits.append((commit.id, list(commit.parents), offset,
+                                len(commit.message)))
+                offset += len(commit.message)
+
+                for parent in commit.parents or [None]:
+                    key = (parent or '', commit.id)
+                    if key in reused:
+                        changes[key] = reused[key]
+                        continue
+
+                    parent_tree = None
+                    if parent is not None:
+                        parent_tree = repo[parent].tree
+
+                    changes[key] = [flatten(change) for change in
+                                    dulwich.diff_tree.tree_changes(
+                                        repo.object_store, parent_tree,
+                                        commit.tree)]
+
+        header = dict(version=VERSION, head=repo.head())
+        with open(fname + '.idx.tmp', 'wb') as f:
+            marshal.dump(header, f)
+            marshal.dump(commits, f)
+            marshal.dump(changes, f)
+
+        # messages first, an .idx on disk means the index is complete
+        os.rename(fname + '.messages.tmp', fname + '.messages')
+        os.rename(fname + '.idx.tmp', fname + '.idx')
+        return cls(fname, header['head'], commits, changes)
+
+    def walk(self, messages=False):
+        """ Yield an `IndexedCommit` per commit, in walker order. Messages
+        are only read from disk when asked for.
+
+        """
+        if not messages:
+            for id_, parents, _, _ in self.commits:
+                yield IndexedCommit(id_, parents, None)
+            return
+
+        with open(self.fname + '.messages', 'rb') as f:
+            for id_, parents, offset, length in self.commits:
+                f.seek(offset)
+                yield IndexedCommit(id_, parents, f.read(length))
+
+    def tree_changes(self, commit, parent=None):
+        """ The `TreeChange`s between `parent` (None for a root commit) and
+        `commit`, as `dulwich.diff_tree.tree_changes` would give them.
+
+        """
+        return [unflatten(change)
+                for change in self.changes[(parent or '', commit)]]
+
+
+def flatten(change):
+    return (change.type,
+            change.old.path, change.old.mode, change.old.sha,
+            change.new.path, change.new.mode, change.new.sha)
+
+
+def unflatten(change):
+    return TreeChange(change[0],
+                      TreeEntry(change[1], change[2], change[3]),
+                      TreeEntry(change[4], change[5], change[6]))
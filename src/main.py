@@ -8,20 +8,20 @@
 # See LICENSE for details.
 
 import csv
+import json
 import sys
 import os.path
 import random
-from collections import namedtuple
+import shutil
+import time
+from collections import namedtuple, OrderedDict
 
-import numpy
 import click
-import dulwich
-import dulwich.repo
-from gensim.corpora import MalletCorpus, Dictionary
-from gensim.models import LdaModel
 
+# numpy, gensim, dulwich and the modules built on them are imported by the
+# commands that use them, so --help and light commands start quickly
 import utils
-from corpora import MultiTextCorpus, ChangesetCorpus, CommitLogCorpus
+from profiling import Profiler
 
 
 import logging
@@ -29,18 +29,75 @@ import logging
 logger = logging.getLogger('mct')
 
 
-class Config:
+class Config(object):
     def __init__(self):
         self.path = './'
         self.project = None
-        self.repo = None
+        self.open_repo = None  # opens the repo of the project, set by main
+        self._repo = None
         self.corpus_fname = ''
         self.model_fname = ''
-        self.passes = 10
+        self.passes = 10  # the most passes, when training to convergence
+        self.tolerance = None  # or stop when perplexity improves less
+        self.min_passes = 2
         self.num_topics = 100
         self.alpha = 'symmetric'  # or can set a float
+        self.max_file_lines = None
+        self.max_file_tokens = None
+        self.max_commit_files = None
+        self.max_commit_tokens = None
+        self.limit_strategy = 'truncate'  # or 'sample'
+        self.profiler = Profiler()  # disabled unless --profile is given
+        self.use_history = True
+        self.history = None
+        self.pipeline = None  # extract corpora in a single thread
+        self.top_n = 20  # top words kept per topic in compact exports
+        self.dedup_threshold = None  # keep near-duplicate documents
+        self.dedup_perms = 128
+        self.checkpoint_every = 10000  # documents, 0 to build in one go
+        self.checkpoint_passes = True
+        self.results = None  # ResultStore of the project, set up by main
+        self.object_cache = None  # ObjectCache in front of the repo, if any
+        self.paths = None  # PathFilter of the files to model, None for all
         # set all possible config options here
 
+    @property
+    def repo(self):
+        """ The repository of the project, opened on first use, so commands
+        that only read built corpora run without a clone.
+
+        """
+        if self._repo is None and self.open_repo is not None:
+            self._repo = self.open_repo()
+
+        return self._repo
+
+
+def get_model_fname(config, kind='%s', passes=None, alpha=None,
+                    num_topics=None):
+    """ The model file name for the given settings, by default the ones of
+    `config`.
+
+    """
+    tolerance = None
+    if passes is None:
+        passes = config.passes
+        tolerance = config.tolerance
+    if alpha is None:
+        alpha = config.alpha
+    if num_topics is None:
+        num_topics = config.num_topics
+
+    return (config.path +
+            config.project.name + '-' +
+            config.project.commit[:8] + '-' +
+            get_scope(config.paths) +
+            str(passes) + 'passes-' +
+            ('%gtol-' % tolerance if tolerance is not None else '') +
+            str(alpha) + 'alpha-' +
+            str(num_topics) + 'topics-' +
+            kind + '.lda')
+
 
 def error(msg, errorno=1):
     logger.error(msg)
@@ -49,18 +106,91 @@ def error(msg, errorno=1):
 
 pass_config = click.make_pass_decorator(Config, ensure=True)
 
+KIND_NAMES = ['MultiTextCorpus', 'ChangesetCorpus', 'CommitLogCorpus']
+
+
+def read_projects():
+    """ Every project of projects.csv, as namedtuples of its columns. """
+    with open("projects.csv", 'r') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        Project = namedtuple('Project',  ' '.join(header))
+        return [Project(*row) for row in reader]
+
+
+def get_corpus_fname(path, project, paths=None):
+    """ The corpus file name of `project`, with a %s for the corpus kind. """
+    return (path + project.name + '-' + project.commit[:8] + '-' +
+            get_scope(paths) + '%s.mallet')
+
+
+def get_paths(project, include=(), exclude=()):
+    """ The PathFilter of the include and exclude patterns of `project`
+    plus the given ones, or None if there are none.
+
+    """
+    from paths import PathFilter
+
+    paths = PathFilter(project.include.split() + list(include),
+                       project.exclude.split() + list(exclude))
+    return paths or None
+
+
+def get_scope(paths):
+    """ The file name part telling corpora scoped by `paths` apart. """
+    if paths is None:
+        return ''
+
+    return 'paths-' + paths.key + '-'
+
+
+def get_kinds():
+    """ The corpus classes of the models built for every project. """
+    from corpora import MultiTextCorpus, ChangesetCorpus, CommitLogCorpus
+    return [MultiTextCorpus, ChangesetCorpus, CommitLogCorpus]
+
+
+def get_kind(name):
+    return dict((Kind.__name__, Kind) for Kind in get_kinds())[name]
+
 
 @click.group()
 @click.option('--num-topics', default=100)
+@click.option('--passes', default=10,
+              help="Training passes, the most passes with --tolerance")
+@click.option('--tolerance', type=float, default=None,
+              help="Stop training once a pass improves held-out perplexity "
+              "by less than this fraction")
+@click.option('--min-passes', default=2,
+              help="Fewest passes when training with --tolerance")
+@click.option('--alpha', default='symmetric',
+              help="Document-topic prior: symmetric, asymmetric, auto or a "
+              "number")
 @click.option('--verbose', is_flag=True)
+@click.option('--profile', is_flag=True,
+              help="Record per-stage metrics to a JSON file")
+@click.option('--profile-stage', default=None,
+              help="Also capture cProfile output for this stage")
 @click.option('--path', default='data/',
               help="Set the directory to work within")
+@click.option('--object-cache', default=64,
+              help="Megabytes of parsed git objects to keep, 0 to disable")
+@click.option('--include', multiple=True,
+              help="Only model paths matching this pattern, as well as those "
+              "in projects.csv")
+@click.option('--exclude', multiple=True,
+              help="Never read paths matching this pattern, as well as those "
+              "in projects.csv")
 @click.argument('project')
 @pass_config
-def main(config, verbose, path, project, num_topics):
+def main(config, verbose, profile, profile_stage, path, object_cache, include,
+         exclude, project, num_topics, passes, tolerance, min_passes, alpha):
     """
     Modeling Changeset Topics
     """
+    import dulwich.repo
+    from objcache import cache_objects
+    from results import ResultStore
 
     logging.basicConfig(format='%(asctime)s : %(levelname)s : ' +
                         '%(name)s : %(funcName)s : %(message)s')
@@ -77,60 +207,128 @@ def main(config, verbose, path, project, num_topics):
 
     utils.mkdir(config.path)
 
-    with open("projects.csv", 'r') as f:
-        reader = csv.reader(f)
-        header = next(reader)
-        Project = namedtuple('Project',  ' '.join(header))
+    # find the project in the csv, adding it's info to config
+    for row in read_projects():
+        if project == row.name:
+            # 🎶  do you believe in magicccccc
+            # in a young girl's heart? 🎶
+            config.project = row
+            break
 
-        # figure out which column index contains the project name
-        name_idx = header.index("name")
-
-        # find the project in the csv, adding it's info to config
-        for row in reader:
-            if project == row[name_idx]:
-                # 🎶  do you believe in magicccccc
-                # in a young girl's heart? 🎶
-                config.project = Project(*row)
-                break
-
-        # we can access project info by:
-        #    config.project.url => "http://..."
-        #    config.project.name => "Blah Name"
-
-        if config.project is None:
-            error("Could not find '%s' in 'projects.csv'!" % project)
-
-    config.corpus_fname = (config.path +
-                           config.project.name + '-' +
-                           config.project.commit[:8] + '-' +
-                           '%s.mallet')
-
-    config.model_fname = (config.path +
-                          config.project.name + '-' +
-                          config.project.commit[:8] + '-' +
-                          str(config.passes) + 'passes-' +
-                          str(config.alpha) + 'alpha-' +
-                          str(config.num_topics) + 'topics-' +
-                          '%s.lda')
+    # we can access project info by:
+    #    config.project.url => "http://..."
+    #    config.project.name => "Blah Name"
+
+    if config.project is None:
+        error("Could not find '%s' in 'projects.csv'!" % project)
+
+    config.paths = get_paths(config.project, include, exclude)
+    config.corpus_fname = get_corpus_fname(config.path, config.project,
+                                           config.paths)
 
     config.num_topics = num_topics
+    config.passes = passes
+    config.tolerance = tolerance
+    config.min_passes = min_passes
+    config.alpha = utils.parse_alpha(alpha)
+    config.model_fname = get_model_fname(config)
+
+    config.results = ResultStore(config.path + 'results.sqlite',
+                                 project=config.project.name,
+                                 commit=config.project.commit,
+                                 scope=config.paths.key
+                                 if config.paths is not None else None)
+    click.get_current_context().call_on_close(config.results.close)
+
+    if profile:
+        metrics_fname = (config.path +
+                         config.project.name + '-' +
+                         config.project.commit[:8] + '-' +
+                         'metrics-%d.json' % int(time.time()))
+        config.profiler = Profiler(enabled=True, fname=metrics_fname,
+                                   profile_stage=profile_stage,
+                                   info=dict(project=config.project.name,
+                                             commit=config.project.commit))
+        click.get_current_context().call_on_close(config.profiler.save)
 
     git_path = config.path + config.project.name
-    # open the repo
-    try:
-        config.repo = dulwich.repo.Repo(git_path)
-    except dulwich.errors.NotGitRepository:
-        error('Repository not cloned yet! Clone command: '
-              'git clone %s %s' % (config.project.url, git_path))
+    # the cache is not thread-safe, and serve answers from many threads
+    # without walking the history the cache is for
+    serving = click.get_current_context().invoked_subcommand == 'serve'
+
+    def open_repo():
+        try:
+            repo = dulwich.repo.Repo(git_path)
+        except dulwich.errors.NotGitRepository:
+            error('Repository not cloned yet! Clone command: '
+                  'git clone %s %s' % (config.project.url, git_path))
+
+        if object_cache and not serving:
+            config.object_cache = cache_objects(repo, object_cache * 2 ** 20)
+
+        return repo
+
+    config.open_repo = open_repo
 
 
 @main.command()
+@click.option('--max-file-lines', type=int, default=None,
+              help="Limit diff lines taken from each changed file")
+@click.option('--max-file-tokens', type=int, default=None,
+              help="Limit tokens taken from each changed file")
+@click.option('--max-commit-files', type=int, default=None,
+              help="Limit changed files taken from each commit")
+@click.option('--max-commit-tokens', type=int, default=None,
+              help="Limit tokens taken from each commit")
+@click.option('--limit-strategy', default='truncate',
+              type=click.Choice(['truncate', 'sample']),
+              help="How to bound changesets over a limit")
+@click.option('--history-index/--no-history-index', default=True,
+              help="Walk the history through a persistent index")
+@click.option('--fetch-workers', default=0,
+              help="Workers reading objects and diffing, 0 for inline")
+@click.option('--fetch-processes', is_flag=True,
+              help="Fetch with processes instead of threads")
+@click.option('--tokenize-workers', default=0,
+              help="Workers tokenizing documents, 0 for inline")
+@click.option('--tokenize-threads', is_flag=True,
+              help="Tokenize with threads instead of processes")
+@click.option('--queue-size', default=64,
+              help="Most documents in flight per pipeline stage")
+@click.option('--dedup-threshold', type=float, default=None,
+              help="Drop documents at least this Jaccard-similar to an "
+              "earlier one")
+@click.option('--dedup-perms', default=128,
+              help="MinHash permutations per document signature")
+@click.option('--checkpoint-every', default=10000,
+              help="Documents between checkpoints, 0 to disable")
 @pass_config
 @click.pass_context
-def corpora(context, config):
+def corpora(context, config, max_file_lines, max_file_tokens,
+            max_commit_files, max_commit_tokens, limit_strategy,
+            history_index, fetch_workers, fetch_processes, tokenize_workers,
+            tokenize_threads, queue_size, dedup_threshold, dedup_perms,
+            checkpoint_every):
     """
     Builds the basic corpora for a project
     """
+    from pipeline import Pipeline
+    from corpora import MultiTextCorpus, ChangesetCorpus, CommitLogCorpus
+
+    config.use_history = history_index
+    if fetch_workers > 0 or tokenize_workers > 0:
+        config.pipeline = Pipeline(fetch_workers, tokenize_workers,
+                                   fetch_processes=fetch_processes,
+                                   tokenize_processes=not tokenize_threads,
+                                   queue_size=queue_size)
+    config.max_file_lines = max_file_lines
+    config.max_file_tokens = max_file_tokens
+    config.max_commit_files = max_commit_files
+    config.max_commit_tokens = max_commit_tokens
+    config.limit_strategy = limit_strategy
+    config.dedup_threshold = dedup_threshold
+    config.dedup_perms = dedup_perms
+    config.checkpoint_every = checkpoint_every
 
     logger.info('Creating corpora for: %s' % config.project.name)
 
@@ -140,12 +338,17 @@ def corpora(context, config):
 
 
 @main.command()
+@click.option('--checkpoint/--no-checkpoint', default=True,
+              help="Save the model after every pass and resume from it")
 @pass_config
 @click.pass_context
-def model(context, config):
+def model(context, config, checkpoint):
     """
     Builds a model for the corpora
     """
+    from corpora import MultiTextCorpus, ChangesetCorpus, CommitLogCorpus
+
+    config.checkpoint_passes = checkpoint
     logger.info('Building topic models for: %s' % config.project.name)
 
     create_model(config, MultiTextCorpus)
@@ -153,6 +356,19 @@ def model(context, config):
     create_model(config, CommitLogCorpus)
 
 
+@main.command()
+@click.argument('refs', nargs=-1, required=True)
+@pass_config
+@click.pass_context
+def snapshots(context, config, refs):
+    """
+    Builds or extends the corpus of the files of several releases
+    """
+    logger.info('Creating snapshot corpus for: %s' % config.project.name)
+
+    create_snapshot_corpus(config, refs)
+
+
 @main.command()
 @pass_config
 @click.pass_context
@@ -160,6 +376,8 @@ def evaluate_distinctiveness(context, config):
     """
     Evalutates the models
     """
+    from corpora import MultiTextCorpus, ChangesetCorpus, CommitLogCorpus
+
     logger.info('Evalutating distinctiveness for: %s' % config.project.name)
 
     create_evaluation_distinctiveness(config, MultiTextCorpus)
@@ -167,15 +385,31 @@ def evaluate_distinctiveness(context, config):
     create_evaluation_distinctiveness(config, CommitLogCorpus)
 
 
+@main.command()
+@click.option('--top-n', default=10,
+              help="Top words per topic to score")
+@pass_config
+@click.pass_context
+def evaluate_coherence(context, config, top_n):
+    """
+    Evaluates the topic coherence of the models
+    """
+    from corpora import MultiTextCorpus, ChangesetCorpus, CommitLogCorpus
+
+    logger.info('Evalutating coherence for: %s' % config.project.name)
+
+    create_evaluation_coherence(config, MultiTextCorpus, top_n)
+    create_evaluation_coherence(config, ChangesetCorpus, top_n)
+    create_evaluation_coherence(config, CommitLogCorpus, top_n)
+
+
 @main.command()
 @pass_config
 @click.pass_context
 def evaluate_corpora(context, config):
-    logger.info('Evaluating corpus for: %s' % config.project.name)
+    from corpora import MultiTextCorpus, ChangesetCorpus
 
-    # create_evaluation_corpora(config, MultiTextCorpus)
-    # create_evaluation_corpora(config, ChangesetCorpus)
-    # create_evaluation_corpora(config, CommitLogCorpus)
+    logger.info('Evaluating corpus for: %s' % config.project.name)
 
     create_evaluation_corpora_cosine(config, MultiTextCorpus, ChangesetCorpus)
 
@@ -184,6 +418,8 @@ def evaluate_corpora(context, config):
 @pass_config
 @click.pass_context
 def evaluate_perplexity(context, config):
+    from corpora import MultiTextCorpus, ChangesetCorpus, CommitLogCorpus
+
     logger.info('Evalutating perplexity for: %s' % config.project.name)
 
     create_evaluation_perplexity(config, MultiTextCorpus)
@@ -195,6 +431,11 @@ def evaluate_perplexity(context, config):
 @pass_config
 @click.pass_context
 def evaluate_log(context, config):
+    from gensim.corpora import Dictionary
+    from corpora import ChangesetCorpus, CommitLogCorpus
+    from dedup import resolve
+    from docindex import CorpusView
+
     logger.info('Evalutating models for: %s' % config.project.name)
 
     model_fname = config.model_fname % ChangesetCorpus.__name__
@@ -203,22 +444,30 @@ def evaluate_log(context, config):
 
     try:
         commit_id2word = Dictionary.load(commit_fname + '.dict')
-        commit_corpus = MalletCorpus(commit_fname,
-                                     id2word=commit_id2word)
+        commit_corpus = CorpusView(commit_fname, commit_id2word)
         changeset_id2word = Dictionary.load(changeset_fname + '.dict')
-        changeset_corpus = MalletCorpus(changeset_fname,
-                                        id2word=changeset_id2word)
+        changeset_corpus = CorpusView(changeset_fname, changeset_id2word)
     except:
         error('Corpora not built yet -- cannot evaluate')
 
     try:
-        model = LdaModel.load(model_fname)
+        model = load_model(config, ChangesetCorpus)
         logger.info('Opened previously created model at file %s' % model_fname)
     except:
         error('Cannot evalutate LDA models not built yet!')
 
-    changeset_doc_topic = get_doc_topic(changeset_corpus, model)
-    commit_doc_topic = get_doc_topic(commit_corpus, model)
+    start = time.time()
+    with config.profiler.stage('evaluate_log', ChangesetCorpus.__name__):
+        commit_doc_topic = resolve(get_doc_topic(commit_corpus, model),
+                                   get_duplicates(config, CommitLogCorpus))
+
+        # only the changesets of commits with a message are compared
+        duplicates = get_duplicates(config, ChangesetCorpus)
+        wanted = [duplicates[id_][0] if id_ in duplicates else id_
+                  for id_ in commit_doc_topic]
+        changeset_doc_topic = resolve(
+            get_doc_topic(changeset_corpus.select(wanted), model),
+            duplicates)
 
     first_shared = dict()
     for id_ in commit_doc_topic:
@@ -250,9 +499,8 @@ def evaluate_log(context, config):
 
     mean = sum(first_shared.values()) / len(first_shared)
 
-    with open('data/evaluate-log-results.csv', 'a') as f:
-        w = csv.writer(f)
-        w.writerow([model_fname, mean] + list(first_shared.values()))
+    record(config, ChangesetCorpus.__name__, 'first_shared_topic', mean,
+           detail=first_shared.values(), seconds=time.time() - start)
 
 
 def get_doc_topic(corpus, model):
@@ -266,6 +514,380 @@ def get_doc_topic(corpus, model):
     return doc_topic
 
 
+@main.command()
+@click.argument('commit', required=False)
+@click.option('--text', default=None,
+              help="Find changesets similar to this text instead")
+@click.option('--top', default=10, help="Number of changesets to list")
+@click.option('--metric', default='hellinger',
+              type=click.Choice(utils.SIMILARITY_METRICS))
+@click.option('--approximate', is_flag=True,
+              help="Only compare the nearest random-projection candidates")
+@click.option('--bits', default=64,
+              help="Signature bits when building the approximate index")
+@pass_config
+@click.pass_context
+def similar(context, config, commit, text, top, metric, approximate, bits):
+    """
+    Lists the changesets topically closest to a commit or text
+    """
+    from corpora import GitCorpus, ChangesetCorpus
+
+    model_fname = config.model_fname % ChangesetCorpus.__name__
+    corpus_fname = config.corpus_fname % ChangesetCorpus.__name__
+
+    if commit is None and text is None:
+        error('Give a commit or --text to find similar changesets for')
+
+    try:
+        model = load_model(config, ChangesetCorpus)
+    except:
+        error('Cannot find similar changesets, LDA model not built yet!')
+
+    index = get_similarity_index(config, model, bits)
+
+    if text is not None:
+        bow = model.id2word.doc2bow(list(GitCorpus().preprocess(text)))
+        gamma, _ = model.inference([bow])
+        vector = gamma[0]
+    else:
+        duplicates = get_duplicates(config, ChangesetCorpus)
+        matches = [id_ for id_ in index.ids + duplicates.keys()
+                   if id_.startswith(commit)]
+        if len(matches) != 1:
+            error('Commit %s matches %d changesets' % (commit, len(matches)))
+
+        # a dropped duplicate is answered for the changeset it duplicates
+        commit = duplicates.get(matches[0], (matches[0],))[0]
+        vector = index.vector(commit)
+
+    start = time.time()
+    results = index.query(vector, k=top, metric=metric,
+                          approximate=approximate, exclude=commit)
+    logger.info('Queried %d changesets in %.2fms' % (
+        len(index), (time.time() - start) * 1000))
+
+    for id_, distance in results:
+        click.echo('%s %f' % (id_, distance))
+
+
+def get_similarity_index(config, model, bits=64):
+    """ Open the similarity index of the changeset model, building it from
+    the changeset corpus the first time.
+
+    """
+    from gensim.corpora import MalletCorpus, Dictionary
+    from corpora import ChangesetCorpus
+    from similar import SimilarityIndex
+
+    model_fname = config.model_fname % ChangesetCorpus.__name__
+    corpus_fname = config.corpus_fname % ChangesetCorpus.__name__
+    index_fname = model_fname + '.similar'
+
+    try:
+        return SimilarityIndex.load(index_fname)
+    except IOError:
+        pass  # not built yet, or by a version that kept less
+
+    try:
+        id2word = Dictionary.load(corpus_fname + '.dict')
+        corpus = MalletCorpus(corpus_fname, id2word=id2word, metadata=True)
+    except:
+        error('Corpora not built yet -- cannot build similarity index')
+
+    with config.profiler.stage('similarity_index', ChangesetCorpus.__name__):
+        index = SimilarityIndex.from_model(model, corpus, bits=bits)
+        index.save(index_fname)
+
+    return index
+
+
+@main.command()
+@click.option('--kind', default='ChangesetCorpus',
+              type=click.Choice(KIND_NAMES),
+              help="Which corpus model to serve")
+@click.option('--host', default='127.0.0.1')
+@click.option('--port', default=8642)
+@click.option('--batch-size', default=64,
+              help="Most documents inferred together")
+@click.option('--max-wait', default=5.0,
+              help="Milliseconds to wait for a batch to fill")
+@click.option('--top-words', default=10)
+@pass_config
+@click.pass_context
+def serve(context, config, kind, host, port, batch_size, max_wait,
+          top_words):
+    """
+    Serves topic queries from a model kept in memory
+    """
+    from server import TopicService, TopicServer
+
+    Kind = get_kind(kind)
+    model_fname = config.model_fname % Kind.__name__
+
+    try:
+        model = load_model(config, Kind)
+    except:
+        error('Cannot serve LDA models not built yet!')
+
+    corpus = Kind(config.repo, config.project.commit, lazy_dict=True,
+                  paths=config.paths)
+    service = TopicService(model, corpus, top_words=top_words,
+                           batch_size=batch_size, max_wait=max_wait / 1000.0)
+    server = TopicServer((host, port), service)
+
+    logger.info('Serving %s on http://%s:%d/topics' % (model_fname, host,
+                                                       server.server_port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@main.command()
+@click.option('--top-n', default=20,
+              help="Top words per topic to store alongside phi")
+@pass_config
+@click.pass_context
+def export(context, config, top_n):
+    """
+    Exports the models to the compact read-only format
+    """
+    from gensim.models import LdaModel
+    from compact import CompactModel
+
+    for Kind in get_kinds():
+        model_fname = config.model_fname % Kind.__name__
+        corpus_fname = config.corpus_fname % Kind.__name__
+
+        try:
+            model = LdaModel.load(model_fname)
+        except:
+            error('Cannot export LDA models not built yet!')
+
+        CompactModel.export(model, model_fname + '.compact',
+                            corpus_fname=corpus_fname,
+                            commit=config.project.commit, top_n=top_n)
+
+
+@main.command()
+@click.option('--metric', default=None, help="Only show this metric")
+@click.option('--kind', default=None, help="Only show this corpus kind")
+@click.option('--num-topics', type=int, default=None)
+@click.option('--all-commits', is_flag=True,
+              help="Include results for other commits of the project")
+@click.option('--all-projects', is_flag=True,
+              help="Include results for every project")
+@click.option('--csv', 'as_csv', is_flag=True, help="Print CSV for scripts")
+@pass_config
+@click.pass_context
+def results(context, config, metric, kind, num_topics, all_commits,
+            all_projects, as_csv):
+    """
+    Compares the recorded evaluation results across runs
+    """
+    from results import Summary
+
+    where = dict(metric=metric, kind=kind, num_topics=num_topics,
+                 scope=config.results.scope)
+    if not all_projects:
+        where['project'] = config.project.name
+        if not all_commits:
+            where['commit'] = config.project.commit
+
+    summaries = config.results.summarize(**where)
+    if as_csv:
+        w = csv.writer(sys.stdout)
+        w.writerow(Summary._fields)
+        for summary in summaries:
+            w.writerow(summary)
+        return
+
+    if not summaries:
+        click.echo('No results recorded yet')
+        return
+
+    click.echo('%-12s %-8s %-8s %-24s %6s %-10s %6s %6s %-24s %4s %12s %12s'
+               % ('project', 'commit', 'scope', 'kind', 'topics', 'alpha',
+                  'passes', 'tol', 'metric', 'runs', 'mean', 'last'))
+    for s in summaries:
+        click.echo('%-12s %-8s %-8s %-24s %6s %-10s %6s %6s %-24s %4d %12.4f '
+                   '%12.4f' %
+                   (s.project, s.commit[:8], s.scope or '', s.kind,
+                    '' if s.num_topics is None else s.num_topics,
+                    s.alpha or '', '' if s.passes is None else s.passes,
+                    '' if s.tolerance is None else '%g' % s.tolerance,
+                    s.metric, s.runs, s.mean, s.last))
+
+
+@main.command()
+@click.option('--kind', default='ChangesetCorpus',
+              type=click.Choice(KIND_NAMES),
+              help="Which corpus to sweep over")
+@click.option('--topics', default='25,50,100,200',
+              help="Comma-separated numbers of topics")
+@click.option('--alphas', default='symmetric',
+              help="Comma-separated alpha priors")
+@click.option('--passes', default='1,5,10',
+              help="Comma-separated numbers of passes")
+@click.option('--workers', default=1,
+              help="Configurations to train at once")
+@click.option('--held-out', default=0.1,
+              help="Fraction of documents held out for perplexity")
+@click.option('--seed', default=0)
+@click.option('--save-models', is_flag=True,
+              help="Also save every model of the sweep")
+@pass_config
+@click.pass_context
+def sweep(context, config, kind, topics, alphas, passes, workers, held_out,
+          seed, save_models):
+    """
+    Trains and evaluates models over a grid of settings
+    """
+    from gensim.corpora import Dictionary
+    from packed import PackedCorpus
+    from sweep import Sweep, SweepResult
+
+    Kind = get_kind(kind)
+    corpus_fname = config.corpus_fname % Kind.__name__
+
+    try:
+        id2word = Dictionary.load(corpus_fname + '.dict')
+        corpus = PackedCorpus.open(corpus_fname, id2word)
+    except:
+        error('Corpora not built yet -- cannot sweep')
+
+    fname = None
+    if save_models:
+        fname = get_model_fname(config, Kind.__name__, '%(passes)d',
+                                '%(alpha)s', '%(num_topics)d')
+
+    grid = Sweep([int(k) for k in topics.split(',')],
+                 [utils.parse_alpha(a) for a in alphas.split(',')],
+                 [int(p) for p in passes.split(',')],
+                 workers=workers, held_out=held_out, seed=seed,
+                 fname=fname)
+
+    results = list()
+    with config.profiler.stage('sweep', Kind.__name__) as stage:
+        stage.documents = len(corpus)
+        stage.tokens = corpus.tokens
+        for result in grid.run(corpus, id2word):
+            results.append(result)
+
+    results_fname = (config.path +
+                     config.project.name + '-' +
+                     config.project.commit[:8] + '-' +
+                     get_scope(config.paths) +
+                     Kind.__name__ + '-sweep.csv')
+    with open(results_fname, 'w') as f:
+        w = csv.writer(f)
+        w.writerow(SweepResult._fields)
+        for result in sorted(results, key=lambda r: (r.num_topics,
+                                                     str(r.alpha),
+                                                     r.passes)):
+            w.writerow(result)
+
+    logger.info('Wrote %d sweep results to %s' % (len(results),
+                                                  results_fname))
+
+    for result in results:
+        for metric in ['bound', 'perplexity', 'distinctiveness']:
+            config.results.record(Kind.__name__, 'sweep_' + metric,
+                                  getattr(result, metric),
+                                  num_topics=result.num_topics,
+                                  alpha=result.alpha, passes=result.passes,
+                                  seconds=result.seconds)
+
+
+@main.command()
+@click.option('--kind', default='ChangesetCorpus',
+              type=click.Choice(['ChangesetCorpus', 'CommitLogCorpus']),
+              help="Which commit corpus to cut into windows")
+@click.option('--days', type=int, default=None,
+              help="Days of history per window")
+@click.option('--commits', type=int, default=None,
+              help="Commits per window")
+@click.option('--warm-start/--no-warm-start', default=True,
+              help="Start each window model from the previous window's")
+@click.option('--workers', default=1,
+              help="Window models to train at once without warm starts")
+@pass_config
+@click.pass_context
+def windows(context, config, kind, days, commits, warm_start, workers):
+    """
+    Builds a topic model of every time window of the history
+    """
+    if (days is None) == (commits is None):
+        error('Give exactly one of --days or --commits')
+
+    Kind = get_kind(kind)
+    logger.info('Building window models for: %s' % config.project.name)
+
+    create_window_models(config, Kind, days, commits, warm_start, workers)
+
+
+@main.command()
+@click.option('--kinds', default=','.join(KIND_NAMES),
+              help="Comma-separated corpus kinds to compare")
+@click.option('--projects', default=None,
+              help="Comma-separated projects, all in projects.csv by default")
+@click.option('--workers', default=1,
+              help="Corpora to count at once")
+@pass_config
+@click.pass_context
+def compare_vocab(context, config, kinds, projects, workers):
+    """
+    Compares the vocabularies of projects and corpus kinds
+    """
+    kinds = kinds.split(',')
+    for kind in kinds:
+        if kind not in KIND_NAMES:
+            error('Unknown corpus kind: %s' % kind)
+
+    if projects is None:
+        projects = read_projects()
+    else:
+        names = projects.split(',')
+        projects = [p for p in read_projects() if p.name in names]
+        missing = set(names) - set(p.name for p in projects)
+        if missing:
+            error("Could not find '%s' in 'projects.csv'!" %
+                  "', '".join(sorted(missing)))
+
+    compare_vocabularies(config, projects, kinds, workers)
+
+
+@main.command()
+@click.option('--kind', 'kinds', multiple=True,
+              type=click.Choice(KIND_NAMES),
+              help="Corpus kind to describe, all built ones if not given")
+@click.option('--top-k', default=20,
+              help="Most and least frequent words to list")
+@pass_config
+@click.pass_context
+def corpus_stats(context, config, kinds, top_k):
+    """
+    Describes the vocabulary and document lengths of the corpora
+    """
+    if not kinds:
+        kinds = [kind for kind in KIND_NAMES
+                 if os.path.exists(config.corpus_fname % kind)]
+
+    for kind in kinds:
+        report = create_corpus_stats(config, get_kind(kind), top_k)
+        zipf = report['zipf'] or dict(exponent=float('nan'))
+        click.echo('%-16s %8d docs %10d tokens %8d words  median length %d  '
+                   'zipf %.2f' % (kind, report['documents'], report['tokens'],
+                                  report['vocabulary'],
+                                  report['median_length'] or 0,
+                                  zipf['exponent']))
+        click.echo('  top: %s' % ' '.join(word for word, _, _ in
+                                          report['top'][:10]))
+
+
 @main.command()
 @pass_config
 @click.pass_context
@@ -278,77 +900,563 @@ def run_all(context, config):
     context.forward(corpora)
     context.forward(model)
     context.forward(evaluate_distinctiveness)
+    context.forward(evaluate_coherence)
     context.forward(evaluate_corpora)
     context.forward(evaluate_perplexity)
     context.forward(evaluate_log)
 
 
 def create_corpus(config, Kind):
+    from corpora import MultiTextCorpus, ChangesetCorpus
+    from dedup import Deduplicator
+    from checkpoint import CorpusCheckpoint
+    from docindex import DocumentIndex
+
     corpus_fname = config.corpus_fname % Kind.__name__
 
     if not os.path.exists(corpus_fname):
-        corpus = Kind(config.repo, config.project.commit, lazy_dict=True)
+        kwargs = dict()
+        if Kind is ChangesetCorpus:
+            kwargs = dict(max_file_lines=config.max_file_lines,
+                          max_file_tokens=config.max_file_tokens,
+                          max_commit_files=config.max_commit_files,
+                          max_commit_tokens=config.max_commit_tokens,
+                          limit_strategy=config.limit_strategy)
+
+        # what changes the documents, so chunks checkpointed under other
+        # settings are never spliced in
+        settings = dict(kwargs, commit=config.project.commit,
+                        dedup_threshold=config.dedup_threshold,
+                        dedup_perms=config.dedup_perms)
+
+        if Kind is not MultiTextCorpus and config.use_history:
+            kwargs['history'] = get_history(config)
+
+        kwargs['pipeline'] = config.pipeline
+        kwargs['paths'] = config.paths
+
+        with config.profiler.stage('create_corpus', Kind.__name__) as stage:
+            reset_object_cache(config)
+            corpus = Kind(config.repo, config.project.commit, lazy_dict=True,
+                          **kwargs)
+            corpus.metadata = True
+            documents = config.profiler.count(
+                corpus, stage, metadata=True,
+                commits=Kind is not MultiTextCorpus)
+            dedup = None
+            if config.dedup_threshold is not None:
+                documents = dedup = Deduplicator(
+                    documents, threshold=config.dedup_threshold,
+                    num_perm=config.dedup_perms)
+
+            limits = dict()
+            if config.checkpoint_every:
+                checkpoint = CorpusCheckpoint(corpus_fname, key=settings,
+                                              every=config.checkpoint_every)
+                progress = checkpoint.load()
+                if progress is not None:
+                    corpus.id2word = progress['id2word']
+                    corpus.resume_after = progress['last']
+                    for state in progress['states']:
+                        limits.update(state['limits'])
+                    if dedup is not None:
+                        dedup.restore([state['dedup']
+                                       for state in progress['states']])
+
+                saved = set()
+
+                def state():
+                    # only what the last chunk added
+                    built = dict((commit, decisions) for commit, decisions
+                                 in getattr(corpus, 'limits', dict()).items()
+                                 if commit not in saved)
+                    saved.update(built)
+                    return dict(limits=built, dedup=dedup.changes()
+                                if dedup is not None else None)
+
+                checkpoint.serialize(documents, corpus.id2word, progress,
+                                     state)
+            else:
+                index = DocumentIndex.serialize(corpus_fname, documents,
+                                                corpus.id2word)
+                index.save(corpus_fname + '.docs')
+
+            corpus.metadata = False
+            corpus.id2word.save(corpus_fname + '.dict')
+            report_object_cache(config, stage)
+
+        limits.update(getattr(corpus, 'limits', dict()))
+        if limits:
+            write_limits(corpus_fname + '.limits', limits)
+
+        if dedup is not None:
+            write_duplicates(corpus_fname + '.dedup', dedup.duplicates)
+
+        if config.checkpoint_every:
+            checkpoint.clear()
+
+
+def create_snapshot_corpus(config, refs):
+    """ Add the snapshots at `refs` to the snapshot corpus, tokenizing only
+    the blobs no earlier snapshot had.
+
+    """
+    from gensim.corpora import Dictionary
+    from corpora import SnapshotCorpus, resolve_ref
+
+    corpus_fname = config.corpus_fname % SnapshotCorpus.__name__
+    finish_append(corpus_fname)
+    listings = read_snapshots(corpus_fname + '.snapshots')
+    try:
+        # a ref is snapshotted again once it names another commit
+        refs = [ref for ref in refs
+                if (ref, resolve_ref(config.repo, ref)) not in listings]
+    except KeyError as e:
+        error('Cannot build snapshots: %s' % str(e))
+
+    if not refs:
+        logger.info('All snapshots already in %s' % corpus_fname)
+        return
+
+    known = set(blob for listing in listings.values()
+                for _, _, blob in listing)
+
+    with config.profiler.stage('create_corpus',
+                               SnapshotCorpus.__name__) as stage:
+        reset_object_cache(config)
+        try:
+            corpus = SnapshotCorpus(config.repo, refs, known=known,
+                                    lazy_dict=True, pipeline=config.pipeline,
+                                    paths=config.paths)
+        except KeyError as e:
+            error('Cannot build snapshots: %s' % str(e))
+
+        if known:
+            corpus.id2word = Dictionary.load(corpus_fname + '.dict')
+
+        def snapshots(fname):
+            write_snapshots(fname, corpus, corpus_fname + '.snapshots')
+
         corpus.metadata = True
-        MalletCorpus.serialize(corpus_fname, corpus,
-                               id2word=corpus.id2word, metadata=True)
+        append_corpus(corpus_fname,
+                      config.profiler.count(corpus, stage, metadata=True),
+                      corpus.id2word,
+                      [('.dict', corpus.id2word.save),
+                       ('.snapshots', snapshots)])
         corpus.metadata = False
-        corpus.id2word.save(corpus_fname + '.dict')
+        report_object_cache(config, stage)
+
+
+def reset_object_cache(config):
+    if config.object_cache is not None:
+        config.object_cache.reset_stats()
+
+
+def report_object_cache(config, stage):
+    """ Log the object cache hits since the last reset, and add them to the
+    profiler `stage`. Pipeline workers keep their own caches, which are not
+    counted here.
+
+    """
+    cache = config.object_cache
+    if cache is None or cache.hit_rate is None:
+        return
+
+    stage.object_cache = cache.stats()
+    logger.info('Object cache: %.1f%% of %d lookups hit, %d objects in '
+                '%.1f MB' % (100 * cache.hit_rate, cache.hits + cache.misses,
+                             len(cache.objects), cache.size / 2.0 ** 20))
+
+
+def append_corpus(fname, documents, id2word, sidecars=()):
+    """ Serialize `documents` to the end of the Mallet corpus `fname`.
+
+    `sidecars` are (suffix, write) pairs for the other files of the corpus,
+    where `write` is called with the name to write the new version of
+    `fname + suffix` to once the documents are serialized. An append is all
+    or nothing: every file is first written under a temporary name, then a
+    journal naming them, and only then are they moved into place by
+    `finish_append`. An append interrupted before the journal is written
+    leaves the corpus as it was; one interrupted after is completed by
+    the next call to `finish_append`.
+
+    """
+    from gensim import utils as gensim_utils
+    from docindex import DocumentIndex
+
+    if os.path.exists(fname):
+        offsets = gensim_utils.unpickle(fname + '.index')
+        index = DocumentIndex.open(fname)
+        base = os.path.getsize(fname)
+    else:
+        offsets = list()
+        index = DocumentIndex([], [], [])
+        base = 0
+
+    new = DocumentIndex.serialize(fname + '.new', documents, id2word)
+    index.extend(new, base)
+    offsets.extend(base + int(offset) for offset in new.offsets)
+    gensim_utils.pickle(offsets, fname + '.index.tmp')
+    index.save(fname + '.docs.tmp')
+    suffixes = ['.index', '.docs']
+    for suffix, write in sidecars:
+        write(fname + suffix + '.tmp')
+        suffixes.append(suffix)
+
+    with open(fname + '.journal.tmp', 'w') as f:
+        json.dump(dict(base=base, suffixes=suffixes), f)
+
+    os.rename(fname + '.journal.tmp', fname + '.journal')
+    finish_append(fname)
+    logger.info('Appended %d documents to %s' % (len(new), fname))
+
+
+def finish_append(fname):
+    """ Complete the append to the Mallet corpus `fname` its journal
+    describes, if any. Every step can be repeated, so an append interrupted
+    here is completed by the next call.
+
+    """
+    if not os.path.exists(fname + '.journal'):
+        return
+
+    with open(fname + '.journal') as f:
+        journal = json.load(f)
+
+    if os.path.exists(fname + '.new'):
+        with open(fname, 'ab') as out:
+            out.truncate(journal['base'])
+            with open(fname + '.new', 'rb') as f:
+                shutil.copyfileobj(f, out)
+
+    for suffix in journal['suffixes']:
+        if os.path.exists(fname + suffix + '.tmp'):
+            os.rename(fname + suffix + '.tmp', fname + suffix)
+        # not older than the corpus, or the document index is rebuilt
+        os.utime(fname + suffix, None)
+
+    os.remove(fname + '.journal')
+    os.remove(fname + '.new')
+    os.remove(fname + '.new.index')
+
+
+def read_snapshots(fname):
+    """ The (path, commit, blob) listing of every snapshot in `fname`, by
+    (ref, commit).
+
+    """
+    listings = OrderedDict()
+    if os.path.exists(fname):
+        with open(fname) as f:
+            reader = csv.reader(f)
+            next(reader)
+            for ref, commit, path, blob in reader:
+                listings.setdefault((ref, commit), list()).append(
+                    (path, commit, blob))
+
+    return listings
+
+
+def write_snapshots(fname, corpus, previous=None):
+    """ Write the listings of the snapshots of `corpus` to `fname`, after
+    those of the snapshots file `previous`, if it exists.
+
+    """
+    new = previous is None or not os.path.exists(previous)
+    if not new:
+        shutil.copyfile(previous, fname)
+
+    with open(fname, new and 'w' or 'a') as f:
+        w = csv.writer(f)
+        if new:
+            w.writerow(['ref', 'commit', 'path', 'blob'])
+
+        for ref in corpus.refs:
+            for path, blob in corpus.snapshots[ref]:
+                w.writerow([ref, corpus.commits[ref], path, blob])
+
+
+def create_window_models(config, Kind, days, commits, warm=True, workers=1):
+    from gensim.corpora import Dictionary
+    from docindex import CorpusView
+    from packed import PackedCorpus
+    import windows as windowing
+
+    corpus_fname = config.corpus_fname % Kind.__name__
+
+    try:
+        id2word = Dictionary.load(corpus_fname + '.dict')
+        corpus = CorpusView(corpus_fname, id2word)
+    except:
+        error('Corpora for building window models not found!')
+
+    def commit_time(id_):
+        return config.repo[str(id_)].commit_time
+
+    with config.profiler.stage('create_windows', Kind.__name__):
+        windows = windowing.build(corpus.index, commit_time, days=days,
+                                  commits=commits)
+
+    spec = '%ddays' % days if days is not None else '%dcommits' % commits
+    windowing.save(corpus_fname + '.windows-' + spec, windows)
+
+    path = config.path + config.project.name + '-windows/'
+    utils.mkdir(path)
+    model_fname = (path + get_scope(config.paths) +
+                   str(config.passes) + 'passes-' +
+                   str(config.alpha) + 'alpha-' +
+                   str(config.num_topics) + 'topics-' +
+                   Kind.__name__ + '-' + spec + '-%s' +
+                   ('-warm' if warm else '') + '.lda')
+
+    # workers attach to the packed corpus instead of each parsing the file
+    packed = PackedCorpus.open(corpus_fname, id2word)
+    models = windowing.WindowModels(packed, model_fname,
+                                    warm=warm, workers=workers,
+                                    num_topics=config.num_topics,
+                                    alpha=config.alpha,
+                                    passes=config.passes)
+    with config.profiler.stage('create_window_models', Kind.__name__):
+        models.train(windows)
+
+
+def compare_vocabularies(config, projects, kinds, workers=1):
+    from vocab import Vocabulary, save_matrix
+
+    fnames = OrderedDict()
+    for project in projects:
+        for kind in kinds:
+            fname = get_corpus_fname(config.path, project,
+                                     get_paths(project)) % kind
+            if os.path.exists(fname):
+                fnames[project.name + '/' + kind] = fname
+            else:
+                logger.warning('No %s corpus of %s, leaving it out' %
+                               (kind, project.name))
+
+    if not fnames:
+        error('No corpora to compare found!')
+
+    with config.profiler.stage('compare_vocab'):
+        vocabulary = Vocabulary.from_corpora(fnames, workers=workers)
+        overlap = vocabulary.overlap()
+        jaccard = vocabulary.jaccard(overlap)
+
+    logger.info('Compared %d corpora sharing a vocabulary of %d words' %
+                (len(fnames), len(vocabulary)))
+
+    vocabulary.save(config.path + 'vocab-global.csv')
+    save_matrix(config.path + 'vocab-overlap.csv', vocabulary.labels, overlap)
+    save_matrix(config.path + 'vocab-jaccard.csv', vocabulary.labels, jaccard)
+
+    for label in vocabulary.labels:
+        click.echo('%-40s %8d words %8d only here' %
+                   (label, len(vocabulary.ids[label]),
+                    len(vocabulary.unique(label))))
+
+
+def get_history(config):
+    """ Open the history index of the project repository once per run. """
+    from history import HistoryIndex
+
+    if config.history is None:
+        with config.profiler.stage('history_index'):
+            config.history = HistoryIndex.open(config.repo)
+
+    return config.history
+
+
+def write_limits(fname, limits):
+    """ Record which documents were truncated or sampled, and why. """
+    logger.info('%d documents were bounded, see %s' % (len(limits), fname))
+    with open(fname, 'w') as f:
+        w = csv.writer(f)
+        w.writerow(['id', 'scope', 'target', 'strategy', 'kept', 'total'])
+        for id_, decisions in sorted(limits.items()):
+            for decision in decisions:
+                w.writerow([id_] + list(decision))
+
+
+def write_duplicates(fname, duplicates):
+    """ Record which documents were dropped as near-duplicates of which. """
+    logger.info('%d documents were duplicates, see %s' % (len(duplicates),
+                                                         fname))
+    with open(fname, 'w') as f:
+        w = csv.writer(f)
+        w.writerow(['id', 'duplicate_of', 'similarity'])
+        for id_, (kept, similarity) in sorted(duplicates.items()):
+            w.writerow([id_, kept, similarity])
+
+
+def get_duplicates(config, Kind):
+    """ The duplicates map of the corpus of `Kind`, empty if it was built
+    without deduplication.
+
+    """
+    fname = config.corpus_fname % Kind.__name__ + '.dedup'
+    duplicates = dict()
+    if os.path.exists(fname):
+        with open(fname) as f:
+            reader = csv.reader(f)
+            next(reader)
+            for id_, kept, similarity in reader:
+                duplicates[id_] = (kept, float(similarity))
+
+    return duplicates
 
 
 def create_model(config, Kind):
+    from gensim.corpora import Dictionary
+    from gensim.models import LdaModel
+    from compact import CompactModel
+    from checkpoint import ModelCheckpoint
+    from docindex import CorpusView
+
     model_fname = config.model_fname % Kind.__name__
     corpus_fname = config.corpus_fname % Kind.__name__
 
     if not os.path.exists(model_fname):
         try:
             id2word = Dictionary.load(corpus_fname + '.dict')
-            corpus = MalletCorpus(corpus_fname, id2word=id2word)
+            corpus = CorpusView(corpus_fname, id2word)
             logger.info('Opened previously created corpus: %s' % corpus_fname)
         except:
             error('Corpora for building file models not found!')
 
-        file_model = LdaModel(corpus,
-                              id2word=corpus.id2word,
-                              alpha=config.alpha,
-                              passes=config.passes,
-                              num_topics=config.num_topics)
+        corpus, convergence = get_convergence(config, corpus)
+
+        with config.profiler.stage('create_model', Kind.__name__) as stage:
+            if config.checkpoint_passes:
+                checkpoint = ModelCheckpoint(model_fname,
+                                             key=config.project.commit)
+                file_model = checkpoint.train(
+                    config.profiler.count(corpus, stage), config.passes,
+                    convergence=convergence,
+                    id2word=corpus.id2word,
+                    alpha=config.alpha,
+                    num_topics=config.num_topics)
+            elif convergence is not None:
+                file_model = convergence.train(
+                    config.profiler.count(corpus, stage), config.passes,
+                    id2word=corpus.id2word,
+                    alpha=config.alpha,
+                    num_topics=config.num_topics)
+            else:
+                file_model = LdaModel(config.profiler.count(corpus, stage),
+                                      id2word=corpus.id2word,
+                                      alpha=config.alpha,
+                                      passes=config.passes,
+                                      num_topics=config.num_topics)
+
+            file_model.save(model_fname)
+
+        if convergence is not None:
+            convergence.save(model_fname + '.convergence')
+            record_convergence(config, Kind, convergence)
+
+        if config.checkpoint_passes:
+            checkpoint.clear()
+
+        CompactModel.export(file_model, model_fname + '.compact',
+                            corpus_fname=corpus_fname,
+                            commit=config.project.commit,
+                            top_n=config.top_n)
+
+
+def get_convergence(config, corpus):
+    """ The documents to train on and the `Convergence` to train them to,
+    or all of `corpus` and None when training for a fixed number of passes.
+
+    """
+    from convergence import Convergence, split
+
+    if config.tolerance is None or len(corpus) < 2:
+        return corpus, None
 
-        file_model.save(model_fname)
+    training, held_out = split(corpus)
+    logger.info('Training until held-out perplexity on %d documents '
+                'improves by less than %g' % (len(held_out), config.tolerance))
+    return training, Convergence(held_out, tolerance=config.tolerance,
+                                 min_passes=config.min_passes)
+
+
+def record_convergence(config, Kind, convergence,
+                       metric='converged_passes'):
+    """ Record how many passes training took, with the held-out per-word
+    bound after each, as `metric`. Models trained on different documents
+    record different metrics, so their passes are not averaged together.
+
+    """
+    logger.info('%s model %s after %d of at most %d passes' %
+                (Kind.__name__, 'converged' if convergence.converged
+                 else 'stopped', convergence.passes, config.passes))
+    record(config, Kind.__name__, metric, convergence.passes,
+           detail=convergence.curve)
+
+
+def record(config, kind, metric, value, **kwargs):
+    """ Record a result for the model of `kind` with the run's settings. """
+    config.results.record(kind, metric, value, num_topics=config.num_topics,
+                          alpha=config.alpha, passes=config.passes,
+                          tolerance=config.tolerance, **kwargs)
+
+
+def load_model(config, Kind):
+    """ The model for `Kind`, from its compact export if there is one. """
+    from gensim.models import LdaModel
+    from compact import CompactModel
+
+    model_fname = config.model_fname % Kind.__name__
+    if os.path.exists(model_fname + '.compact.json'):
+        return CompactModel.load(model_fname + '.compact')
+
+    return LdaModel.load(model_fname)
 
 
 def create_evaluation_distinctiveness(config, Kind):
+    import numpy
+
     model_fname = config.model_fname % Kind.__name__
 
     try:
-        model = LdaModel.load(model_fname)
+        model = load_model(config, Kind)
         logger.info('Opened previously created model at file %s' % model_fname)
     except:
         error('Cannot evalutate LDA models not built yet!')
 
-    scores = utils.score(model, utils.kullback_leibler_divergence)
-    total = sum([x[1] for x in scores])
+    start = time.time()
+    with config.profiler.stage('create_evaluation_distinctiveness',
+                               Kind.__name__):
+        scores = utils.score(model, utils.kullback_leibler_divergence)
+        total = sum([x[1] for x in scores])
 
     logger.info("%s model KL: %f" % (model_fname, total))
-    with open(config.path + 'evaluate-results.csv', 'a') as f:
-        w = csv.writer(f)
-        w.writerow([model_fname, total])
-
-    etas = list()
-    for topic in model.state.get_lambda():
-        topic_eta = list()
-        for p_w in topic:
-            topic_eta.append(p_w * numpy.log2(p_w))
-            etas.append(-sum(topic_eta))
-
-    entropy = sum(etas) / len(etas)
+    record(config, Kind.__name__, 'distinctiveness', total,
+           detail=[x[1] for x in scores], seconds=time.time() - start)
+
+    start = time.time()
+    with config.profiler.stage('create_evaluation_entropy', Kind.__name__):
+        # the running entropy after every word of every topic, averaged
+        total = 0.0
+        count = 0
+        for topic in utils.get_lambda(model):
+            topic = numpy.asarray(topic, dtype=numpy.float64)
+            etas = -numpy.cumsum(topic * numpy.log2(topic))
+            total += etas.sum()
+            count += len(etas)
+
+        entropy = total / count
 
     logger.info("%s model entropy mean: %f" % (model_fname, entropy))
-    with open(config.path + 'evaluate-entropy-results.csv', 'a') as f:
-        w = csv.writer(f)
-        w.writerow([model_fname, entropy])
+    record(config, Kind.__name__, 'entropy', entropy,
+           seconds=time.time() - start)
 
 
-def create_evaluation_corpora(config, Kind):
+def create_evaluation_coherence(config, Kind, top_n=10):
+    from gensim.corpora import MalletCorpus, Dictionary
+    from coherence import coherence
+
+    model_fname = config.model_fname % Kind.__name__
     corpus_fname = config.corpus_fname % Kind.__name__
 
     try:
@@ -357,16 +1465,69 @@ def create_evaluation_corpora(config, Kind):
     except:
         error('Corpora not built yet -- cannot evaluate')
 
-    word_freq = list(reversed(sorted(count_words(corpus))))
-    print("Top 10 words in %s: %s", (corpus_fname, str(word_freq[:10])))
-    print("Bottom 10 words in %s: %s", (corpus_fname, str(word_freq[-10:])))
+    try:
+        model = load_model(config, Kind)
+        logger.info('Opened previously created model at file %s' % model_fname)
+    except:
+        error('Cannot evalutate LDA models not built yet!')
+
+    start = time.time()
+    with config.profiler.stage('create_evaluation_coherence',
+                               Kind.__name__) as stage:
+        umass, npmi = coherence(model, config.profiler.count(corpus, stage),
+                                top_n)
 
+    logger.info("%s model UMass mean: %f, NPMI mean: %f" %
+                (model_fname, sum(umass) / len(umass),
+                 sum(npmi) / len(npmi)))
+    seconds = time.time() - start
+    record(config, Kind.__name__, 'umass', sum(umass) / len(umass),
+           detail=umass, seconds=seconds)
+    record(config, Kind.__name__, 'npmi', sum(npmi) / len(npmi),
+           detail=npmi, seconds=seconds)
+
+
+def create_corpus_stats(config, Kind, top_k=20):
+    """ Describe the corpus of `Kind` in `<corpus>.stats.json`, returning
+    the report.
+
+    """
+    from gensim.corpora import Dictionary
+    from docindex import CorpusView
+    from stats import CorpusStats
+
+    corpus_fname = config.corpus_fname % Kind.__name__
+
+    try:
+        id2word = Dictionary.load(corpus_fname + '.dict')
+        corpus = CorpusView(corpus_fname, id2word)
+    except:
+        error('Corpora not built yet -- cannot describe')
+
+    with config.profiler.stage('create_corpus_stats',
+                               Kind.__name__) as stage:
+        stats = CorpusStats.of(config.profiler.count(corpus, stage),
+                               len(id2word))
+        report = stats.report(id2word, top_k)
+
+    report.update(kind=Kind.__name__, project=config.project.name,
+                  commit=config.project.commit)
+    stats_fname = corpus_fname + '.stats.json'
+    with open(stats_fname, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    logger.info('Wrote statistics of %s to %s' % (corpus_fname, stats_fname))
+    return report
+
+
+def get_word_freq(corpus, id2word=None):
+    if id2word is None:
+        id2word = corpus.id2word
 
-def get_word_freq(corpus):
     word_freq = dict()
     for doc in corpus:
         for word_id, count in doc:
-            word = corpus.id2word[word_id]
+            word = id2word[word_id]
             if word not in word_freq:
                 word_freq[word] = 0
 
@@ -381,6 +1542,9 @@ def count_words(corpus):
 
 
 def create_evaluation_corpora_cosine(config, Kind, Kind2):
+    import numpy
+    from gensim.corpora import MalletCorpus, Dictionary
+
     corpus1_fname = config.corpus_fname % Kind.__name__
     corpus2_fname = config.corpus_fname % Kind2.__name__
 
@@ -392,8 +1556,14 @@ def create_evaluation_corpora_cosine(config, Kind, Kind2):
     except:
         error('Corpora not built yet -- cannot evaluate')
 
-    word_freq1 = get_word_freq(corpus1)
-    word_freq2 = get_word_freq(corpus2)
+    kinds = '%s-%s' % (Kind.__name__, Kind2.__name__)
+    start = time.time()
+    with config.profiler.stage('create_evaluation_corpora_cosine',
+                               kinds) as stage:
+        word_freq1 = get_word_freq(config.profiler.count(corpus1, stage),
+                                   corpus1.id2word)
+        word_freq2 = get_word_freq(config.profiler.count(corpus2, stage),
+                                   corpus2.id2word)
 
     total1 = float(sum(x[1] for x in word_freq1.items()))
     total2 = float(sum(x[1] for x in word_freq2.items()))
@@ -413,45 +1583,66 @@ def create_evaluation_corpora_cosine(config, Kind, Kind2):
     res1 = utils.hellinger_distance(dist1, rdist, filter_by=0.0)
     res2 = utils.hellinger_distance(dist2, rdist, filter_by=0.0)
     logger.info("Cosine distance between corpora: %f" % res)
-    with open(config.path + 'evaluate-hellinger-results.csv', 'a') as f:
-        w = csv.writer(f)
-        w.writerow([corpus1_fname, corpus2_fname, res, res1, res2])
+    # a property of the two corpora, whatever the model settings
+    seconds = time.time() - start
+    config.results.record(kinds, 'hellinger', res, seconds=seconds)
+    config.results.record(kinds, 'hellinger_random_first', res1,
+                          seconds=seconds)
+    config.results.record(kinds, 'hellinger_random_second', res2,
+                          seconds=seconds)
 
 
 def create_evaluation_perplexity(config, Kind):
+    from gensim.corpora import Dictionary
+    from gensim.models import LdaModel
+    from docindex import CorpusView
+
     model_fname = config.model_fname % Kind.__name__
     corpus_fname = config.corpus_fname % Kind.__name__
 
     try:
         id2word = Dictionary.load(corpus_fname + '.dict')
-        corpus = MalletCorpus(corpus_fname, id2word=id2word)
+        corpus = CorpusView(corpus_fname, id2word)
     except:
         error('Corpora not built yet -- cannot evaluate')
 
-    held_out = list()
-    training = list()
     target_len = int(0.1 * len(corpus))
     logger.info('Calculating perplexity with held-out %d of %d documents' %
                 (target_len, len(corpus)))
 
     ids = set()
     while len(ids) < target_len:
-        ids.add(random.randint(0, len(corpus)))
-
-    for doc_id, doc in enumerate(corpus):
-        if doc_id in ids:
-            held_out.append(doc)
+        ids.add(random.randint(0, len(corpus) - 1))
+
+    held_out = corpus.subset(sorted(ids))
+    training = corpus.subset([doc_id for doc_id in range(len(corpus))
+                              if doc_id not in ids])
+
+    # the convergence sample comes out of training, not out of held_out
+    training, convergence = get_convergence(config, training)
+
+    start = time.time()
+    with config.profiler.stage('create_evaluation_perplexity',
+                               Kind.__name__) as stage:
+        if convergence is not None:
+            model = convergence.train(config.profiler.count(training, stage),
+                                      config.passes,
+                                      id2word=corpus.id2word,
+                                      alpha=config.alpha,
+                                      num_topics=config.num_topics)
         else:
-            training.append(doc)
+            model = LdaModel(config.profiler.count(training, stage),
+                             id2word=corpus.id2word,
+                             alpha=config.alpha,
+                             passes=config.passes,
+                             num_topics=config.num_topics)
 
-    model = LdaModel(training,
-                     id2word=corpus.id2word,
-                     alpha=config.alpha,
-                     passes=config.passes,
-                     num_topics=config.num_topics)
+        pwb = model.log_perplexity(held_out)
 
-    pwb = model.log_perplexity(held_out)
+    if convergence is not None:
+        # trained on the perplexity split, not the whole corpus
+        record_convergence(config, Kind, convergence,
+                           'perplexity_converged_passes')
 
-    with open(config.path + 'evaluate-perplexity-results.csv', 'a') as f:
-        w = csv.writer(f)
-        w.writerow([model_fname, pwb])
+    record(config, Kind.__name__, 'perplexity_bound', pwb,
+           seconds=time.time() - start)
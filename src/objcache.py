@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for caching parsed git objects in front of a dulwich object store.
+
+dulwich reads, decompresses and parses an object every time it is asked
+for one. Walking a linear history diffs every commit against its parent,
+so the parent's trees are parsed once as the new side of one diff and
+again as the old side of the next, and the same goes for the blobs of
+every file changed twice in a row. The cache keeps recently used objects
+parsed, so each is decompressed about once per walk.
+
+Sizes are counted by the uncompressed length of each object. Blobs larger
+than `max_blob_bytes` are never kept, so a single large file does not push
+out the trees.
+"""
+
+from collections import OrderedDict
+
+from dulwich.object_store import BaseObjectStore
+from dulwich.objects import Blob, ShaFile
+
+import logging
+logger = logging.getLogger('mct.objcache')
+
+
+class ObjectCache(object):
+    """
+    An object store that keeps up to `max_bytes` of the objects read from
+    `store`, dropping the least recently used first. Anything it does not
+    cache is passed through to `store`.
+
+    Like dulwich stores, a cache must not be shared between threads.
+    """
+
+    def __init__(self, store, max_bytes=64 * 2 ** 20,
+                 max_blob_bytes=2 ** 20):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.max_blob_bytes = max_blob_bytes
+        self.objects = OrderedDict()  # sha -> (object, size), oldest first
+        self.size = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, sha):
+        try:
+            obj, size = self.objects.pop(sha)
+        except KeyError:
+            self.misses += 1
+        else:
+            # back in at the most recently used end
+            self.objects[sha] = (obj, size)
+            self.hits += 1
+            return obj
+
+        type_num, raw = self.store.get_raw(sha)
+        obj = ShaFile.from_raw_string(type_num, raw, sha=sha)
+        if type_num != Blob.type_num or len(raw) <= self.max_blob_bytes:
+            self._add(sha, obj, len(raw))
+
+        return obj
+
+    def _add(self, sha, obj, size):
+        if size > self.max_bytes:
+            return
+
+        while self.size + size > self.max_bytes:
+            _, (_, evicted) = self.objects.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+
+        self.objects[sha] = (obj, size)
+        self.size += size
+
+    def get_raw(self, sha):
+        # raw reads are for objects read once, so misses are not kept
+        if sha in self.objects:
+            obj = self[sha]
+            return obj.type_num, obj.as_raw_string()
+
+        return self.store.get_raw(sha)
+
+    def __contains__(self, sha):
+        return sha in self.objects or sha in self.store
+
+    def __iter__(self):
+        return iter(self.store)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    # these only read objects through self[...], so they go through the cache
+    iter_tree_contents = BaseObjectStore.__dict__['iter_tree_contents']
+    tree_changes = BaseObjectStore.__dict__['tree_changes']
+    peel_sha = BaseObjectStore.__dict__['peel_sha']
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return None
+
+        return float(self.hits) / lookups
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    hit_rate=self.hit_rate, evictions=self.evictions,
+                    objects=len(self.objects), bytes=self.size,
+                    max_bytes=self.max_bytes)
+
+
+def cache_objects(repo, max_bytes, max_blob_bytes=2 ** 20):
+    """ Put an `ObjectCache` of `max_bytes` in front of the object store of
+    `repo`, returning it. Objects read through `repo[sha]` are cached too.
+
+    """
+    cache = ObjectCache(repo.object_store, max_bytes, max_blob_bytes)
+    repo.object_store = cache
+    return cache
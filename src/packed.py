@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for sharing a corpus between worker processes without copying it.
+
+A corpus held as lists of (id, count) tuples is copied into every worker:
+pickled if it is sent, and page by page if it is inherited, since reference
+counting writes to every object a worker touches. A packed corpus holds
+the bag-of-words of all documents in three flat arrays, as in a CSR
+matrix. Document i has the word ids `ids[indptr[i]:indptr[i + 1]]`, and
+`counts` holds their counts in the same layout.
+
+The arrays are kept next to the Mallet corpus in `<corpus>.packed/` and are
+memory-mapped read-only. A packed corpus pickles as its file name, so a
+worker attaches to the same files by name. The operating system then
+keeps one copy of the corpus in memory however many workers read it.
+"""
+
+import os
+import shutil
+from array import array
+
+import numpy
+
+from docindex import CorpusView
+
+import logging
+logger = logging.getLogger('mct.packed')
+
+ARRAYS = ['indptr', 'ids', 'counts']
+
+
+class PackedCorpus(object):
+    """
+    The documents packed into `indptr`, `ids` and `counts`, or only those
+    at `positions`. Iterates like a gensim corpus.
+
+    `fname` is the Mallet corpus the arrays were packed from, if they are
+    kept on disk.
+    """
+
+    def __init__(self, indptr, ids, counts, positions=None, fname=None,
+                 id2word=None):
+        self.indptr = indptr
+        self.ids = ids
+        self.counts = counts
+        self.positions = positions
+        self.fname = fname
+        self.id2word = id2word
+
+    @classmethod
+    def pack(cls, documents):
+        """ Pack the bag-of-words `documents` into arrays in memory. """
+        indptr = array('l', [0])
+        ids = array('i')
+        counts = array('i')
+        for doc in documents:
+            for id_, count in doc:
+                ids.append(id_)
+                counts.append(int(count))
+            indptr.append(len(ids))
+
+        return cls(numpy.array(indptr, dtype=numpy.int64),
+                   numpy.frombuffer(ids, dtype=numpy.int32),
+                   numpy.frombuffer(counts, dtype=numpy.int32))
+
+    @classmethod
+    def open(cls, fname, id2word):
+        """ The packed documents of the Mallet corpus `fname`, packing them
+        first if they are missing or older than the corpus.
+
+        """
+        path = fname + '.packed'
+        if not (os.path.exists(os.path.join(path, 'indptr.npy')) and
+                os.path.getmtime(os.path.join(path, 'indptr.npy')) >=
+                os.path.getmtime(fname)):
+            corpus = cls.pack(CorpusView(fname, id2word))
+            corpus.save(path)
+            logger.info('Packed %d documents of %s' % (len(corpus), fname))
+
+        corpus = cls.load(path)
+        corpus.fname = fname
+        corpus.id2word = id2word
+        return corpus
+
+    def save(self, path):
+        for old in (path, path + '.tmp'):
+            if os.path.exists(old):
+                shutil.rmtree(old)
+
+        os.makedirs(path + '.tmp')
+        for name in ARRAYS:
+            numpy.save(os.path.join(path + '.tmp', name + '.npy'),
+                       getattr(self, name))
+
+        os.rename(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        """ Attach to the arrays saved at `path`, without reading them. """
+        return cls(*[numpy.load(os.path.join(path, name + '.npy'),
+                                mmap_mode='r') for name in ARRAYS])
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if self.fname is not None:
+            # attach to the same files instead of copying the arrays
+            for name in ARRAYS:
+                del state[name]
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.fname is not None:
+            attached = self.load(self.fname + '.packed')
+            for name in ARRAYS:
+                setattr(self, name, getattr(attached, name))
+
+    def __len__(self):
+        if self.positions is None:
+            return len(self.indptr) - 1
+
+        return len(self.positions)
+
+    def __iter__(self):
+        positions = self.positions
+        if positions is None:
+            positions = xrange(len(self.indptr) - 1)
+
+        for position in positions:
+            yield self[position]
+
+    def __getitem__(self, position):
+        start, end = self.indptr[position], self.indptr[position + 1]
+        return zip(self.ids[start:end].tolist(),
+                   self.counts[start:end].tolist())
+
+    @property
+    def tokens(self):
+        """ The total number of tokens in the documents. """
+        if self.positions is None:
+            return int(self.counts.sum())
+
+        return sum(int(self.counts[self.indptr[p]:self.indptr[p + 1]].sum())
+                   for p in self.positions)
+
+    def subset(self, positions):
+        """ The documents at `positions` of this corpus, sharing its arrays.
+        """
+        if self.positions is not None:
+            positions = [self.positions[p] for p in positions]
+
+        return PackedCorpus(self.indptr, self.ids, self.counts,
+                            list(positions), self.fname, self.id2word)
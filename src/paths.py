@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for scoping corpora to some of the paths of a repository.
+
+Patterns are shell-style globs over paths relative to the repository root,
+roughly as in .gitignore: a pattern with a slash is anchored at the root,
+one without matches any file or directory name, and a pattern matching a
+directory matches everything below it. So `vendor` excludes every vendor
+directory, `*.min.js` every minified script and `src/test` only that one
+directory. Note that `*` also matches slashes.
+
+The walks here are those of `dulwich.diff_tree`, except that a directory
+no selected path can be in is never read. The files below it are never
+listed, fetched or diffed.
+"""
+
+import hashlib
+import stat
+from fnmatch import fnmatchcase
+
+from dulwich.diff_tree import (CHANGE_MODIFY, TreeChange, _NULL_ENTRY,
+                               _is_tree, _merge_entries, _skip_tree)
+from dulwich.objects import TreeEntry
+
+import logging
+logger = logging.getLogger('mct.paths')
+
+
+class Pattern(object):
+    """ One include or exclude pattern. """
+
+    def __init__(self, pattern):
+        # as utf-8, like the paths of trees, whether it came from the
+        # command line or projects.csv
+        if isinstance(pattern, unicode):
+            pattern = pattern.encode('utf-8')
+
+        self.pattern = pattern
+        pattern = pattern.rstrip('/')
+        self.anchored = '/' in pattern
+        self.parts = pattern.lstrip('/').split('/')
+
+    def matches(self, path):
+        """ Whether the pattern matches `path` or one of its directories. """
+        names = path.split('/')
+        if not self.anchored:
+            return any(fnmatchcase(name, self.parts[0]) for name in names)
+
+        return any(fnmatchcase('/'.join(names[:i]), '/'.join(self.parts))
+                   for i in xrange(len(names), 0, -1))
+
+    def may_match_below(self, path):
+        """ Whether the pattern may match a path below the directory `path`.
+        """
+        if not self.anchored:
+            return True
+
+        for name, part in zip(path.split('/'), self.parts):
+            if '*' in part:
+                return True  # may match any number of names
+            if not fnmatchcase(name, part):
+                return False
+
+        return True
+
+
+class PathFilter(object):
+    """
+    Selects the paths that match none of the `exclude` patterns and, if
+    there are `include` patterns, one of those.
+    """
+
+    def __init__(self, include=(), exclude=()):
+        self.include = [Pattern(p) for p in include]
+        self.exclude = [Pattern(p) for p in exclude]
+
+    def __nonzero__(self):
+        return bool(self.include or self.exclude)
+
+    @property
+    def key(self):
+        """ A short name for the selection, the same for any pattern order.
+        """
+        patterns = (['+' + p.pattern for p in self.include] +
+                    ['-' + p.pattern for p in self.exclude])
+        return hashlib.sha1('\n'.join(sorted(patterns))).hexdigest()[:8]
+
+    def selects(self, path):
+        if any(p.matches(path) for p in self.exclude):
+            return False
+
+        return not self.include or any(p.matches(path)
+                                       for p in self.include)
+
+    def enters(self, path):
+        """ Whether a selected path may be in the directory `path`. """
+        if not path:
+            return True
+
+        if any(p.matches(path) for p in self.exclude):
+            return False
+
+        return not self.include or any(p.matches(path) or
+                                       p.may_match_below(path)
+                                       for p in self.include)
+
+    def walk_trees(self, store, tree1_id, tree2_id, prune_identical=False):
+        """ Like `dulwich.diff_tree.walk_trees`, but yields only the pairs of
+        selected files, with trees replaced by null entries, and does not
+        read the directories it does not enter.
+
+        """
+        todo = [(TreeEntry('', tree1_id and stat.S_IFDIR or None, tree1_id),
+                 TreeEntry('', tree2_id and stat.S_IFDIR or None, tree2_id))]
+        while todo:
+            entry1, entry2 = todo.pop()
+            is_tree1 = _is_tree(entry1)
+            is_tree2 = _is_tree(entry2)
+            if prune_identical and is_tree1 and is_tree2 and entry1 == entry2:
+                continue
+
+            path = entry1.path or entry2.path
+            if (is_tree1 or is_tree2) and self.enters(path):
+                tree1 = is_tree1 and store[entry1.sha] or None
+                tree2 = is_tree2 and store[entry2.sha] or None
+                todo.extend(reversed(_merge_entries(path, tree1, tree2)))
+            elif is_tree1 or is_tree2:
+                logger.debug('Pruned %s' % path)
+
+            entry1 = _skip_tree(entry1)
+            entry2 = _skip_tree(entry2)
+            if entry1 == _NULL_ENTRY and entry2 == _NULL_ENTRY:
+                continue
+
+            if self.selects(path):
+                yield entry1, entry2
+
+    def iter_tree_contents(self, store, tree_id):
+        """ The selected files of a tree, as `TreeEntry`s in the order of
+        `store.iter_tree_contents`.
+
+        """
+        for entry, _ in self.walk_trees(store, tree_id, None):
+            yield entry
+
+    def tree_changes(self, store, tree1_id, tree2_id):
+        """ The `TreeChange`s of the selected files between two trees, as
+        `dulwich.diff_tree.tree_changes` would give them.
+
+        """
+        for entry1, entry2 in self.walk_trees(store, tree1_id, tree2_id,
+                                              prune_identical=True):
+            if entry1 == entry2:
+                continue
+
+            if entry1 == _NULL_ENTRY:
+                yield TreeChange.add(entry2)
+            elif entry2 == _NULL_ENTRY:
+                yield TreeChange.delete(entry1)
+            elif stat.S_IFMT(entry1.mode) != stat.S_IFMT(entry2.mode):
+                # file type changed: reported as delete/add
+                yield TreeChange.delete(entry1)
+                yield TreeChange.add(entry2)
+            else:
+                yield TreeChange(CHANGE_MODIFY, entry1, entry2)
+
+    def select_changes(self, changes):
+        """ The `TreeChange`s of selected files among `changes`. """
+        return [change for change in changes
+                if self.selects(change.old.path or change.new.path)]
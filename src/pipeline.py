@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for running corpus extraction as a pipeline of parallel stages.
+
+A corpus splits its `get_texts` into stages (fetching objects and diffing,
+then tokenizing), each a method taking and returning one work item. The
+pipeline runs every stage on its own pool of threads or processes, with at
+most `queue_size` items in flight per stage, so a slow consumer holds back
+the producers. Results always come out in input order. The final stage,
+bag-of-words and writing, is whoever iterates over the corpus.
+"""
+
+import copy
+import threading
+from collections import deque
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+import dulwich.repo
+
+from objcache import ObjectCache, cache_objects
+
+import logging
+logger = logging.getLogger('mct.pipeline')
+
+_worker = threading.local()  # the corpus copy of a worker
+
+
+def _init_worker(corpus):
+    """ Give a worker its own copy of the corpus, with its own handles on
+    the repository: dulwich object stores must not be shared between
+    threads, nor file offsets between forked processes.
+
+    """
+    corpus = copy.copy(corpus)
+    if corpus.repo is not None:
+        store = corpus.repo.object_store
+        corpus.repo = dulwich.repo.Repo(corpus.repo.path)
+        if isinstance(store, ObjectCache):
+            cache_objects(corpus.repo, store.max_bytes, store.max_blob_bytes)
+
+    _worker.corpus = corpus
+
+
+def _call_worker(method, item):
+    return getattr(_worker.corpus, method)(item)
+
+
+class Pipeline(object):
+    """
+    Worker settings for the `fetch` and `tokenize` stages.
+
+    A stage with 0 workers runs inline in the consuming thread. Thread
+    workers suit object reads and decompression; tokenizing is pure Python,
+    so it defaults to processes.
+    """
+
+    def __init__(self, fetch_workers=1, tokenize_workers=1,
+                 fetch_processes=False, tokenize_processes=True,
+                 queue_size=64):
+        self.stages = dict(fetch=(fetch_workers, fetch_processes),
+                           tokenize=(tokenize_workers, tokenize_processes))
+        self.queue_size = queue_size
+
+    def run(self, corpus, items, *stages):
+        """ Feed `items` through `stages`, pairs of a stage name and the
+        name of the `corpus` method implementing it, yielding the results of
+        the last stage in order.
+
+        """
+        pools = dict()
+        try:
+            # fork worker processes before any threads are started
+            for stage, _ in sorted(stages, key=lambda s: not self.stages[
+                    s[0]][1]):
+                workers, processes = self.stages[stage]
+                if workers > 0 and processes:
+                    pools[stage] = Pool(workers, _init_worker, (corpus,))
+                elif workers > 0:
+                    pools[stage] = ThreadPool(workers, _init_worker,
+                                              (corpus,))
+
+            for stage, method in stages:
+                items = self._map(pools.get(stage), corpus, method, items)
+
+            for item in items:
+                yield item
+        finally:
+            for pool in pools.values():
+                pool.terminate()
+                pool.join()
+
+    def _map(self, pool, corpus, method, items):
+        if pool is None:
+            fn = getattr(corpus, method)
+            for item in items:
+                yield fn(item)
+            return
+
+        pending = deque()
+        for item in items:
+            pending.append(pool.apply_async(_call_worker, (method, item)))
+
+            # backpressure: wait on the oldest item once the stage is full
+            if len(pending) >= self.queue_size:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
@@ -11,32 +11,52 @@
 Code for splitting the terms.
 """
 
+import os
+import re
 import string
 
 import logging
 logger = logging.getLogger('mct.preprocessing')
 
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         os.pardir, 'data')
+STOP_FILES = ['english_stops.txt', 'java_reserved.txt']
+
+NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+# characters unicode.split() treats as whitespace but str.split() does not
+ASCII_SEPARATORS = string.maketrans('\x1c\x1d\x1e\x1f', '    ')
+
 
 def tokenize(s):
     return s.split()
 
 
 def to_unicode(document, info=[]):
+    """ Decode `document` for tokenizing. Pure ASCII byte strings are
+    returned undecoded, as they tokenize to the same words either way.
+
+    """
     document = document.replace('\x00', ' ')  # remove nulls
     document = document.strip()
     if not isinstance(document, unicode):
-        for codec in ['utf8', 'latin1', 'ascii']:
+        if NON_ASCII.search(document) is None:
+            return document.translate(ASCII_SEPARATORS)
+
+        for codec in ['utf8', 'latin1']:
             try:
                 return unicode(document, encoding=codec)
             except UnicodeDecodeError as e:
-                logger.debug('%s %s %s' % (codec, str(e), ' '.join(info)))
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('%s %s %s' % (codec, str(e), ' '.join(info)))
 
     return document
 
 
 def split(iterator):
     for token in iterator:
-        word = u''
+        empty = token[:0]  # split byte strings into byte strings
+        word = empty
         for char in token:
             if char.isupper() and all(map(lambda x: x.isupper(), word)):
                 # keep building if word is currently all uppercase
@@ -63,7 +83,7 @@ def split(iterator):
             elif char in string.punctuation:
                 if len(word) > 0:
                     yield word
-                    word = u''
+                    word = empty
 
                 # always yield punctuation as a single token
                 yield char
@@ -101,3 +121,19 @@ def read_stops(l):
             stops.extend(f.readlines())
 
     return set([word.strip() for word in stops])
+
+
+_stops = None
+
+
+def get_stops():
+    """ The default stop words, read from the package's data directory the
+    first time they are needed.
+
+    """
+    global _stops
+    if _stops is None:
+        _stops = read_stops([os.path.join(DATA_PATH, fname)
+                             for fname in STOP_FILES])
+
+    return _stops
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for recording where time and memory go in each pipeline stage.
+"""
+
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+import logging
+logger = logging.getLogger('mct.profiling')
+
+
+class Stage(object):
+    """
+    Metrics for one run of one stage over one corpus kind.
+
+    Peak RSS is the process-wide high-water mark at the end of the stage, so
+    it only grows from stage to stage.
+    """
+
+    def __init__(self, name, kind=None):
+        self.name = name
+        self.kind = kind
+        self.documents = 0
+        self.tokens = 0
+        self.commits = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss = 0
+        self.object_cache = None  # ObjectCache stats, when one was used
+
+    def as_dict(self):
+        def per_second(count):
+            if self.wall > 0:
+                return count / self.wall
+
+            return None
+
+        return dict(stage=self.name, kind=self.kind,
+                    wall=self.wall, cpu=self.cpu, peak_rss_kb=self.peak_rss,
+                    documents=self.documents, tokens=self.tokens,
+                    commits=self.commits, object_cache=self.object_cache,
+                    documents_per_second=per_second(self.documents),
+                    tokens_per_second=per_second(self.tokens),
+                    commits_per_second=per_second(self.commits))
+
+
+class CountedCorpus(object):
+    """
+    Wraps a corpus, counting the documents and tokens that pass through it.
+
+    When `commits` is set, every document is also counted as a commit.
+    """
+
+    def __init__(self, corpus, stage, metadata=False, commits=False):
+        self.corpus = corpus
+        self.stage = stage
+        self.metadata = metadata
+        self.commits = commits
+
+    def __iter__(self):
+        for doc in self.corpus:
+            bow = doc[0] if self.metadata else doc
+            self.stage.documents += 1
+            self.stage.tokens += int(sum(count for _, count in bow))
+            if self.commits:
+                self.stage.commits += 1
+
+            yield doc
+
+    def __len__(self):
+        return len(self.corpus)
+
+
+class Profiler(object):
+    """
+    Collects `Stage` metrics for a run and writes them to one JSON file.
+
+    A disabled profiler still hands out stages, but does not time them or
+    wrap corpora, so the instrumented code paths cost nothing by default.
+    """
+
+    def __init__(self, enabled=False, fname=None, profile_stage=None,
+                 info=None):
+        self.enabled = enabled
+        self.info = info or dict()
+        self.fname = fname
+        self.profile_stage = profile_stage
+        self.stages = list()
+        self.started = time.time()
+
+    @contextmanager
+    def stage(self, name, kind=None):
+        stage = Stage(name, kind)
+        if not self.enabled:
+            yield stage
+            return
+
+        profile = None
+        if self.profile_stage == name:
+            profile = cProfile.Profile()
+
+        start_wall = time.time()
+        start_cpu = cpu_time()
+        if profile is not None:
+            profile.enable()
+
+        try:
+            yield stage
+        finally:
+            if profile is not None:
+                profile.disable()
+
+            stage.wall = time.time() - start_wall
+            stage.cpu = cpu_time() - start_cpu
+            stage.peak_rss = peak_rss()
+            self.stages.append(stage)
+            logger.info('%s %s: %.3fs wall, %.3fs cpu, %d docs, %d tokens' %
+                        (name, kind or '', stage.wall, stage.cpu,
+                         stage.documents, stage.tokens))
+
+            if profile is not None:
+                prof_fname = '%s.%s-%s.prof' % (self.fname, name,
+                                                kind or 'all')
+                profile.dump_stats(prof_fname)
+                logger.info('Wrote cProfile output to %s' % prof_fname)
+
+    def count(self, corpus, stage, metadata=False, commits=False):
+        if not self.enabled:
+            return corpus
+
+        return CountedCorpus(corpus, stage, metadata, commits)
+
+    def save(self):
+        if not self.enabled or self.fname is None:
+            return
+
+        with open(self.fname, 'w') as f:
+            metrics = dict(self.info)
+            metrics.update(started=self.started, argv=sys.argv,
+                           stages=[stage.as_dict() for stage in self.stages])
+            json.dump(metrics, f, indent=2, sort_keys=True)
+
+        logger.info('Wrote metrics for %d stages to %s' % (len(self.stages),
+                                                            self.fname))
+
+
+def cpu_time():
+    times = os.times()
+    return times[0] + times[1]
+
+
+def peak_rss():
+    """ Peak resident set size of this process in kilobytes. """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024  # reported in bytes there
+
+    return rss
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for keeping evaluation results in an SQLite database.
+
+Every result is one value of one metric for one model setting: project,
+commit, path scope, corpus kind, number of topics, alpha, passes and the
+tolerance training stopped at, if any. Metrics over several values (e.g.
+per-topic coherence) keep them as a JSON list next to the summary value.
+Results point to the run that recorded them, which holds the command line,
+host and start time.
+
+Several processes may record into the same database at once. Writes are
+short transactions that wait for each other rather than fail.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+
+import logging
+logger = logging.getLogger('mct.results')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    commit_ TEXT NOT NULL,
+    argv TEXT,
+    host TEXT,
+    pid INTEGER,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run INTEGER NOT NULL REFERENCES runs (id),
+    project TEXT NOT NULL,
+    commit_ TEXT NOT NULL,
+    scope TEXT,
+    kind TEXT NOT NULL,
+    num_topics INTEGER,
+    alpha TEXT,
+    passes INTEGER,
+    tolerance REAL,
+    metric TEXT NOT NULL,
+    value REAL,
+    detail TEXT,
+    seconds REAL,
+    recorded REAL NOT NULL
+);
+"""
+
+# results columns added since the table was first created
+COLUMNS = [('scope', 'TEXT'), ('tolerance', 'REAL')]
+
+RETRIES = 5
+
+KEY = ['project', 'commit_', 'scope', 'kind', 'num_topics', 'alpha',
+       'passes', 'tolerance', 'metric']
+
+Summary = namedtuple('Summary', 'project commit scope kind num_topics alpha '
+                     'passes tolerance metric runs mean min max last')
+
+
+class ResultStore(object):
+    """
+    The results database `fname`, recording for `project` at `commit`,
+    modeled over the paths named by `scope` (None for all of them).
+
+    A run is only added once the first result is recorded, so commands that
+    record nothing leave no trace.
+    """
+
+    def __init__(self, fname, project=None, commit=None, scope=None,
+                 timeout=60.0):
+        self.fname = fname
+        self.project = project
+        self.commit = commit
+        self.scope = scope
+        self.timeout = timeout
+        self.run = None
+        self._run_pid = None
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self):
+        # connections cannot cross fork(), so each process opens its own
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.fname, timeout=self.timeout,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            transaction(connection, [(statement, ()) for statement in
+                                     SCHEMA.split(';') if statement.strip()])
+            migrate(connection)
+            self._connection = connection
+            self._pid = os.getpid()
+
+        return self._connection
+
+    def _write(self, sql, params):
+        return transaction(self.connection, [(sql, params)])
+
+    def _run(self):
+        if self.run is None or self._run_pid != os.getpid():
+            self.run = self._write(
+                'INSERT INTO runs (project, commit_, argv, host, pid, '
+                'started) VALUES (?, ?, ?, ?, ?, ?)',
+                (self.project, self.commit, json.dumps(sys.argv),
+                 socket.gethostname(), os.getpid(), time.time()))
+            self._run_pid = os.getpid()
+
+        return self.run
+
+    def record(self, kind, metric, value, num_topics=None, alpha=None,
+               passes=None, tolerance=None, detail=None, seconds=None):
+        """ Record one `value` of `metric` for the model of `kind` with the
+        given settings. `detail` is an optional list of the values the
+        summary `value` was computed from.
+
+        """
+        if detail is not None:
+            detail = json.dumps([float(x) for x in detail])
+
+        if alpha is not None:
+            alpha = str(alpha)
+
+        self._write(
+            'INSERT INTO results (run, project, commit_, scope, kind, '
+            'num_topics, alpha, passes, tolerance, metric, value, detail, '
+            'seconds, recorded) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (self._run(), self.project, self.commit, self.scope, kind,
+             num_topics, alpha, passes, tolerance, metric, float(value),
+             detail, seconds, time.time()))
+
+    def summarize(self, **where):
+        """ One `Summary` per distinct result key, over all the runs that
+        recorded it. Keyword arguments naming key columns (`commit` for
+        the commit) restrict the results to those with that value.
+
+        """
+        clauses = list()
+        params = list()
+        for column, value in sorted(where.items()):
+            if column == 'commit':
+                column = 'commit_'
+
+            if column not in KEY:
+                raise ValueError('Unknown result column: %s' % column)
+
+            if value is not None:
+                clauses.append('%s = ?' % column)
+                params.append(value)
+
+        sql = ('SELECT %(key)s, COUNT(DISTINCT run), AVG(value), '
+               'MIN(value), MAX(value), '
+               '(SELECT value FROM results AS latest WHERE %(same)s '
+               'ORDER BY recorded DESC, id DESC LIMIT 1) '
+               'FROM results %(where)s GROUP BY %(key)s ORDER BY %(key)s' %
+               dict(key=', '.join(KEY),
+                    same=' AND '.join('latest.%s IS results.%s' % (c, c)
+                                      for c in KEY),
+                    where='WHERE ' + ' AND '.join(clauses)
+                    if clauses else ''))
+
+        return [Summary(*row) for row in
+                self.connection.execute(sql, params)]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def migrate(connection):
+    """ Add the `COLUMNS` a database made by an older version lacks, and
+    index the results by `KEY`.
+
+    """
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        have = set(row[1] for row in
+                   connection.execute('PRAGMA table_info(results)'))
+        missing = [(name, type_) for name, type_ in COLUMNS
+                   if name not in have]
+        for name, type_ in missing:
+            connection.execute('ALTER TABLE results ADD COLUMN %s %s' %
+                               (name, type_))
+        if missing:
+            connection.execute('DROP INDEX IF EXISTS results_key')
+
+        connection.execute('CREATE INDEX IF NOT EXISTS results_key ON '
+                           'results (%s)' % ', '.join(KEY))
+        connection.execute('COMMIT')
+    except:
+        connection.execute('ROLLBACK')
+        raise
+
+
+def transaction(connection, statements):
+    """ Run `statements` in one transaction on `connection`, returning the
+    last row id. The write lock is taken up front, so concurrent writers
+    queue for it instead of deadlocking.
+
+    """
+    for attempt in range(RETRIES):
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, params in statements:
+                cursor = connection.execute(sql, params)
+
+            connection.execute('COMMIT')
+            return cursor.lastrowid
+        except sqlite3.OperationalError as e:
+            connection.execute('ROLLBACK')
+            # another process created the tables after ours were prepared
+            if 'schema has changed' not in str(e):
+                raise
+        except:
+            connection.execute('ROLLBACK')
+            raise
+
+    raise sqlite3.OperationalError('database schema kept changing')
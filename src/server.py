@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for serving topic queries from a model kept in memory.
+
+The dictionary, model and preprocessing stay loaded for the life of the
+server. Requests are POSTed as JSON to /topics with one of
+
+    {"commit": "<sha>"}   the changeset of a commit in the repository
+    {"diff": "..."}       a unified diff
+    {"text": "..."}       any raw text
+
+and get back the document's topic distribution and the top words of each of
+its topics. Inference for concurrent requests is micro-batched: requests
+arriving within `max_wait` seconds of each other share one inference call.
+"""
+
+import json
+import Queue
+import re
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+import logging
+logger = logging.getLogger('mct.server')
+
+UNIFIED = re.compile(r'^[+ -].*')
+
+
+class Batcher(object):
+    """
+    Collects documents from many threads and runs `model.inference` over
+    them in chunks of at most `batch_size`. Batching starts with `start()`,
+    unless `start` is given.
+    """
+
+    def __init__(self, model, batch_size=64, max_wait=0.005, start=True):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.queue = Queue.Queue()
+        self.batches = 0
+
+        if start:
+            self.start()
+
+    def start(self):
+        thread = threading.Thread(target=self._run, name='mct-batcher')
+        thread.daemon = True
+        thread.start()
+
+    def submit(self, bow):
+        """ Queue `bow` for inference, returning the request to `wait` on.
+        """
+        request = dict(bow=bow, done=threading.Event())
+        self.queue.put(request)
+        return request
+
+    def wait(self, request):
+        """ The normalized topic distribution of a submitted request, once
+        the batch it landed in has been inferred.
+
+        """
+        request['done'].wait()
+        if 'error' in request:
+            raise request['error']
+
+        return request['theta']
+
+    def infer(self, bow):
+        """ The normalized topic distribution of `bow`. Blocks until the
+        batch it lands in has been inferred.
+
+        """
+        return self.wait(self.submit(bow))
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    break
+
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except Queue.Empty:
+                    break
+
+            try:
+                gamma, _ = self.model.inference([r['bow'] for r in batch])
+                for request, row in zip(batch, gamma):
+                    request['theta'] = row / row.sum()
+            except Exception as e:
+                logger.exception('Inference failed for %d documents' %
+                                 len(batch))
+                for request in batch:
+                    request['error'] = e
+
+            self.batches += 1
+            for request in batch:
+                request['done'].set()
+
+
+class TopicService(object):
+    """
+    Everything a query needs, loaded once: the `model` with its dictionary,
+    a `corpus` whose `preprocess` turns text into words, and optionally the
+    repository for commit lookups.
+    """
+
+    def __init__(self, model, corpus, top_words=10, eps=0.01, **kwargs):
+        self.model = model
+        self.corpus = corpus
+        self.eps = eps
+        self.batcher = Batcher(model, **kwargs)
+        # dulwich object stores are not thread-safe, and every handler
+        # thread reads the same one
+        self.repo_lock = threading.Lock()
+        self.topic_words = [model.show_topic(topicid, top_words)
+                            for topicid in range(model.num_topics)]
+
+    def words(self, request):
+        if 'commit' in request:
+            if (self.corpus.repo is None or
+                    not hasattr(self.corpus, 'commit_words')):
+                raise ValueError('cannot look up commits for this model')
+
+            with self.repo_lock:
+                return self.corpus.commit_words(str(request['commit']))
+        elif 'diff' in request:
+            lines = [line[1:] for line in request['diff'].splitlines()
+                     if UNIFIED.match(line) and
+                     not line.startswith(('--- ', '+++ '))]
+            return list(self.corpus.preprocess(u' '.join(lines)))
+        elif 'text' in request:
+            return list(self.corpus.preprocess(request['text']))
+
+        raise ValueError('request needs a commit, diff or text')
+
+    def topics(self, request):
+        bow = self.model.id2word.doc2bow(self.words(request))
+        theta = self.batcher.infer(bow)
+        topics = sorted(((topicid, float(p)) for topicid, p in
+                         enumerate(theta) if p >= self.eps),
+                        key=lambda x: -x[1])
+
+        return dict(topics=topics,
+                    words=dict((topicid, [(word, float(p)) for p, word in
+                                          self.topic_words[topicid]])
+                               for topicid, _ in topics))
+
+
+class TopicHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/health':
+            self._reply(200, dict(status='ok'))
+        else:
+            self._reply(404, dict(error='not found'))
+
+    def do_POST(self):
+        if self.path != '/topics':
+            return self._reply(404, dict(error='not found'))
+
+        try:
+            length = int(self.headers.getheader('content-length') or 0)
+            request = json.loads(self.rfile.read(length))
+            response = self.server.service.topics(request)
+        except (ValueError, KeyError) as e:
+            return self._reply(400, dict(error=str(e)))
+        except Exception as e:
+            logger.exception('Failed to answer %r' % self.path)
+            return self._reply(500, dict(error=str(e)))
+
+        self._reply(200, response)
+
+    def _reply(self, status, body):
+        body = json.dumps(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class TopicServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        HTTPServer.__init__(self, address, TopicHandler)
+        self.service = service
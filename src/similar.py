@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for finding topically similar documents of a model.
+
+A `SimilarityIndex` keeps the document-topic vectors (theta) of every
+document of a corpus as one dense float32 matrix. Exact queries scan it in
+blocks, keeping only a running top-k. For large histories an approximate
+index of random-projection signatures narrows the scan to the candidates
+closest in Hamming distance before the exact comparison.
+
+Everything derived from theta is computed once, when the index is built,
+and saved next to it. Loading memory-maps the saved arrays, so opening even
+a large index reads nothing but the document ids.
+"""
+
+import itertools
+import os
+
+import numpy
+
+from utils import SIMILARITY_METRICS as METRICS
+
+import logging
+logger = logging.getLogger('mct.similar')
+
+# number of set bits in every possible byte, for Hamming distances
+POPCOUNT = numpy.array([bin(i).count('1') for i in range(256)],
+                       dtype=numpy.uint8)
+
+
+class SimilarityIndex(object):
+    """
+    Top-k Hellinger or cosine search over the rows of `theta`, each a topic
+    distribution named by the matching entry of `ids`.
+
+    Set `bits` to also build an approximate index of that many random
+    hyperplanes. `matrices`, `planes` and `codes` are those of a saved
+    index, which are then used as they are.
+    """
+
+    def __init__(self, ids, theta, bits=0, seed=0, block_size=65536,
+                 matrices=None, planes=None, codes=None):
+        self.ids = list(ids)
+        self.rows = dict((id_, i) for i, id_ in enumerate(self.ids))
+        self.theta = numpy.asarray(theta, dtype=numpy.float32)
+        self.block_size = block_size
+
+        # Hellinger is monotone in the Bhattacharyya coefficient, the dot
+        # product of the square roots; cosine is the dot product of the
+        # unit-length rows
+        if matrices is None:
+            matrices = dict(hellinger=numpy.sqrt(self.theta),
+                            cosine=unit_rows(self.theta))
+        self.matrices = matrices
+
+        self.planes = planes
+        self.codes = codes
+        if planes is None and bits > 0:
+            rng = numpy.random.RandomState(seed)
+            self.planes = rng.standard_normal(
+                (bits, self.theta.shape[1])).astype(numpy.float32)
+            self.codes = self._signatures(self.matrices['cosine'])
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_model(cls, model, corpus, chunksize=2000, **kwargs):
+        """ Infer theta for every document of `corpus`, which must yield
+        (bag-of-words, metadata) pairs, and index it by document id.
+
+        """
+        ids = list()
+        blocks = list()
+        corpus = iter(corpus)
+        while True:
+            chunk = list(itertools.islice(corpus, chunksize))
+            if not chunk:
+                break
+
+            gamma, _ = model.inference([doc for doc, _ in chunk])
+            blocks.append(gamma / gamma.sum(axis=1)[:, numpy.newaxis])
+            ids.extend(meta[0] for _, meta in chunk)
+
+        logger.info('Indexed topics of %d documents' % len(ids))
+        if not blocks:
+            return cls(ids, numpy.zeros((0, model.num_topics)), **kwargs)
+
+        return cls(ids, numpy.vstack(blocks), **kwargs)
+
+    def save(self, fname):
+        numpy.save(fname + '.theta.npy', self.theta)
+        for metric in METRICS:
+            numpy.save(fname + '.%s.npy' % metric, self.matrices[metric])
+
+        if self.planes is not None:
+            numpy.save(fname + '.planes.npy', self.planes)
+            numpy.save(fname + '.codes.npy', self.codes)
+
+        # the ids last, so an index with ids is complete
+        with open(fname + '.ids', 'w') as f:
+            for id_ in self.ids:
+                f.write(id_.encode('utf-8') + '\n')
+
+    @classmethod
+    def load(cls, fname):
+        """ Attach to the index saved at `fname`, without computing anything.
+        Raises IOError if it is missing or incomplete.
+
+        """
+        with open(fname + '.ids') as f:
+            ids = [line.rstrip('\n').decode('utf-8') for line in f]
+
+        load = lambda name: numpy.load(fname + '.%s.npy' % name,
+                                       mmap_mode='r')
+        planes = codes = None
+        if os.path.exists(fname + '.planes.npy'):
+            planes = load('planes')
+            codes = load('codes')
+
+        return cls(ids, load('theta'),
+                   matrices=dict((metric, load(metric))
+                                 for metric in METRICS),
+                   planes=planes, codes=codes)
+
+    def _signatures(self, vectors):
+        bits = numpy.dot(vectors, self.planes.T) > 0
+        return numpy.packbits(bits, axis=1)
+
+    def vector(self, id_):
+        return self.theta[self.rows[id_]]
+
+    def query(self, vector, k=10, metric='hellinger', approximate=False,
+              candidates=None, exclude=None):
+        """ The `k` documents closest to the topic distribution `vector`, as
+        (id, distance) pairs, nearest first.
+
+        With `approximate`, only the `candidates` documents with the nearest
+        signatures (by default 100 per result) are compared exactly.
+
+        """
+        if metric not in METRICS:
+            raise ValueError('metric must be one of %s' % ', '.join(METRICS))
+
+        vector = numpy.asarray(vector, dtype=numpy.float32)
+        vector = vector / vector.sum()
+        if metric == 'hellinger':
+            q = numpy.sqrt(vector)
+        else:
+            q = unit_rows(vector[numpy.newaxis, :])[0]
+
+        want = k + (1 if exclude is not None else 0)
+        matrix = self.matrices[metric]
+
+        if approximate and self.codes is not None:
+            rows = self._candidates(vector, candidates or 100 * want)
+            best_rows, best_scores = top(numpy.dot(matrix[rows], q), want)
+            best_rows = rows[best_rows]
+        else:
+            best_rows = numpy.zeros(0, dtype=numpy.int64)
+            best_scores = numpy.zeros(0, dtype=numpy.float32)
+            for start in range(0, len(self.ids), self.block_size):
+                block = matrix[start:start + self.block_size]
+                rows, scores = top(numpy.dot(block, q), want)
+                best_rows, best_scores = merge(best_rows, best_scores,
+                                               rows + start, scores, want)
+
+        results = list()
+        for row, score in zip(best_rows, best_scores):
+            id_ = self.ids[row]
+            if id_ == exclude:
+                continue
+
+            if metric == 'hellinger':
+                distance = numpy.sqrt(max(0.0, 1.0 - float(score)))
+            else:
+                distance = 1.0 - float(score)
+
+            results.append((id_, distance))
+
+        return results[:k]
+
+    def _candidates(self, vector, count):
+        signature = self._signatures(unit_rows(vector[numpy.newaxis, :]))
+        distances = POPCOUNT[numpy.bitwise_xor(self.codes, signature)].sum(
+            axis=1, dtype=numpy.int32)
+        if count >= len(distances):
+            return numpy.arange(len(distances))
+
+        return numpy.argpartition(distances, count)[:count]
+
+
+def unit_rows(matrix):
+    norms = numpy.sqrt((matrix * matrix).sum(axis=1))
+    norms[norms == 0] = 1.0
+    return matrix / norms[:, numpy.newaxis]
+
+
+def top(scores, k):
+    """ Indices and values of the `k` largest `scores`, largest first. """
+    if k < len(scores):
+        rows = numpy.argpartition(-scores, k)[:k]
+    else:
+        rows = numpy.arange(len(scores))
+
+    order = numpy.argsort(-scores[rows], kind='mergesort')
+    return rows[order], scores[rows][order]
+
+
+def merge(rows_a, scores_a, rows_b, scores_b, k):
+    rows, scores = top(numpy.concatenate([scores_a, scores_b]), k)
+    return numpy.concatenate([rows_a, rows_b])[rows], scores
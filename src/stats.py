@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for describing a corpus in a single pass over its documents.
+
+Per-term collection and document frequencies are kept in arrays indexed
+by word id, and document lengths in a histogram of exact lengths. Nothing
+else is kept per document, so memory grows with the vocabulary, not with
+the corpus. Everything else in the report is derived from these at the
+end:
+- the most and least frequent words, picked with bounded heaps
+- the document length histogram, in power-of-two bins
+- a Zipf fit: a least-squares line through log frequency against log rank
+"""
+
+import heapq
+from collections import Counter
+
+import numpy
+
+import logging
+logger = logging.getLogger('mct.stats')
+
+
+class CorpusStats(object):
+    """
+    Statistics of the bag-of-words documents added to it, for a dictionary
+    of `num_terms` words.
+    """
+
+    def __init__(self, num_terms):
+        self.documents = 0
+        self.tokens = 0
+        self.cf = numpy.zeros(num_terms, dtype=numpy.int64)
+        self.df = numpy.zeros(num_terms, dtype=numpy.int64)
+        self.lengths = Counter()
+
+    @classmethod
+    def of(cls, corpus, num_terms):
+        stats = cls(num_terms)
+        for doc in corpus:
+            stats.add(doc)
+
+        return stats
+
+    def add(self, doc):
+        length = 0
+        if doc:
+            # a word appears once per document, so plain indexing adds up
+            ids, counts = zip(*doc)
+            ids = numpy.fromiter(ids, dtype=numpy.int64, count=len(ids))
+            counts = numpy.fromiter(counts, dtype=numpy.int64,
+                                    count=len(ids))
+            self.cf[ids] += counts
+            self.df[ids] += 1
+            length = int(counts.sum())
+
+        self.documents += 1
+        self.tokens += length
+        self.lengths[length] += 1
+
+    @property
+    def vocabulary(self):
+        """ The number of words that appear in the corpus. """
+        return int(numpy.count_nonzero(self.cf))
+
+    def top(self, k):
+        """ The ids of the `k` most frequent words, most frequent first. """
+        return [id_ for _, id_ in heapq.nlargest(
+            k, ((cf, id_) for id_, cf in enumerate(self.cf.tolist())))]
+
+    def bottom(self, k):
+        """ The ids of the `k` least frequent words that appear at all,
+        least frequent first.
+
+        """
+        return [id_ for _, id_ in heapq.nsmallest(
+            k, ((cf, id_) for id_, cf in enumerate(self.cf.tolist())
+                if cf > 0))]
+
+    def median_length(self):
+        """ The median document length, the lower one of an even split. """
+        seen = 0
+        for length in sorted(self.lengths):
+            seen += self.lengths[length]
+            if 2 * seen >= self.documents:
+                return length
+
+        return None
+
+    def histogram(self):
+        """ Document counts by length, in bins of lengths [0, 0], [1, 1],
+        [2, 3], [4, 7] and so on.
+
+        """
+        bins = Counter()
+        for length, documents in self.lengths.items():
+            bins[length.bit_length()] += documents
+
+        return [dict(min=(1 << b) >> 1, max=(1 << b) - 1,
+                     documents=bins[b]) for b in sorted(bins)]
+
+    def zipf(self):
+        """ The Zipf exponent and the fitted frequency of the most frequent
+        word, with the R² of the fit in log-log space. None when there are
+        fewer than two words.
+
+        """
+        freqs = numpy.sort(self.cf[self.cf > 0])[::-1]
+        if len(freqs) < 2:
+            return None
+
+        x = numpy.log(numpy.arange(1, len(freqs) + 1))
+        y = numpy.log(freqs)
+        slope, intercept = numpy.polyfit(x, y, 1)
+        residual = ((y - (slope * x + intercept)) ** 2).sum()
+        total = ((y - y.mean()) ** 2).sum()
+        return dict(exponent=float(-slope), top=float(numpy.exp(intercept)),
+                    r_squared=float(1 - residual / total) if total else 1.0)
+
+    def report(self, id2word, k=20):
+        """ Everything as one JSON-ready dict, words named by `id2word`. """
+        def words(ids):
+            return [[id2word[id_], int(self.cf[id_]), int(self.df[id_])]
+                    for id_ in ids]
+
+        return dict(documents=self.documents,
+                    tokens=self.tokens,
+                    vocabulary=self.vocabulary,
+                    dictionary=len(self.cf),
+                    mean_length=(float(self.tokens) / self.documents
+                                 if self.documents else None),
+                    median_length=self.median_length(),
+                    length_histogram=self.histogram(),
+                    zipf=self.zipf(),
+                    top=words(self.top(k)),
+                    bottom=words(self.bottom(k)),
+                    document_frequency=dict(
+                        (id2word[id_], int(df))
+                        for id_, df in enumerate(self.df.tolist()) if df))
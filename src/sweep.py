@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for sweeping LDA hyperparameters over one shared corpus.
+
+The corpus is split into training and held-out documents once, so every
+configuration is scored on the same split. A `PackedCorpus` is split by
+position and shared with the workers as is; any other corpus is read into
+memory first.
+Configurations sharing num_topics and alpha form a chain ordered by passes:
+each model after the first continues training the previous one for the
+missing passes instead of starting over. Chains run in parallel on a pool
+of worker processes, which inherit the corpus when forked.
+"""
+
+import itertools
+import random
+import time
+from collections import namedtuple
+from multiprocessing import Pool
+
+import numpy
+from gensim.models import LdaModel
+
+import utils
+
+import logging
+logger = logging.getLogger('mct.sweep')
+
+SweepResult = namedtuple('SweepResult', 'num_topics alpha passes warm_start '
+                         'bound perplexity distinctiveness seconds')
+
+_shared = dict()  # the corpus of a worker process, inherited on fork
+
+
+def _init_worker(training, held_out, id2word, seed, fname):
+    _shared.update(training=training, held_out=held_out, id2word=id2word,
+                   seed=seed, fname=fname)
+
+
+def _train_chain(chain):
+    """ Train the models of one chain, warm-starting each from the last,
+    and evaluate them. Returns a `SweepResult` per model.
+
+    """
+    num_topics, alpha, passes = chain
+    training = _shared['training']
+    held_out = _shared['held_out']
+
+    # chains are seeded by their own key so results do not depend on the
+    # order workers pick them up in
+    numpy.random.seed(hash((_shared['seed'], num_topics, str(alpha)))
+                      % (2 ** 32))
+
+    results = list()
+    model = None
+    done = 0
+    for p in sorted(passes):
+        start = time.time()
+        if model is None:
+            model = LdaModel(training, id2word=_shared['id2word'],
+                             num_topics=num_topics, alpha=alpha, passes=p,
+                             eval_every=0)
+        else:
+            model.update(training, passes=p - done, eval_every=0)
+
+        seconds = time.time() - start
+        bound = model.log_perplexity(held_out)
+        scores = utils.score(model, utils.kullback_leibler_divergence)
+        result = SweepResult(num_topics, alpha, p, done or None, bound,
+                             numpy.exp2(-bound), sum(s for _, s in scores),
+                             seconds)
+        logger.info('Swept %s' % str(result))
+
+        if _shared['fname'] is not None:
+            model.save(_shared['fname'] % result._asdict())
+
+        results.append(result)
+        done = p
+
+    return results
+
+
+class Sweep(object):
+    """
+    A grid over `topics`, `alphas` and `passes`, trained with at most
+    `workers` processes. A `held_out` fraction of the documents is kept
+    aside for perplexity.
+
+    Set `fname` to save every model, formatted with the fields of its
+    `SweepResult`.
+    """
+
+    def __init__(self, topics, alphas, passes, workers=1, held_out=0.1,
+                 seed=0, fname=None):
+        self.chains = [(k, a, sorted(set(passes)))
+                       for k, a in itertools.product(topics, alphas)]
+        self.workers = workers
+        self.held_out = held_out
+        self.seed = seed
+        self.fname = fname
+
+    def __len__(self):
+        return sum(len(passes) for _, _, passes in self.chains)
+
+    def split(self, corpus):
+        """ Split `corpus` into training and held-out documents. """
+        docs = corpus if hasattr(corpus, 'subset') else list(corpus)
+        rng = random.Random(self.seed)
+        held = set(rng.sample(range(len(docs)),
+                              int(self.held_out * len(docs))))
+
+        if docs is corpus:
+            return (corpus.subset([i for i in range(len(corpus))
+                                   if i not in held]),
+                    corpus.subset(sorted(held)))
+
+        training = [doc for i, doc in enumerate(docs) if i not in held]
+        held_out = [doc for i, doc in enumerate(docs) if i in held]
+        return training, held_out
+
+    def run(self, corpus, id2word):
+        """ Yield a `SweepResult` per configuration as chains finish. """
+        training, held_out = self.split(corpus)
+        logger.info('Sweeping %d configurations in %d chains over %d '
+                    'training and %d held-out documents' %
+                    (len(self), len(self.chains), len(training),
+                     len(held_out)))
+
+        args = (training, held_out, id2word, self.seed, self.fname)
+        if self.workers <= 1 or len(self.chains) == 1:
+            _init_worker(*args)
+            for chain in self.chains:
+                for result in _train_chain(chain):
+                    yield result
+            return
+
+        pool = Pool(min(self.workers, len(self.chains)), _init_worker, args)
+        try:
+            for results in pool.imap_unordered(_train_chain, self.chains):
+                for result in results:
+                    yield result
+        finally:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for generating synthetic git repositories for scale testing.
+
+Repositories are written with dulwich only. Objects are buffered and added
+to the object store as packs, and only the trees along a changed path are
+rebuilt for each commit, so histories of a million commits stay feasible.
+"""
+
+import bisect
+import os
+import random
+import stat
+
+import click
+import dulwich.objects
+import dulwich.repo
+
+import logging
+logger = logging.getLogger('mct.synthetic')
+
+SYLLABLES = ['get', 'set', 'is', 'has', 'add', 'remove', 'create', 'build',
+             'parse', 'read', 'write', 'load', 'save', 'find', 'update',
+             'file', 'node', 'tree', 'list', 'map', 'value', 'name', 'index',
+             'buffer', 'stream', 'event', 'handler', 'factory', 'config',
+             'context', 'manager', 'request', 'response', 'cache', 'entry',
+             'key', 'token', 'parser', 'writer', 'reader', 'item', 'state',
+             'XML', 'HTTP', 'URL', 'IO', 'ID', 'UI']
+
+TYPES = ['int', 'long', 'boolean', 'String', 'Object', 'void']
+
+FILE_MODE = 0100644
+
+
+class Vocabulary(object):
+    """
+    Java-like camelCase identifiers, drawn with a Zipf-like skew so a few
+    identifiers are very common and most are rare.
+    """
+
+    def __init__(self, size=2000, skew=1.0, rng=None):
+        self.rng = rng or random.Random(0)
+        words = set()
+        while len(words) < size:
+            parts = [self.rng.choice(SYLLABLES)
+                     for _ in range(self.rng.randint(1, 3))]
+            words.add(parts[0].lower() +
+                      ''.join(p[0].upper() + p[1:] for p in parts[1:]))
+
+        self.words = sorted(words)
+        self.rng.shuffle(self.words)
+
+        self.cumulative = list()
+        total = 0.0
+        for rank in range(len(self.words)):
+            total += 1.0 / (rank + 1) ** skew
+            self.cumulative.append(total)
+
+    def identifier(self):
+        x = self.rng.random() * self.cumulative[-1]
+        return self.words[bisect.bisect(self.cumulative, x)]
+
+    def type_name(self):
+        word = self.identifier()
+        return word[0].upper() + word[1:]
+
+    def line(self):
+        """ A single line of Java-like source. """
+        choice = self.rng.random()
+        if choice < 0.4:
+            return '        %s %s = %s.%s(%s);' % (
+                self.type_name(), self.identifier(), self.identifier(),
+                self.identifier(), self.identifier())
+        elif choice < 0.6:
+            return '    public %s %s(%s %s) {' % (
+                self.rng.choice(TYPES), self.identifier(), self.type_name(),
+                self.identifier())
+        elif choice < 0.75:
+            return '        return %s;' % self.identifier()
+        elif choice < 0.9:
+            return '        // %s' % ' '.join(self.identifier()
+                                               for _ in range(5))
+        else:
+            return '    }'
+
+    def message(self):
+        return ' '.join(self.identifier() for _ in range(
+            self.rng.randint(3, 12)))
+
+
+class RepoGenerator(object):
+    """
+    Writes a synthetic history of `commits` commits to a new repository at
+    `path`, growing towards `files` Java-like files.
+
+    Each commit changes between 1 and `changes` files. A `merge_ratio`
+    fraction of commits are merges of a one-commit side branch, and a
+    `rename_ratio` fraction of file changes are renames. File sizes are drawn
+    between `min_lines` and `max_lines` lines.
+    """
+
+    def __init__(self, path, commits=1000, files=100, merge_ratio=0.05,
+                 rename_ratio=0.01, min_lines=20, max_lines=200, changes=3,
+                 vocabulary=2000, dirs=10, seed=0, batch_size=50000):
+        self.path = path
+        self.commits = commits
+        self.files = files
+        self.merge_ratio = merge_ratio
+        self.rename_ratio = rename_ratio
+        self.min_lines = min_lines
+        self.max_lines = max_lines
+        self.changes = changes
+        self.dirs = dirs
+        self.batch_size = batch_size
+
+        self.rng = random.Random(seed)
+        self.vocabulary = Vocabulary(vocabulary, rng=self.rng)
+
+        self.contents = dict()  # file path => list of lines
+        self.paths = list()  # for choosing a random file cheaply
+        self.trees = {'': dict()}  # dir path => name => (mode, sha)
+        self.dirty = set([''])
+        self.pending = list()
+        self.timestamp = 1400000000
+        self.written = 0
+
+    def generate(self):
+        logger.info('Generating %d commits into %s' % (self.commits,
+                                                       self.path))
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        self.repo = dulwich.repo.Repo.init(self.path)
+
+        for _ in range(max(1, self.files // 10)):
+            self._add_file()
+
+        head = self._commit([])
+        while self.written < self.commits:
+            if (self.written + 1 < self.commits and
+                    self.rng.random() < self.merge_ratio):
+                self._change()
+                side = self._commit([head])
+                self._change()
+                head = self._commit([head, side])
+            else:
+                self._change()
+                head = self._commit([head])
+
+        self._flush()
+        self.repo.refs['refs/heads/master'] = head
+        return self.repo
+
+    def _change(self):
+        """ Apply one commit's worth of file changes to the working state. """
+        remaining = max(1, self.commits - self.written)
+        if self.rng.random() < float(self.files - len(self.paths)) / remaining:
+            self._add_file()
+
+        for _ in range(self.rng.randint(1, self.changes)):
+            path = self.rng.choice(self.paths)
+            if self.rng.random() < self.rename_ratio:
+                path = self._rename_file(path)
+
+            self._modify_file(path)
+
+    def _new_path(self):
+        d = self.rng.randint(0, self.dirs - 1)
+        name = self.vocabulary.type_name()
+        path = 'src/main/java/org/example/pkg%d/%s.java' % (d, name)
+        i = 1
+        while path in self.contents:
+            i += 1
+            path = 'src/main/java/org/example/pkg%d/%s%d.java' % (d, name, i)
+
+        return path
+
+    def _add_file(self):
+        path = self._new_path()
+        lines = self.rng.randint(self.min_lines, self.max_lines)
+        self.contents[path] = [self.vocabulary.line() for _ in range(lines)]
+        self.paths.append(path)
+        self._write_blob(path)
+
+    def _modify_file(self, path):
+        lines = self.contents[path]
+        for _ in range(self.rng.randint(1, 5)):
+            i = self.rng.randint(0, len(lines) - 1)
+            if len(lines) < self.max_lines and self.rng.random() < 0.3:
+                lines.insert(i, self.vocabulary.line())
+            elif len(lines) > self.min_lines and self.rng.random() < 0.3:
+                del lines[i]
+            else:
+                lines[i] = self.vocabulary.line()
+
+        self._write_blob(path)
+
+    def _rename_file(self, path):
+        new_path = self._new_path()
+        self.contents[new_path] = self.contents.pop(path)
+        self.paths[self.paths.index(path)] = new_path
+        self._set_entry(path, None)
+        return new_path
+
+    def _write_blob(self, path):
+        blob = dulwich.objects.Blob.from_string(
+            '\n'.join(self.contents[path]) + '\n')
+        self._add_object(blob)
+        self._set_entry(path, (FILE_MODE, blob.id))
+
+    def _set_entry(self, path, entry):
+        """ Set or, when `entry` is None, remove a tree entry, marking every
+        directory up to the root as in need of rebuilding.
+
+        """
+        dirname, basename = os.path.split(path)
+        if dirname not in self.trees:
+            self.trees[dirname] = dict()
+            self._set_entry(dirname, (stat.S_IFDIR, None))
+
+        if entry is None:
+            del self.trees[dirname][basename]
+        else:
+            self.trees[dirname][basename] = entry
+
+        while True:
+            self.dirty.add(dirname)
+            if dirname == '':
+                break
+            dirname = os.path.dirname(dirname)
+
+    def _build_trees(self):
+        # deepest directories first, so children have their final ids
+        for dirname in sorted(self.dirty, key=lambda d: -d.count('/') -
+                              (d != '')):
+            entries = self.trees[dirname]
+            if not entries and dirname != '':
+                del self.trees[dirname]
+                self._remove_dir(dirname)
+                continue
+
+            tree = dulwich.objects.Tree()
+            for name, (mode, sha) in entries.items():
+                tree.add(name, mode, sha)
+
+            self._add_object(tree)
+            if dirname != '':
+                parent, basename = os.path.split(dirname)
+                self.trees[parent][basename] = (stat.S_IFDIR, tree.id)
+
+        self.dirty = set()
+        return tree.id
+
+    def _remove_dir(self, dirname):
+        parent, basename = os.path.split(dirname)
+        del self.trees[parent][basename]
+
+    def _commit(self, parents):
+        tree = self._build_trees()
+
+        commit = dulwich.objects.Commit()
+        commit.tree = tree
+        commit.parents = parents
+        commit.author = commit.committer = 'Synthetic <synthetic@example.com>'
+        self.timestamp += self.rng.randint(60, 86400)
+        commit.commit_time = commit.author_time = self.timestamp
+        commit.commit_timezone = commit.author_timezone = 0
+        commit.message = self.vocabulary.message() + '\n'
+        self._add_object(commit)
+
+        self.written += 1
+        if self.written % 10000 == 0:
+            logger.info('Generated %d of %d commits' % (self.written,
+                                                        self.commits))
+
+        return commit.id
+
+    def _add_object(self, obj):
+        self.pending.append((obj, None))
+        if len(self.pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.repo.object_store.add_objects(self.pending)
+            self.pending = list()
+
+
+def generate(path, commits=1000, files=100, **kwargs):
+    """ Generate a synthetic repository at `path`, returning the `Repo`.
+    See `RepoGenerator` for the keyword arguments.
+
+    """
+    return RepoGenerator(path, commits, files, **kwargs).generate()
+
+
+@click.command()
+@click.argument('path')
+@click.option('--commits', default=1000)
+@click.option('--files', default=100)
+@click.option('--merge-ratio', default=0.05)
+@click.option('--rename-ratio', default=0.01)
+@click.option('--min-lines', default=20)
+@click.option('--max-lines', default=200)
+@click.option('--changes', default=3, help="Most files changed per commit")
+@click.option('--vocabulary', default=2000, help="Distinct identifiers")
+@click.option('--seed', default=0)
+def main(path, **kwargs):
+    """
+    Generates a synthetic repository for scale testing
+    """
+    logging.basicConfig(format='%(asctime)s : %(levelname)s : ' +
+                        '%(name)s : %(funcName)s : %(message)s')
+    logging.root.setLevel(level=logging.INFO)
+
+    repo = generate(path, **kwargs)
+    logger.info('HEAD of %s is %s' % (path, repo.head()))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,10 @@ import sys
 
 logger = logging.getLogger('mct.utils')
 
+# the distances a `similar.SimilarityIndex` ranks documents by, kept here
+# so the command line can offer them without importing numpy
+SIMILARITY_METRICS = ('hellinger', 'cosine')
+
 
 def kullback_leibler_divergence(q_dist, p_dist, filter_by=0.001):
     assert len(q_dist) == len(p_dist)
@@ -90,9 +94,10 @@ def score(model, fn):
     # thomas et al 2011 msr
     #
     scores = list()
-    for a, topic_a in norm_phi(model):
+    topics = list(norm_phi(model))
+    for a, topic_a in topics:
         score = 0.0
-        for b, topic_b in norm_phi(model):
+        for b, topic_b in topics:
             if a == b:
                 continue
 
@@ -105,9 +110,24 @@ def score(model, fn):
     return scores
 
 
+def get_lambda(model):
+    """ The topic-word weights of an `LdaModel` or a compact model. """
+    if hasattr(model, 'phi'):
+        return model.get_lambda()
+
+    return model.state.get_lambda()
+
+
 def norm_phi(model):
+    if hasattr(model, 'phi'):
+        # compact models are stored normalized
+        for topicid in range(model.num_topics):
+            yield topicid, model.phi[topicid]
+        return
+
+    lam = model.state.get_lambda()
     for topicid in range(model.num_topics):
-        topic = model.state.get_lambda()[topicid]
+        topic = lam[topicid]
         topic = topic / topic.sum()  # normalize to probability dist
         yield topicid, topic
 
@@ -124,3 +144,11 @@ def mkdir(d):
         else:
             print('Failed to create "%s" directory!' % d)
             sys.exit(e.errno)
+
+
+def parse_alpha(value):
+    """ An alpha option is a gensim prior name or a number. """
+    try:
+        return float(value)
+    except ValueError:
+        return value
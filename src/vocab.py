@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for comparing the vocabularies of corpora across projects.
+
+The comparison is a map-reduce. The map step counts the words of one
+Mallet corpus into a term-frequency table: its distinct words as a sorted
+array, with their counts. Tables are independent, so many corpora are
+counted at once, and each table is kept next to its corpus as
+`<corpus>.tf.npz` until the corpus changes.
+
+The reduce step merges every table into one sorted global vocabulary and
+turns each table into the sorted array of its global word ids. Overlaps
+between any two corpora are then intersections of sorted integer arrays,
+however many projects and corpus kinds are compared.
+"""
+
+import csv
+import os
+from collections import Counter, OrderedDict
+from multiprocessing import Pool
+
+import numpy
+
+import logging
+logger = logging.getLogger('mct.vocab')
+
+
+def count_terms(fname):
+    """ The (terms, counts) table of the Mallet corpus `fname`: its
+    distinct words as a sorted array of utf-8 strings and how often each
+    occurs.
+
+    """
+    counts = Counter()
+    with open(fname, 'rb') as f:
+        for line in f:
+            # id, language, then the words of the document
+            counts.update(line.split()[2:])
+
+    terms = numpy.array(sorted(counts), dtype=bytes)
+    return terms, numpy.array([counts[t] for t in terms], dtype=numpy.int64)
+
+
+def load_terms(fname):
+    """ The term-frequency table of the Mallet corpus `fname`, counting it
+    first if no table was kept or it is older than the corpus.
+
+    """
+    table_fname = fname + '.tf.npz'
+    if (os.path.exists(table_fname) and
+            os.path.getmtime(table_fname) >= os.path.getmtime(fname)):
+        with numpy.load(table_fname) as table:
+            return table['terms'], table['counts']
+
+    terms, counts = count_terms(fname)
+    # numpy.savez would add .npz to a name not already ending in it
+    with open(table_fname + '.tmp', 'wb') as f:
+        numpy.savez(f, terms=terms, counts=counts)
+    os.rename(table_fname + '.tmp', table_fname)
+
+    logger.info('Counted %d distinct words of %s' % (len(terms), fname))
+    return terms, counts
+
+
+class Vocabulary(object):
+    """
+    The global vocabulary of the term-frequency `tables`, a mapping of
+    labels to (terms, counts) pairs. Each table becomes the sorted array of
+    the global ids of its terms.
+    """
+
+    def __init__(self, tables):
+        self.labels = list(tables)
+        self.terms = numpy.unique(numpy.concatenate(
+            [terms for terms, _ in tables.values()] +
+            [numpy.array([], dtype=bytes)]))
+
+        self.ids = OrderedDict()
+        self.counts = numpy.zeros(len(self.terms), dtype=numpy.int64)
+        self.tables = numpy.zeros(len(self.terms), dtype=numpy.int64)
+        for label, (terms, counts) in tables.items():
+            # both sides are sorted, so ids come out sorted as well
+            ids = numpy.searchsorted(self.terms, terms)
+            self.ids[label] = ids
+            self.counts[ids] += counts
+            self.tables[ids] += 1
+
+    @classmethod
+    def from_corpora(cls, fnames, workers=1):
+        """ The vocabulary of the Mallet corpora `fnames`, a mapping of
+        labels to file names, counting up to `workers` corpora at once.
+
+        """
+        fnames = OrderedDict(fnames)
+        if workers > 1 and len(fnames) > 1:
+            pool = Pool(min(workers, len(fnames)))
+            try:
+                tables = pool.map(load_terms, list(fnames.values()))
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            tables = [load_terms(fname) for fname in fnames.values()]
+
+        return cls(OrderedDict(zip(fnames, tables)))
+
+    def __len__(self):
+        return len(self.terms)
+
+    def overlap(self):
+        """ The number of words every pair of tables has in common, as a
+        square matrix in label order. The diagonal holds vocabulary sizes.
+
+        """
+        ids = list(self.ids.values())
+        matrix = numpy.zeros((len(ids), len(ids)), dtype=numpy.int64)
+        for i, first in enumerate(ids):
+            matrix[i, i] = len(first)
+            for j in range(i + 1, len(ids)):
+                common = len(numpy.intersect1d(first, ids[j],
+                                               assume_unique=True))
+                matrix[i, j] = matrix[j, i] = common
+
+        return matrix
+
+    def jaccard(self, overlap=None):
+        """ The Jaccard similarity of every pair of table vocabularies. """
+        if overlap is None:
+            overlap = self.overlap()
+
+        sizes = numpy.diag(overlap).astype(float)
+        union = sizes[:, None] + sizes[None, :] - overlap
+        return numpy.where(union > 0, overlap / numpy.maximum(union, 1), 0.0)
+
+    def unique(self, label):
+        """ The words only the table `label` has. """
+        ids = self.ids[label]
+        return self.terms[ids[self.tables[ids] == 1]]
+
+    def save(self, fname):
+        """ Write the global vocabulary, one word per row with its total
+        count and the number of tables that have it.
+
+        """
+        with open(fname, 'w') as f:
+            w = csv.writer(f)
+            w.writerow(['term', 'count', 'tables'])
+            for row in zip(self.terms, self.counts, self.tables):
+                w.writerow(row)
+
+
+def save_matrix(fname, labels, matrix):
+    with open(fname, 'w') as f:
+        w = csv.writer(f)
+        w.writerow([''] + list(labels))
+        for label, row in zip(labels, matrix):
+            w.writerow([label] + list(row))
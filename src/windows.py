@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+"""
+Code for cutting a commit-keyed corpus into time windows and modeling each.
+
+Windows are computed over an already built ChangesetCorpus or
+CommitLogCorpus, whose documents are named by commit. Each window is a
+list of document positions in its document index, so a window is read
+without touching the rest of the corpus. Windows are either spans of
+`days` from the oldest commit or runs of `commits` commits, oldest first,
+so the windows of a longer history start with those of a shorter one.
+
+Every window is named by a hash of its commits. A window model is only
+trained if no model of that name exists yet, so adding a window to a
+history leaves the models of the earlier windows alone.
+"""
+
+import hashlib
+import os
+from collections import namedtuple
+from multiprocessing import Pool
+
+from gensim.models import LdaModel
+
+import logging
+logger = logging.getLogger('mct.windows')
+
+DAY = 24 * 60 * 60
+
+Window = namedtuple('Window', 'number start end key ids positions')
+
+
+def assign(times, days=None, commits=None):
+    """ Group the (commit id, commit time) pairs of `times` into windows of
+    `days` days or of `commits` commits, oldest first. Returns the lists of
+    commit ids of every window, empty windows left out.
+
+    """
+    if (days is None) == (commits is None):
+        raise ValueError('give either days or commits per window')
+
+    ordered = sorted(times, key=lambda t: (t[1], t[0]))
+    windows = list()
+    if commits is not None:
+        for start in range(0, len(ordered), commits):
+            windows.append(ordered[start:start + commits])
+    elif ordered:
+        origin = ordered[0][1]
+        for id_, time in ordered:
+            number = (time - origin) // (days * DAY)
+            if not windows or windows[-1][0] != number:
+                windows.append((number, list()))
+            windows[-1][1].append((id_, time))
+
+        windows = [members for _, members in windows]
+
+    return windows
+
+
+def build(index, commit_time, days=None, commits=None):
+    """ The `Window`s of the corpus with the `DocumentIndex` `index`, where
+    `commit_time(id)` is the commit time of the document `id`.
+
+    """
+    windows = list()
+    for number, members in enumerate(assign(
+            [(id_, commit_time(id_)) for id_ in index.ids], days, commits)):
+        ids = [id_ for id_, _ in members]
+        key = hashlib.sha1(' '.join(sorted(ids)).encode('utf-8'))
+        key = key.hexdigest()[:12]
+        windows.append(Window(number, members[0][1], members[-1][1], key,
+                              ids, [index.position(id_) for id_ in ids]))
+
+    return windows
+
+
+def save(fname, windows):
+    with open(fname, 'w') as f:
+        f.write('window,start,end,key,id,position\n')
+        for window in windows:
+            for id_, position in zip(window.ids, window.positions):
+                f.write('%d,%d,%d,%s,%s,%d\n' % (window.number, window.start,
+                                                 window.end, window.key, id_,
+                                                 position))
+
+
+class WindowModels(object):
+    """
+    LDA models of each window of `corpus`, a `PackedCorpus` or `CorpusView`
+    with the documents the windows were built from, saved as
+    `model_fname % window.key`.
+
+    With `warm`, each model starts from the topics of the previous window's
+    model, so consecutive windows are trained in order. Otherwise windows
+    are independent and trained on up to `workers` processes.
+    """
+
+    def __init__(self, corpus, model_fname, warm=True, workers=1,
+                 **kwargs):
+        self.corpus = corpus
+        self.model_fname = model_fname
+        self.warm = warm
+        self.workers = workers
+        self.kwargs = kwargs  # num_topics, alpha, passes
+
+    def train(self, windows):
+        """ Train the missing window models, returning all their names. """
+        fnames = [self.model_fname % window.key for window in windows]
+        missing = [window for window, fname in zip(windows, fnames)
+                   if not os.path.exists(fname)]
+        logger.info('Training %d of %d window models' % (len(missing),
+                                                         len(windows)))
+
+        if self.warm:
+            previous = None
+            for window, fname in zip(windows, fnames):
+                if os.path.exists(fname):
+                    previous = fname
+                    continue
+
+                self._train(window, previous)
+                previous = fname
+        elif self.workers > 1 and len(missing) > 1:
+            pool = Pool(min(self.workers, len(missing)))
+            try:
+                pool.map(_train_window, [(self, window) for window in missing])
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            for window in missing:
+                self._train(window)
+
+        return fnames
+
+    def _train(self, window, previous=None):
+        corpus = self.corpus.subset(window.positions)
+        model = LdaModel(id2word=self.corpus.id2word,
+                         num_topics=self.kwargs['num_topics'],
+                         alpha=self.kwargs['alpha'],
+                         passes=self.kwargs['passes'])
+        if previous is not None:
+            # start from the topics the previous window ended with
+            model.state.sstats[...] = LdaModel.load(previous).state.sstats
+            model.sync_state()
+
+        logger.info('Training window %d (%s) of %d documents' %
+                    (window.number, window.key, len(corpus)))
+        model.update(corpus)
+        model.save(self.model_fname % window.key)
+
+
+def _train_window(args):
+    models, window = args
+    models._train(window)
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+import os.path
+import tarfile
+
+module_path = os.path.dirname(__file__)
+datapath = lambda fname: os.path.join(module_path, u'test_data', fname)
+
+
+def extract_repo():
+    """ Extract the test repository `test_data/multitext_git/` from its
+    tarball, unless an earlier module already did.
+
+    """
+    if not os.path.exists(datapath(u'multitext_git/')):
+        with tarfile.open(datapath(u'multitext_git.tar.gz')) as tar:
+            tar.extractall(datapath(''))
+
+
+def setup():
+    extract_repo()
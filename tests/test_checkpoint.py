@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import os.path
+import shutil
+import tempfile
+
+import numpy
+from nose.tools import *
+import dulwich.repo
+from gensim.corpora import MalletCorpus
+from gensim.models import LdaModel
+
+from src.checkpoint import CorpusCheckpoint, ModelCheckpoint
+from src.corpora import MultiTextCorpus, ChangesetCorpus, CommitLogCorpus
+from tests import extract_repo
+
+# datapath is now a useful function for building paths to test files
+module_path = os.path.dirname(__file__)
+datapath = lambda fname: os.path.join(module_path, u'test_data', fname)
+
+
+def setup_module():
+    extract_repo()
+
+
+class Preempted(Exception):
+    pass
+
+
+def preempt(documents, after):
+    """ Stop a build after `after` documents, as if the host went away. """
+    for i, doc in enumerate(documents):
+        if i == after:
+            raise Preempted()
+
+        yield doc
+
+
+class TestCorpusCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.repo = dulwich.repo.Repo(datapath(u'multitext_git/'))
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def corpus(self, Kind):
+        corpus = Kind(self.repo, min_len=0, remove_stops=False,
+                      lazy_dict=True)
+        corpus.metadata = True
+        return corpus
+
+    def read(self, fname, id2word):
+        return list(MalletCorpus(fname, id2word=id2word, metadata=True))
+
+    def check_resume(self, Kind):
+        expected_fname = os.path.join(self.path, 'expected.mallet')
+        corpus = self.corpus(Kind)
+        MalletCorpus.serialize(expected_fname, corpus, id2word=corpus.id2word,
+                               metadata=True)
+        expected = self.read(expected_fname, corpus.id2word)
+
+        fname = os.path.join(self.path, Kind.__name__ + '.mallet')
+        checkpoint = CorpusCheckpoint(fname, key='HEAD', every=2)
+        corpus = self.corpus(Kind)
+        with self.assertRaises(Preempted):
+            checkpoint.serialize(preempt(corpus, 3), corpus.id2word)
+
+        progress = checkpoint.load()
+        self.assertEqual(progress['documents'], 2)
+        self.assertEqual(progress['last'], expected[1][1][0])
+
+        corpus = self.corpus(Kind)
+        corpus.id2word = progress['id2word']
+        corpus.resume_after = progress['last']
+        checkpoint.serialize(corpus, corpus.id2word, progress)
+
+        self.assertEqual(self.read(fname, corpus.id2word), expected)
+        self.assertEqual(len(MalletCorpus(fname)), len(expected))
+
+        # the dictionary replayed from the chunks continues as if unbroken
+        unbroken = self.corpus(Kind)
+        list(unbroken)
+        self.assertEqual(corpus.id2word.token2id, unbroken.id2word.token2id)
+        self.assertEqual(corpus.id2word.dfs, unbroken.id2word.dfs)
+        self.assertEqual(corpus.id2word.num_docs, unbroken.id2word.num_docs)
+
+    def test_multitext(self):
+        self.check_resume(MultiTextCorpus)
+
+    def test_changeset(self):
+        self.check_resume(ChangesetCorpus)
+
+    def test_commit_log(self):
+        self.check_resume(CommitLogCorpus)
+
+    def test_other_key(self):
+        fname = os.path.join(self.path, 'corpus.mallet')
+        corpus = self.corpus(CommitLogCorpus)
+        checkpoint = CorpusCheckpoint(fname, key='HEAD', every=2)
+        with self.assertRaises(Preempted):
+            checkpoint.serialize(preempt(corpus, 3), corpus.id2word)
+
+        self.assertIsNotNone(checkpoint.load())
+        self.assertIsNone(CorpusCheckpoint(fname, key='other').load())
+
+        checkpoint.clear()
+        self.assertIsNone(checkpoint.load())
+
+
+class TestModelCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        repo = dulwich.repo.Repo(datapath(u'multitext_git/'))
+        corpus = ChangesetCorpus(repo, min_len=0, remove_stops=False)
+        self.id2word = corpus.id2word
+        self.corpus = list(corpus) * 10
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_same_as_single_run(self):
+        numpy.random.seed(3)
+        expected = LdaModel(self.corpus, id2word=self.id2word, num_topics=3,
+                            passes=3)
+
+        fname = os.path.join(self.path, 'model.lda')
+        numpy.random.seed(3)
+        ModelCheckpoint(fname).train(self.corpus, 2, id2word=self.id2word,
+                                     num_topics=3)
+
+        # a later run resumes after the second pass
+        numpy.random.seed(7)
+        model = ModelCheckpoint(fname).train(self.corpus, 3,
+                                             id2word=self.id2word,
+                                             num_topics=3)
+
+        numpy.testing.assert_allclose(model.state.get_lambda(),
+                                      expected.state.get_lambda())
+        self.assertEqual(sorted(os.listdir(fname + '.checkpoint')),
+                         ['pass-003', 'pass-003.state', 'progress'])
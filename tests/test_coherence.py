@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import itertools
+import math
+
+from nose.tools import *
+from gensim.corpora import Dictionary
+from gensim.models import LdaModel
+
+from src.coherence import Cooccurrence, coherence, top_ids
+
+
+class TestCoherence(unittest.TestCase):
+    def setUp(self):
+        self.texts = [[u'human', u'interface', u'computer'],
+                      [u'survey', u'user', u'computer', u'system',
+                       u'response'],
+                      [u'eps', u'user', u'interface', u'system'],
+                      [u'system', u'human', u'system', u'eps'],
+                      [u'user', u'response', u'time'],
+                      [u'trees'],
+                      [u'graph', u'trees'],
+                      [u'graph', u'minors', u'trees'],
+                      [u'graph', u'minors', u'survey']]
+        self.id2word = Dictionary(self.texts)
+        self.corpus = [self.id2word.doc2bow(text) for text in self.texts]
+
+    def ids(self, *words):
+        return [self.id2word.token2id[word] for word in words]
+
+    def brute_df(self, *words):
+        return sum(1 for text in self.texts
+                   if all(word in text for word in words))
+
+    def test_counts(self):
+        words = self.ids(u'system', u'user', u'graph', u'trees')
+        counts = Cooccurrence(words, self.corpus, chunksize=2)
+        self.assertEqual(counts.num_docs, 9)
+        for a, b in itertools.product(words, words):
+            wa, wb = self.id2word[a], self.id2word[b]
+            self.assertEqual(counts.co_doc_freq(a, b), self.brute_df(wa, wb))
+
+        # repeated words count once per document
+        self.assertEqual(counts.doc_freq(words[0]), 3)
+
+    def test_umass(self):
+        topic = self.ids(u'graph', u'trees', u'minors')
+        counts = Cooccurrence(topic, self.corpus)
+        # trees|graph, minors|graph, minors|trees
+        expected = (math.log((2 + 1.0) / 3) +
+                    math.log((2 + 1.0) / 3) + math.log((1 + 1.0) / 3))
+        self.assertAlmostEqual(counts.umass(topic), expected)
+
+    def test_npmi(self):
+        topic = self.ids(u'graph', u'minors', u'human')
+        counts = Cooccurrence(topic, self.corpus)
+        p_gm = 2 / 9.0
+        graph_minors = (math.log(p_gm / ((3 / 9.0) * (2 / 9.0))) /
+                        -math.log(p_gm))
+        # the other two pairs never co-occur
+        self.assertAlmostEqual(counts.npmi(topic),
+                               (graph_minors - 1.0 - 1.0) / 3)
+
+    def test_coherence(self):
+        model = LdaModel(self.corpus, id2word=self.id2word, num_topics=2,
+                         passes=5)
+        umass, npmi = coherence(model, self.corpus, topn=4)
+        self.assertEqual(len(umass), 2)
+        self.assertEqual(len(npmi), 2)
+        for topic in top_ids(model, 4):
+            self.assertEqual(len(topic), 4)
+        for score in npmi:
+            self.assertTrue(-1.0 <= score <= 1.0)
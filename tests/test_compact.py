@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import json
+import os.path
+import shutil
+import tempfile
+
+import numpy
+from nose.tools import *
+from gensim.corpora import MalletCorpus, Dictionary
+from gensim.models import LdaModel
+
+from src import utils
+from src.compact import CompactModel
+
+
+class TestCompactModel(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.corpus_fname = os.path.join(self.path, 'corpus.mallet')
+        texts = [[u'human', u'interface', u'computer'],
+                 [u'survey', u'user', u'computer', u'system', u'response'],
+                 [u'eps', u'user', u'interface', u'system'],
+                 [u'system', u'human', u'system', u'eps'],
+                 [u'user', u'response', u'time'],
+                 [u'trees'],
+                 [u'graph', u'trees'],
+                 [u'graph', u'minors', u'trees'],
+                 [u'graph', u'minors', u'survey']]
+        id2word = Dictionary(texts)
+        id2word.save(self.corpus_fname + '.dict')
+        MalletCorpus.serialize(self.corpus_fname,
+                               [id2word.doc2bow(text) for text in texts],
+                               id2word=id2word)
+
+        self.corpus = MalletCorpus(self.corpus_fname, id2word=id2word)
+        self.model = LdaModel(self.corpus, id2word=id2word, num_topics=3,
+                              passes=5)
+        self.fname = os.path.join(self.path, 'model.compact')
+        CompactModel.export(self.model, self.fname,
+                            corpus_fname=self.corpus_fname, commit='abc123',
+                            top_n=4)
+        self.compact = CompactModel.load(self.fname)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_header(self):
+        with open(self.fname + '.json') as f:
+            header = json.load(f)
+
+        self.assertEqual(header['num_topics'], 3)
+        self.assertEqual(header['commit'], 'abc123')
+        self.assertEqual(header['top_n'], 4)
+        self.assertEqual(len(header['corpus_sha1']), 40)
+        numpy.testing.assert_allclose(header['alpha'], self.model.alpha)
+
+    def test_phi(self):
+        self.assertIsInstance(self.compact.phi, numpy.memmap)
+        self.assertEqual(self.compact.phi.dtype, numpy.float32)
+        numpy.testing.assert_allclose(self.compact.phi.sum(axis=1),
+                                      numpy.ones(3), rtol=1e-5)
+        numpy.testing.assert_allclose(self.compact.get_lambda(),
+                                      self.model.state.get_lambda(),
+                                      rtol=1e-5)
+
+    def test_show_topic(self):
+        for topicid in range(3):
+            expected = self.model.show_topic(topicid, 4)
+            # from the stored top words
+            result = self.compact.show_topic(topicid, 4)
+            self.assertEqual([w for _, w in result], [w for _, w in expected])
+            # and from phi itself
+            result = self.compact.show_topic(topicid, 6)
+            self.assertEqual([w for _, w in result[:4]],
+                             [w for _, w in expected])
+
+    def test_score(self):
+        expected = utils.score(self.model, utils.kullback_leibler_divergence)
+        result = utils.score(self.compact, utils.kullback_leibler_divergence)
+        for (a, x), (b, y) in zip(expected, result):
+            self.assertEqual(a, b)
+            self.assertAlmostEqual(x, y, places=4)
+
+    def test_inference(self):
+        bow = self.compact.id2word.doc2bow([u'graph', u'minors', u'trees'])
+        numpy.random.seed(0)
+        expected, _ = self.model.inference([bow])
+        numpy.random.seed(0)
+        result, _ = self.compact.inference([bow])
+        numpy.testing.assert_allclose(result, expected, rtol=1e-3)
+
+        topics = self.compact[bow]
+        self.assertAlmostEqual(sum(p for _, p in topics), 1.0, places=1)
+
+    def test_version(self):
+        with open(self.fname + '.json') as f:
+            header = json.load(f)
+
+        header['version'] = 0
+        with open(self.fname + '.json', 'w') as f:
+            json.dump(header, f)
+
+        with self.assertRaises(ValueError):
+            CompactModel.load(self.fname)
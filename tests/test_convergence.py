@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import os
+import os.path
+import shutil
+import tempfile
+
+import numpy
+from nose.tools import *
+import dulwich.repo
+from gensim.corpora import MalletCorpus
+
+from src.checkpoint import ModelCheckpoint
+from src.convergence import Convergence, split
+from src.corpora import ChangesetCorpus
+from src.docindex import CorpusView
+from tests import extract_repo
+
+# datapath is now a useful function for building paths to test files
+module_path = os.path.dirname(__file__)
+datapath = lambda fname: os.path.join(module_path, u'test_data', fname)
+
+
+def setup_module():
+    extract_repo()
+
+
+class FakeModel(object):
+    """ Reports the next of `bounds` every time it is measured. """
+
+    def __init__(self, bounds):
+        self.bounds = iter(bounds)
+
+    def log_perplexity(self, corpus):
+        return next(self.bounds)
+
+
+class TestConvergence(unittest.TestCase):
+    def test_stops_below_tolerance(self):
+        # perplexities 16, 8, 7.5, 7.4
+        model = FakeModel([-4, -3, numpy.log2(1 / 7.5), numpy.log2(1 / 7.4)])
+        convergence = Convergence([], tolerance=0.1)
+        self.assertEqual([convergence.update(model) for _ in range(4)],
+                         [False, False, True, True])
+        self.assertAlmostEqual(convergence.improvement, 0.1 / 7.5)
+
+    def test_min_passes(self):
+        model = FakeModel([-4, -4, -4])
+        convergence = Convergence([], tolerance=0.1, min_passes=3)
+        self.assertEqual([convergence.update(model) for _ in range(3)],
+                         [False, False, True])
+
+    def test_worse_is_converged(self):
+        convergence = Convergence([], tolerance=0.1)
+        convergence.curve = [-3, -4]
+        self.assertTrue(convergence.converged)
+
+
+class TestTraining(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        repo = dulwich.repo.Repo(datapath(u'multitext_git/'))
+        corpus = ChangesetCorpus(repo, min_len=0, remove_stops=False)
+        corpus.metadata = True
+        self.id2word = corpus.id2word
+        fname = os.path.join(self.path, 'corpus.mallet')
+        MalletCorpus.save_corpus(fname + '.once', corpus,
+                                 id2word=self.id2word, metadata=True)
+        with open(fname + '.once') as f:
+            documents = f.read()
+
+        # enough documents for a held-out sample of more than one
+        with open(fname, 'w') as f:
+            f.write(documents * 10)
+
+        self.corpus = CorpusView(fname, self.id2word)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_split(self):
+        training, held_out = split(self.corpus)
+        self.assertEqual(len(held_out), max(1, len(self.corpus) // 20))
+        self.assertEqual(sorted(training.positions + held_out.positions),
+                         range(len(self.corpus)))
+        self.assertEqual(split(self.corpus)[1].positions, held_out.positions)
+
+    def test_stops_early(self):
+        training, held_out = split(self.corpus)
+        convergence = Convergence(held_out, tolerance=0.5)
+        convergence.train(training, 20, id2word=self.id2word,
+                          num_topics=2)
+        self.assertTrue(convergence.converged)
+        self.assertLess(convergence.passes, 20)
+        self.assertEqual(len(convergence.curve), convergence.passes)
+
+        fname = os.path.join(self.path, 'model.lda.convergence')
+        convergence.save(fname)
+        with open(fname) as f:
+            self.assertEqual(len(f.readlines()), convergence.passes + 1)
+
+    def test_checkpoint_resumes_curve(self):
+        training, held_out = split(self.corpus)
+        fname = os.path.join(self.path, 'model.lda')
+        first = Convergence(held_out, tolerance=0.0, min_passes=10)
+        ModelCheckpoint(fname).train(training, 2, convergence=first,
+                                     id2word=self.id2word, num_topics=2)
+
+        # a later run with more passes picks the curve up where it was
+        resumed = Convergence(held_out, tolerance=0.0, min_passes=10)
+        ModelCheckpoint(fname).train(training, 3, convergence=resumed,
+                                     id2word=self.id2word, num_topics=2)
+        self.assertEqual(resumed.curve[:2], first.curve)
+        self.assertEqual(resumed.passes, 3)
@@ -13,17 +13,30 @@ if __name__ == '__main__':
 
 import unittest
 import os.path
+import shutil
+import tempfile
 from io import StringIO
 
 from nose.tools import *
 import dulwich.repo
+import dulwich.patch
 
-from src.corpora import MultiTextCorpus, ChangesetCorpus
+from src.corpora import (MultiTextCorpus, ChangesetCorpus, CommitLogCorpus,
+                         SnapshotCorpus)
+from src.history import HistoryIndex
+from src.paths import PathFilter
+from src.pipeline import Pipeline
+from tests import extract_repo
 
 # datapath is now a useful function for building paths to test files
 module_path = os.path.dirname(__file__)
 datapath = lambda fname: os.path.join(module_path, u'test_data', fname)
 
+
+def setup_module():
+    extract_repo()
+
+
 class TestMultitextCorpus(unittest.TestCase):
     def setUp(self):
         self.basepath = datapath(u'multitext_git/')
@@ -362,14 +375,6 @@ class TestMultitextCorpusAtRef(unittest.TestCase):
 class TestChangesetCorpus(unittest.TestCase):
     def setUp(self):
         self.basepath = datapath(u'multitext_git/')
-        if not os.path.exists(self.basepath):
-            extraction_path = datapath('')
-            gz = datapath(u'multitext_git.tar.gz')
-
-            import tarfile
-            with tarfile.open(gz) as tar:
-                tar.extractall(extraction_path)
-
         self.repo = dulwich.repo.Repo(self.basepath)
         self.corpus = ChangesetCorpus(self.repo,
                 remove_stops=False,
@@ -574,3 +579,270 @@ class TestChangesetCorpus(unittest.TestCase):
             # term ids ahead of time for testing.
             textdoc = set((unicode(self.corpus.id2word[x[0]]), x[1]) for x in doc)
             self.assertIn(textdoc, documents)
+
+
+class TestChangesetCorpusLimits(unittest.TestCase):
+    def setUp(self):
+        self.basepath = datapath(u'multitext_git/')
+        self.repo = dulwich.repo.Repo(self.basepath)
+        self.systems = u'2aeb2e7c78259833e1218b69f99dab3acd00970c'
+
+    def corpus(self, **kwargs):
+        corpus = ChangesetCorpus(self.repo,
+                remove_stops=False,
+                lower=True,
+                split=True,
+                min_len=0,
+                lazy_dict=True,
+                **kwargs)
+        corpus.metadata = True
+        return corpus
+
+    def test_unlimited(self):
+        corpus = self.corpus()
+        docs = list(corpus.get_texts())
+        self.assertEqual(len(docs), 5)
+        self.assertEqual(corpus.limits, dict())
+
+    def test_commit_files(self):
+        corpus = self.corpus(max_commit_files=1)
+        docs = dict((meta[0], doc) for doc, meta in corpus.get_texts())
+
+        self.assertEqual(len(docs), 5)
+        self.assertEqual(sorted(docs[self.systems]),
+                         sorted([u'graph', u'minors', u'a', u'survey']))
+        self.assertIn((u'commit_files', '', u'truncate', 1, 3),
+                      corpus.limits[self.systems])
+
+    def test_file_tokens(self):
+        corpus = self.corpus(max_file_tokens=2)
+        docs = dict((meta[0], doc) for doc, meta in corpus.get_texts())
+
+        self.assertEqual(len(docs[self.systems]), 6)
+        self.assertEqual(len(corpus.limits[self.systems]), 3)
+
+    def test_commit_tokens_truncate(self):
+        corpus = self.corpus(max_commit_tokens=5)
+        for doc, meta in corpus.get_texts():
+            self.assertLessEqual(len(doc), 5)
+
+        decision = corpus.limits[self.systems][0]
+        self.assertEqual(decision, (u'commit_tokens', '', u'truncate', 5, None))
+
+    def test_commit_tokens_truncate_at_file(self):
+        # the first file has exactly the 4 tokens allowed, the others are
+        # skipped without being read
+        corpus = self.corpus(max_commit_tokens=4)
+        docs = dict((meta[0], doc) for doc, meta in corpus.get_texts())
+
+        self.assertEqual(sorted(docs[self.systems]),
+                         sorted([u'graph', u'minors', u'a', u'survey']))
+        self.assertEqual(corpus.limits[self.systems],
+                         [(u'commit_tokens', '', u'truncate', 4, None)])
+
+    def test_commit_tokens_sample(self):
+        corpus = self.corpus(max_commit_tokens=5, limit_strategy='sample')
+        docs = dict((meta[0], doc) for doc, meta in corpus.get_texts())
+
+        self.assertEqual(len(docs[self.systems]), 5)
+        self.assertEqual(corpus.limits[self.systems],
+                         [(u'commit_tokens', '', u'sample', 5, 12)])
+
+        # sampling is seeded per commit, rebuilding gives the same corpus
+        again = dict((meta[0], doc) for doc, meta in corpus.get_texts())
+        self.assertEqual(docs, again)
+
+    def test_bad_strategy(self):
+        self.assertRaises(ValueError, self.corpus, limit_strategy='nope')
+
+
+class TestHistoryIndexCorpus(unittest.TestCase):
+    def setUp(self):
+        self.basepath = datapath(u'multitext_git/')
+        self.repo = dulwich.repo.Repo(self.basepath)
+        self.tmpdir = tempfile.mkdtemp()
+        self.history = HistoryIndex.open(self.repo, self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def texts(self, Kind, history=None):
+        corpus = Kind(self.repo,
+                remove_stops=False,
+                lower=True,
+                split=True,
+                min_len=0,
+                lazy_dict=True,
+                history=history)
+        corpus.metadata = True
+        return [(list(doc), meta) for doc, meta in corpus.get_texts()]
+
+    def test_same_texts(self):
+        for Kind in [ChangesetCorpus, CommitLogCorpus]:
+            self.assertEqual(self.texts(Kind, self.history),
+                             self.texts(Kind))
+
+    def test_reopen(self):
+        history = HistoryIndex.open(self.repo, self.tmpdir)
+        self.assertEqual(history.commits, self.history.commits)
+        self.assertEqual(len(history), 5)
+        self.assertEqual(self.texts(ChangesetCorpus, history),
+                         self.texts(ChangesetCorpus))
+
+    def test_messages(self):
+        walked = [entry.commit for entry in self.repo.get_walker()]
+        indexed = list(self.history.walk(messages=True))
+        self.assertEqual([c.id for c in indexed], [c.id for c in walked])
+        self.assertEqual([c.message for c in indexed],
+                         [c.message for c in walked])
+        self.assertEqual([c.parents for c in indexed],
+                         [c.parents for c in walked])
+
+
+class TestPipelinedCorpus(unittest.TestCase):
+    def setUp(self):
+        self.basepath = datapath(u'multitext_git/')
+        self.repo = dulwich.repo.Repo(self.basepath)
+
+    def texts(self, Kind, **kwargs):
+        corpus = Kind(self.repo,
+                remove_stops=False,
+                lower=True,
+                split=True,
+                min_len=0,
+                lazy_dict=True,
+                **kwargs)
+        corpus.metadata = True
+        texts = [(list(doc), meta) for doc, meta in corpus.get_texts()]
+        self.assertEqual(len(corpus), len(texts))
+        return texts
+
+    def test_threads(self):
+        pipeline = Pipeline(2, 2, tokenize_processes=False, queue_size=2)
+        for Kind in [MultiTextCorpus, ChangesetCorpus, CommitLogCorpus]:
+            self.assertEqual(self.texts(Kind, pipeline=pipeline),
+                             self.texts(Kind))
+
+    def test_processes(self):
+        pipeline = Pipeline(1, 2, fetch_processes=True, queue_size=1)
+        for Kind in [MultiTextCorpus, ChangesetCorpus, CommitLogCorpus]:
+            self.assertEqual(self.texts(Kind, pipeline=pipeline),
+                             self.texts(Kind))
+
+    def test_inline_limits(self):
+        pipeline = Pipeline(0, 0)
+        corpus = ChangesetCorpus(self.repo, lazy_dict=True, min_len=0,
+                                 max_commit_files=1, pipeline=pipeline)
+        list(corpus.get_texts())
+        self.assertEqual(len(corpus.limits), 4)
+
+
+class TestPathScopedCorpus(unittest.TestCase):
+    def setUp(self):
+        self.basepath = datapath(u'multitext_git/')
+        self.repo = dulwich.repo.Repo(self.basepath)
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = PathFilter(exclude=['c'])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def texts(self, Kind, **kwargs):
+        corpus = Kind(self.repo, remove_stops=False, min_len=0,
+                      lazy_dict=True, **kwargs)
+        corpus.metadata = True
+        return [(list(doc), meta) for doc, meta in corpus.get_texts()]
+
+    def test_multitext(self):
+        texts = self.texts(MultiTextCorpus, paths=self.paths)
+        self.assertEqual([fname for _, (fname, _) in texts],
+                         [fname for _, (fname, _)
+                          in self.texts(MultiTextCorpus)
+                          if not fname.startswith('c/')])
+
+    def test_changeset(self):
+        texts = self.texts(ChangesetCorpus, paths=self.paths)
+        self.assertNotEqual(texts, self.texts(ChangesetCorpus))
+        self.assertEqual(self.texts(ChangesetCorpus, paths=PathFilter()),
+                         self.texts(ChangesetCorpus))
+
+        history = HistoryIndex.open(self.repo, self.tmpdir)
+        self.assertEqual(self.texts(ChangesetCorpus, paths=self.paths,
+                                    history=history), texts)
+
+    def test_snapshots(self):
+        corpus = SnapshotCorpus(self.repo, ['HEAD'], lazy_dict=True,
+                                paths=self.paths)
+        list(corpus.get_texts())
+        self.assertEqual([path for path, _ in corpus.snapshots['HEAD']],
+                         ['7.txt', 'a/0.txt', 'a/1.txt', 'b/2.txt',
+                          'b/3.txt', 'dos.txt', 'mac.txt', 'unix.txt'])
+
+
+class TestSnapshotCorpus(unittest.TestCase):
+    def setUp(self):
+        self.basepath = datapath(u'multitext_git/')
+        self.repo = dulwich.repo.Repo(self.basepath)
+        self.refs = ['3587d37e7d476ddc7b673c41762dc89c8ca63a6a',
+                     'f33a0fb070a34fc1b9105453b3ffb4edc49131d9',
+                     'HEAD']
+
+    def texts(self, refs, **kwargs):
+        corpus = SnapshotCorpus(self.repo, refs,
+                remove_stops=False,
+                lower=True,
+                split=True,
+                min_len=0,
+                lazy_dict=True,
+                **kwargs)
+        corpus.metadata = True
+        texts = [(list(doc), meta) for doc, meta in corpus.get_texts()]
+        return corpus, texts
+
+    def test_unique_blobs(self):
+        corpus, texts = self.texts(self.refs)
+        blobs = [meta[0] for _, meta in texts]
+        self.assertEqual(len(blobs), len(set(blobs)))
+        self.assertEqual(len(corpus), len(texts))
+
+        # binary blobs are listed without a document
+        listed = set(blob for ref in self.refs
+                     for _, blob in corpus.snapshots[ref])
+        self.assertTrue(set(blobs) < listed)
+        for blob in listed - set(blobs):
+            self.assertTrue(dulwich.patch.is_binary(
+                self.repo.object_store.get_raw(blob)[1]))
+
+    def test_snapshots(self):
+        corpus, texts = self.texts(self.refs)
+        for ref in self.refs:
+            tree = self.repo[self.repo[ref].id].tree
+            expected = [(entry.path, entry.sha) for entry in
+                        self.repo.object_store.iter_tree_contents(tree)]
+            self.assertEqual(corpus.snapshots[ref], expected)
+
+        # the same words as the single snapshot corpus, blob for path
+        head, head_texts = self.texts(['HEAD'])
+        multitext = MultiTextCorpus(self.repo, remove_stops=False,
+                                    min_len=0, lazy_dict=True)
+        multitext.metadata = True
+        words = dict((blob, doc) for doc, (blob, _) in head_texts)
+        paths = dict(head.snapshots['HEAD'])
+        for doc, (path, _) in multitext.get_texts():
+            self.assertEqual(list(doc), words[paths[path]])
+
+    def test_known(self):
+        first, first_texts = self.texts(self.refs[:2])
+        known = set(meta[0] for _, meta in first_texts)
+        corpus, texts = self.texts(self.refs[2:], known=known)
+        _, everything = self.texts(self.refs)
+
+        self.assertEqual(len(first_texts) + len(texts), len(everything))
+        for _, meta in texts:
+            self.assertNotIn(meta[0], known)
+
+    def test_tag(self):
+        corpus = SnapshotCorpus(self.repo, ['master'], lazy_dict=True)
+        self.assertEqual(corpus.commits['master'], self.repo.head())
+        with self.assertRaises(KeyError):
+            SnapshotCorpus(self.repo, ['no-such-release'], lazy_dict=True)
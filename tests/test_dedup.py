@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import random
+
+from nose.tools import *
+
+from src.dedup import Deduplicator, choose_bands, resolve
+
+
+class TestDeduplicator(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        base = sorted(rng.sample(range(5000), 200))
+        near = base[:195] + [6000, 6001, 6002, 6003, 6004]
+        other = sorted(rng.sample(range(5000), 200))
+        self.docs = [([(i, 1) for i in base], ('a', 'en')),
+                     ([(i, 2) for i in other], ('b', 'en')),
+                     ([(i, 1) for i in near], ('c', 'en')),
+                     ([], ('d', 'en')),
+                     ([], ('e', 'en')),
+                     ([(i, 1) for i in base], ('f', 'en'))]
+
+    def test_drops_duplicates(self):
+        dedup = Deduplicator(self.docs, threshold=0.8)
+        kept = [meta[0] for _, meta in dedup]
+
+        self.assertEqual(kept, ['a', 'b', 'd', 'e'])
+        self.assertEqual(set(dedup.duplicates), set(['c', 'f']))
+        self.assertEqual(dedup.duplicates['c'][0], 'a')
+        self.assertEqual(dedup.duplicates['f'], ('a', 1.0))
+        self.assertGreater(dedup.duplicates['c'][1], 0.8)
+
+    def test_restore(self):
+        # the changes of two chunks, as a checkpointed build saves them
+        first = Deduplicator(self.docs[:3], threshold=0.8)
+        changes = list()
+        for _, meta in first:
+            if meta[0] == 'b':
+                changes.append(first.changes())
+        changes.append(first.changes())
+        self.assertEqual([len(c['signatures']) for c in changes], [2, 0])
+        self.assertEqual(changes[1]['duplicates'].keys(), ['c'])
+
+        resumed = Deduplicator(self.docs[3:], threshold=0.8)
+        resumed.restore(changes)
+        self.assertEqual([meta[0] for _, meta in resumed], ['d', 'e'])
+        self.assertEqual(set(resumed.duplicates), set(['c', 'f']))
+
+    def test_threshold(self):
+        dedup = Deduplicator(self.docs, threshold=0.99)
+        kept = [meta[0] for _, meta in dedup]
+        self.assertEqual(kept, ['a', 'b', 'c', 'd', 'e'])
+
+    def test_signature(self):
+        dedup = Deduplicator(self.docs)
+        a = dedup.signature([1, 2, 3])
+        self.assertEqual(len(a), 128)
+        self.assertTrue((a == dedup.signature([3, 2, 1])).all())
+
+    def test_choose_bands(self):
+        for threshold in [0.5, 0.8, 0.9]:
+            bands = choose_bands(128, threshold)
+            self.assertEqual(128 % bands, 0)
+            self.assertLessEqual((1.0 / bands) ** (bands / 128.0), threshold)
+
+    def test_resolve(self):
+        doc_topic = resolve(dict(a=[(0, 1.0)]), dict(c=('a', 0.9),
+                                                     x=('y', 0.9)))
+        self.assertEqual(doc_topic['c'], [(0, 1.0)])
+        self.assertNotIn('x', doc_topic)
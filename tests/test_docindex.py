@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import os.path
+import shutil
+import tempfile
+
+from nose.tools import *
+import dulwich.repo
+from gensim.corpora import MalletCorpus
+
+from src.corpora import ChangesetCorpus
+from src.docindex import DocumentIndex, CorpusView
+from tests import extract_repo
+
+# datapath is now a useful function for building paths to test files
+module_path = os.path.dirname(__file__)
+datapath = lambda fname: os.path.join(module_path, u'test_data', fname)
+
+
+def setup_module():
+    extract_repo()
+
+
+class TestDocumentIndex(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        repo = dulwich.repo.Repo(datapath(u'multitext_git/'))
+        corpus = ChangesetCorpus(repo, min_len=0, remove_stops=False)
+        corpus.metadata = True
+        self.id2word = corpus.id2word
+        self.fname = os.path.join(self.path, 'corpus.mallet')
+        MalletCorpus.serialize(self.fname, corpus, id2word=self.id2word,
+                               metadata=True)
+        self.expected = list(MalletCorpus(self.fname, id2word=self.id2word,
+                                          metadata=True))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_build(self):
+        index = DocumentIndex.build(self.fname)
+        self.assertEqual(len(index), len(self.expected))
+        self.assertEqual(index.ids, [meta[0] for _, meta in self.expected])
+        self.assertEqual(list(index.tokens),
+                         [sum(c for _, c in doc) for doc, _ in self.expected])
+        self.assertEqual(list(index.offsets), MalletCorpus(self.fname).index)
+
+    def test_serialize(self):
+        fname = os.path.join(self.path, 'serialized.mallet')
+        index = DocumentIndex.serialize(fname, self.expected, self.id2word)
+        built = DocumentIndex.build(fname)
+        self.assertEqual(index.ids, built.ids)
+        self.assertEqual(list(index.offsets), list(built.offsets))
+        self.assertEqual(list(index.tokens), list(built.tokens))
+        self.assertEqual(list(index.offsets), MalletCorpus(fname).index)
+
+    def test_save_load(self):
+        index = DocumentIndex.open(self.fname)
+        self.assertTrue(os.path.exists(self.fname + '.docs'))
+
+        loaded = DocumentIndex.load(self.fname + '.docs')
+        self.assertEqual(loaded.ids, index.ids)
+        self.assertEqual(list(loaded.offsets), list(index.offsets))
+        self.assertEqual(list(loaded.tokens), list(index.tokens))
+
+    def test_view(self):
+        corpus = CorpusView(self.fname, self.id2word)
+        self.assertEqual(len(corpus), len(self.expected))
+        self.assertEqual(list(corpus), [doc for doc, _ in self.expected])
+
+        corpus.metadata = True
+        self.assertEqual(list(corpus), self.expected)
+        self.assertEqual(corpus[1], self.expected[1])
+
+    def test_subset(self):
+        corpus = CorpusView(self.fname, self.id2word)
+        subset = corpus.subset([3, 1])
+        self.assertEqual(len(subset), 2)
+        self.assertEqual(list(subset), [self.expected[3][0],
+                                        self.expected[1][0]])
+
+        inner = subset.subset([1])
+        self.assertEqual(list(inner), [self.expected[1][0]])
+
+    def test_select(self):
+        corpus = CorpusView(self.fname, self.id2word)
+        ids = [self.expected[4][1][0], u'missing', self.expected[2][1][0]]
+        selected = corpus.select(ids)
+        self.assertEqual(selected.ids, ids[2:] + ids[:1])
+        self.assertEqual(list(selected), [self.expected[2][0],
+                                          self.expected[4][0]])
+        self.assertEqual(corpus.index.position(ids[0]), 4)
+        self.assertRaises(KeyError, corpus.index.position, u'missing')
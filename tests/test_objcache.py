@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import os.path
+
+from nose.tools import *
+import dulwich.repo
+from dulwich.objects import Blob
+
+from src.corpora import ChangesetCorpus
+from src.objcache import ObjectCache, cache_objects
+from tests import extract_repo
+
+# datapath is now a useful function for building paths to test files
+module_path = os.path.dirname(__file__)
+datapath = lambda fname: os.path.join(module_path, u'test_data', fname)
+
+
+def setup_module():
+    extract_repo()
+
+
+class TestObjectCache(unittest.TestCase):
+    def setUp(self):
+        self.repo = dulwich.repo.Repo(datapath(u'multitext_git/'))
+        self.tree = self.repo[self.repo.head()].tree
+        self.shas = [entry.sha for entry in
+                     self.repo.object_store.iter_tree_contents(self.tree)]
+
+    def test_same_objects(self):
+        cache = ObjectCache(self.repo.object_store)
+        for sha in self.shas + self.shas:
+            self.assertEqual(cache[sha], self.repo.object_store[sha])
+            self.assertEqual(cache.get_raw(sha),
+                             self.repo.object_store.get_raw(sha))
+
+        self.assertEqual(cache.misses, len(set(self.shas)))
+        self.assertEqual(cache.hits + cache.misses, len(self.shas) * 4)
+
+    def test_size_limit(self):
+        sizes = dict((sha, len(self.repo.object_store.get_raw(sha)[1]))
+                     for sha in self.shas)
+        limit = max(sizes.values()) + 1
+        cache = ObjectCache(self.repo.object_store, max_bytes=limit)
+        for sha in self.shas:
+            cache[sha]
+            self.assertLessEqual(cache.size, limit)
+
+        # only the most recent objects are left
+        self.assertEqual(list(cache.objects)[-1], self.shas[-1])
+        self.assertEqual(cache.size, sum(sizes[sha] for sha in cache.objects))
+        self.assertGreater(cache.evictions, 0)
+
+    def test_large_blobs_not_kept(self):
+        cache = ObjectCache(self.repo.object_store, max_blob_bytes=0)
+        cache[self.tree]
+        for sha in self.shas:
+            self.assertIsInstance(cache[sha], Blob)
+
+        self.assertEqual(list(cache.objects), [self.tree])
+
+    def test_least_recently_used_first(self):
+        first, second = self.shas[:2]
+        cache = ObjectCache(self.repo.object_store)
+        cache[first]
+        cache[second]
+        cache[first]
+        self.assertEqual(list(cache.objects), [second, first])
+
+    def test_history_walk(self):
+        expected = list(ChangesetCorpus(self.repo, lazy_dict=True))
+
+        repo = dulwich.repo.Repo(datapath(u'multitext_git/'))
+        cache = cache_objects(repo, 2 ** 20)
+        self.assertEqual(list(ChangesetCorpus(repo, lazy_dict=True)),
+                         expected)
+        self.assertGreater(cache.hit_rate, 0)
+        self.assertEqual(cache.stats()['objects'], len(cache.objects))
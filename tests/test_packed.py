@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import cPickle as pickle
+import os
+import os.path
+import shutil
+import tempfile
+from multiprocessing import Pool
+
+import numpy
+from nose.tools import *
+import dulwich.repo
+from gensim.corpora import MalletCorpus
+
+from src.corpora import ChangesetCorpus
+from src.packed import PackedCorpus
+from src.sweep import Sweep
+from tests import extract_repo
+
+# datapath is now a useful function for building paths to test files
+module_path = os.path.dirname(__file__)
+datapath = lambda fname: os.path.join(module_path, u'test_data', fname)
+
+
+def setup_module():
+    extract_repo()
+
+
+def documents(corpus):
+    return list(corpus)
+
+
+class TestPackedCorpus(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        repo = dulwich.repo.Repo(datapath(u'multitext_git/'))
+        corpus = ChangesetCorpus(repo, min_len=0, remove_stops=False)
+        corpus.metadata = True
+        self.id2word = corpus.id2word
+        self.fname = os.path.join(self.path, 'corpus.mallet')
+        MalletCorpus.serialize(self.fname, corpus, id2word=self.id2word,
+                               metadata=True)
+        self.expected = list(MalletCorpus(self.fname, id2word=self.id2word))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_pack(self):
+        corpus = PackedCorpus.pack(self.expected)
+        self.assertEqual(len(corpus), len(self.expected))
+        self.assertEqual(list(corpus), self.expected)
+        self.assertEqual(corpus.tokens, sum(count for doc in self.expected
+                                            for _, count in doc))
+
+    def test_open(self):
+        corpus = PackedCorpus.open(self.fname, self.id2word)
+        self.assertIsInstance(corpus.ids, numpy.memmap)
+        self.assertEqual(list(corpus), self.expected)
+
+        mtime = os.path.getmtime(self.fname + '.packed')
+        self.assertEqual(list(PackedCorpus.open(self.fname, self.id2word)),
+                         self.expected)
+        self.assertEqual(os.path.getmtime(self.fname + '.packed'), mtime)
+
+    def test_subset(self):
+        corpus = PackedCorpus.open(self.fname, self.id2word)
+        corpus = corpus.subset([3, 1, 2])
+        self.assertEqual(list(corpus), [self.expected[i] for i in [3, 1, 2]])
+        self.assertEqual(list(corpus.subset([0, 2])),
+                         [self.expected[3], self.expected[2]])
+        self.assertEqual(corpus.tokens, sum(count for i in [1, 2, 3]
+                                            for _, count in self.expected[i]))
+
+    def test_pickled_by_name(self):
+        corpus = PackedCorpus.open(self.fname, self.id2word).subset([0, 1])
+        data = pickle.dumps(corpus, pickle.HIGHEST_PROTOCOL)
+        arrays = pickle.dumps(corpus.ids, pickle.HIGHEST_PROTOCOL)
+        words = pickle.dumps(self.id2word, pickle.HIGHEST_PROTOCOL)
+        self.assertLess(len(data), len(words) + len(arrays))
+
+        attached = pickle.loads(data)
+        self.assertIsInstance(attached.ids, numpy.memmap)
+        self.assertEqual(list(attached), self.expected[:2])
+
+    def test_workers(self):
+        corpus = PackedCorpus.open(self.fname, self.id2word)
+        pool = Pool(2)
+        try:
+            parts = pool.map(documents, [corpus.subset([i]) for i in
+                                         range(len(corpus))])
+        finally:
+            pool.terminate()
+            pool.join()
+
+        self.assertEqual([doc for part in parts for doc in part],
+                         self.expected)
+
+    def test_sweep_split(self):
+        sweep = Sweep([2], ['symmetric'], [1], held_out=0.3)
+        training, held_out = sweep.split(PackedCorpus.open(self.fname,
+                                                           self.id2word))
+        expected = sweep.split(self.expected)
+        self.assertEqual(list(training), expected[0])
+        self.assertEqual(list(held_out), expected[1])
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import os.path
+
+from nose.tools import *
+import dulwich.repo
+import dulwich.diff_tree
+from dulwich.object_store import tree_lookup_path
+
+from src.paths import PathFilter
+from tests import extract_repo
+
+# datapath is now a useful function for building paths to test files
+module_path = os.path.dirname(__file__)
+datapath = lambda fname: os.path.join(module_path, u'test_data', fname)
+
+
+def setup_module():
+    extract_repo()
+
+
+class CountingStore(object):
+    """ Records the objects looked up in `store`. """
+
+    def __init__(self, store):
+        self.store = store
+        self.read = list()
+
+    def __getitem__(self, sha):
+        self.read.append(sha)
+        return self.store[sha]
+
+
+class TestPathFilter(unittest.TestCase):
+    def setUp(self):
+        self.repo = dulwich.repo.Repo(datapath(u'multitext_git/'))
+        self.tree = self.repo[self.repo.head()].tree
+        self.store = CountingStore(self.repo.object_store)
+
+    def paths(self, paths):
+        return [entry.path for entry in
+                paths.iter_tree_contents(self.store, self.tree)]
+
+    def subtree(self, path):
+        return tree_lookup_path(self.repo.get_object, self.tree, path)[1]
+
+    def test_patterns(self):
+        paths = PathFilter(exclude=['e', '*.md', '/c/f/'])
+        self.assertFalse(paths.selects('c/e/5.txt'))
+        self.assertFalse(paths.selects('e'))
+        self.assertFalse(paths.selects('docs/README.md'))
+        self.assertFalse(paths.selects('c/f/6.txt'))
+        self.assertTrue(paths.selects('a/f/6.txt'))
+        self.assertTrue(paths.selects('c/fe/6.txt'))
+
+        paths = PathFilter(include=['/c/e', '*.java'])
+        self.assertTrue(paths.selects('c/e/5.txt'))
+        self.assertTrue(paths.selects('src/Main.java'))
+        self.assertFalse(paths.selects('c/f/6.txt'))
+
+        # any directory may hold a .java file
+        self.assertTrue(paths.enters('c/f'))
+        paths = PathFilter(include=['/c/e'])
+        self.assertTrue(paths.enters('c'))
+        self.assertTrue(paths.enters('c/e/g'))
+        self.assertFalse(paths.enters('c/f'))
+        self.assertFalse(paths.enters('b'))
+
+    def test_unscoped(self):
+        paths = PathFilter()
+        self.assertFalse(paths)
+        self.assertEqual(self.paths(paths), [
+            entry.path for entry in
+            self.repo.object_store.iter_tree_contents(self.tree)])
+
+        for walk_entry in self.repo.get_walker():
+            commit = walk_entry.commit
+            for parent in commit.parents or [None]:
+                parent_tree = parent and self.repo[parent].tree
+                self.assertEqual(
+                    list(paths.tree_changes(self.store, parent_tree,
+                                            commit.tree)),
+                    list(dulwich.diff_tree.tree_changes(
+                        self.repo.object_store, parent_tree, commit.tree)))
+
+    def test_exclude_prunes(self):
+        paths = PathFilter(exclude=['c'])
+        self.assertEqual(self.paths(paths),
+                         ['7.txt', 'a/0.txt', 'a/1.txt', 'b/2.txt',
+                          'b/3.txt', 'dos.txt', 'mac.txt', 'unix.txt'])
+        self.assertNotIn(self.subtree('c'), self.store.read)
+
+    def test_include_prunes(self):
+        paths = PathFilter(include=['/a', '/c/e'])
+        self.assertEqual(self.paths(paths),
+                         ['a/0.txt', 'a/1.txt', 'c/e/5.txt'])
+        for path in ['b', 'c/f']:
+            self.assertNotIn(self.subtree(path), self.store.read)
+
+    def test_changes(self):
+        paths = PathFilter(exclude=['c', '*.txt'], include=['a', 'c'])
+        head = self.repo[self.repo.head()]
+        parent = head.parents[0]
+        changes = dulwich.diff_tree.tree_changes(
+            self.repo.object_store, None, head.tree)
+        self.assertEqual(list(paths.tree_changes(self.store, None,
+                                                 head.tree)), [])
+        self.assertEqual(paths.select_changes(changes), [])
+
+        paths = PathFilter(include=['a', 'c/*'])
+        for parent_tree in [None, self.repo[parent].tree]:
+            changes = list(dulwich.diff_tree.tree_changes(
+                self.repo.object_store, parent_tree, head.tree))
+            self.assertEqual(list(paths.tree_changes(self.store, parent_tree,
+                                                     head.tree)),
+                             paths.select_changes(changes))
+
+    def test_key(self):
+        self.assertEqual(PathFilter(['a', 'b'], ['c']).key,
+                         PathFilter(['b', 'a'], ['c']).key)
+        self.assertNotEqual(PathFilter(['a']).key,
+                            PathFilter(exclude=['a']).key)
+
+        # patterns from the command line are unicode, from projects.csv str
+        self.assertEqual(
+            PathFilter(exclude=[u'vendor', u'd\xe9j\xe0']).key,
+            PathFilter(exclude=['vendor', 'd\xc3\xa9j\xc3\xa0']).key)
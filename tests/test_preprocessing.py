@@ -18,8 +18,9 @@ import random
 from io import StringIO
 
 from nose.tools import *
+from gensim.corpora import Dictionary
 
-from src.preprocessing import split, remove_stops
+from src.preprocessing import split, remove_stops, to_unicode
 from src.corpora import GitCorpus
 
 # datapath is now a useful function for building paths to test files
@@ -231,3 +232,28 @@ class PreprocessTests(unittest.TestCase):
         expected = sum(list(map(list, cases.values())), [])
         result = c.preprocess(' '.join(terms))
         self.assertEqual(list(result), expected)
+
+    def test_to_unicode(self):
+        self.assertEqual(to_unicode('\x00word\x1cthing '), 'word thing')
+        self.assertIsInstance(to_unicode('word'), str)
+        self.assertEqual(to_unicode(u'Schrödinger'.encode('utf8')),
+                         u'Schrödinger')
+        self.assertEqual(to_unicode(u'Schrödinger'.encode('latin1')),
+                         u'Schrödinger')
+
+    def test_intern(self):
+        texts = [['word', u'schrödinger', 'thing', 'word'],
+                 ['thing', 'other']]
+        c = GitCorpus(lazy_dict=True)
+        bows = [c.bow(c.intern(text)) for text in texts]
+
+        d = Dictionary()
+        self.assertEqual(bows, [d.doc2bow(text, allow_update=True)
+                                for text in texts])
+        self.assertEqual(c.id2word.token2id, d.token2id)
+        self.assertEqual(c.id2word.dfs, d.dfs)
+        self.assertEqual(c.id2word.num_pos, d.num_pos)
+
+        c.lazy_dict = False
+        self.assertEqual(list(c.intern(['other', 'unseen'])),
+                         [d.token2id['other']])
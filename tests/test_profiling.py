@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import json
+import os
+import shutil
+import tempfile
+
+from nose.tools import *
+
+from src.profiling import Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmpdir, 'metrics.json')
+        self.corpus = [[(0, 2), (1, 1)], [(1, 3)], []]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_disabled(self):
+        profiler = Profiler(fname=self.fname)
+        with profiler.stage('create_corpus', 'ChangesetCorpus') as stage:
+            self.assertIs(profiler.count(self.corpus, stage), self.corpus)
+
+        profiler.save()
+        self.assertEqual(profiler.stages, [])
+        self.assertFalse(os.path.exists(self.fname))
+
+    def test_counts(self):
+        profiler = Profiler(enabled=True, fname=self.fname)
+        with profiler.stage('create_corpus', 'ChangesetCorpus') as stage:
+            counted = profiler.count(self.corpus, stage, commits=True)
+            self.assertEqual(len(counted), 3)
+            self.assertEqual(list(counted), self.corpus)
+
+        self.assertEqual(stage.documents, 3)
+        self.assertEqual(stage.tokens, 6)
+        self.assertEqual(stage.commits, 3)
+        self.assertGreaterEqual(stage.wall, 0.0)
+        self.assertGreater(stage.peak_rss, 0)
+
+    def test_metadata_counts(self):
+        profiler = Profiler(enabled=True)
+        corpus = [(doc, (str(i), u'en')) for i, doc in enumerate(self.corpus)]
+        with profiler.stage('create_corpus', 'MultiTextCorpus') as stage:
+            list(profiler.count(corpus, stage, metadata=True))
+
+        self.assertEqual(stage.documents, 3)
+        self.assertEqual(stage.tokens, 6)
+        self.assertEqual(stage.commits, 0)
+
+    def test_save(self):
+        profiler = Profiler(enabled=True, fname=self.fname,
+                            profile_stage='create_model',
+                            info=dict(project='test'))
+        with profiler.stage('create_corpus', 'ChangesetCorpus'):
+            pass
+        with profiler.stage('create_model', 'ChangesetCorpus'):
+            pass
+
+        profiler.save()
+        with open(self.fname) as f:
+            metrics = json.load(f)
+
+        self.assertEqual(metrics['project'], 'test')
+        self.assertEqual([s['stage'] for s in metrics['stages']],
+                         ['create_corpus', 'create_model'])
+        self.assertTrue(os.path.exists(
+            self.fname + '.create_model-ChangesetCorpus.prof'))
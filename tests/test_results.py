@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import json
+import os.path
+import shutil
+import sqlite3
+import tempfile
+from multiprocessing import Pool
+
+from nose.tools import *
+
+from src.results import ResultStore, SCHEMA
+
+
+def record_many(args):
+    fname, worker = args
+    store = ResultStore(fname, project='p', commit='c')
+    for i in range(20):
+        store.record('ChangesetCorpus', 'metric', worker, num_topics=i)
+
+    return store.run
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.fname = os.path.join(self.path, 'results.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_summarize(self):
+        for value in [1.0, 3.0]:
+            store = ResultStore(self.fname, project='p', commit='c')
+            store.record('ChangesetCorpus', 'entropy', value, num_topics=10,
+                         alpha='symmetric', passes=2, detail=[value])
+            store.record('CommitLogCorpus', 'entropy', value * 10,
+                         num_topics=10, alpha='symmetric', passes=2)
+            store.close()
+
+        store = ResultStore(self.fname, project='q', commit='d')
+        store.record('ChangesetCorpus', 'entropy', 5.0, num_topics=10)
+
+        summaries = store.summarize(project='p', kind='ChangesetCorpus')
+        self.assertEqual(len(summaries), 1)
+        summary = summaries[0]
+        self.assertEqual((summary.commit, summary.num_topics, summary.alpha,
+                          summary.passes), ('c', 10, 'symmetric', 2))
+        self.assertEqual(summary.runs, 2)
+        self.assertEqual((summary.mean, summary.min, summary.max,
+                          summary.last), (2.0, 1.0, 3.0, 3.0))
+
+        self.assertEqual(len(store.summarize(metric='entropy')), 3)
+        self.assertEqual(len(store.summarize(commit='d')), 1)
+        self.assertRaises(ValueError, store.summarize, value=1.0)
+
+        detail = store.connection.execute(
+            'SELECT detail FROM results WHERE detail IS NOT NULL').fetchall()
+        self.assertEqual([json.loads(d) for d, in detail], [[1.0], [3.0]])
+
+    def test_no_run_without_results(self):
+        store = ResultStore(self.fname, project='p', commit='c')
+        self.assertEqual(store.summarize(), [])
+        self.assertEqual(store.connection.execute(
+            'SELECT COUNT(*) FROM runs').fetchone()[0], 0)
+
+    def test_concurrent_writers(self):
+        pool = Pool(4)
+        try:
+            runs = pool.map(record_many, [(self.fname, w) for w in range(8)])
+        finally:
+            pool.terminate()
+            pool.join()
+
+        store = ResultStore(self.fname)
+        self.assertEqual(len(set(runs)), 8)
+        self.assertEqual(store.connection.execute(
+            'SELECT COUNT(*) FROM results').fetchone()[0], 160)
+        self.assertEqual(len(store.summarize()), 20)
+
+    def test_scope(self):
+        for scope in [None, 'd9d145ac']:
+            store = ResultStore(self.fname, project='p', commit='c',
+                                scope=scope)
+            store.record('ChangesetCorpus', 'entropy', 1.0, num_topics=10)
+            store.close()
+
+        summaries = store.summarize()
+        self.assertEqual([s.scope for s in summaries], [None, 'd9d145ac'])
+        self.assertEqual(len(store.summarize(scope='d9d145ac')), 1)
+
+    def test_tolerance(self):
+        store = ResultStore(self.fname, project='p', commit='c')
+        for tolerance, passes in [(None, 30), (0.02, 9)]:
+            store.record('ChangesetCorpus', 'converged_passes', passes,
+                         passes=30, tolerance=tolerance)
+
+        summaries = store.summarize()
+        self.assertEqual([(s.tolerance, s.mean) for s in summaries],
+                         [(None, 30.0), (0.02, 9.0)])
+
+    def test_migrate(self):
+        # a database from before results had a scope or tolerance
+        connection = sqlite3.connect(self.fname)
+        connection.executescript(SCHEMA.replace('    scope TEXT,\n', '')
+                                 .replace('    tolerance REAL,\n', '') +
+                                 '; CREATE INDEX results_key ON results '
+                                 '(project, commit_, kind, num_topics, '
+                                 'alpha, passes, metric);')
+        connection.close()
+
+        store = ResultStore(self.fname, project='p', commit='c', scope='x')
+        store.record('ChangesetCorpus', 'entropy', 1.0)
+        self.assertEqual(store.summarize()[0].scope, 'x')
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import json
+import os.path
+import threading
+import urllib2
+
+from nose.tools import *
+import dulwich.repo
+from gensim.models import LdaModel
+
+from src.corpora import ChangesetCorpus
+from src.server import Batcher, TopicService, TopicServer
+from tests import extract_repo
+
+# datapath is now a useful function for building paths to test files
+module_path = os.path.dirname(__file__)
+datapath = lambda fname: os.path.join(module_path, u'test_data', fname)
+
+
+def setup_module():
+    extract_repo()
+
+
+class BrokenModel(object):
+    def inference(self, chunk):
+        raise RuntimeError('inference failed')
+
+
+class TestTopicServer(unittest.TestCase):
+    def setUp(self):
+        self.repo = dulwich.repo.Repo(datapath(u'multitext_git/'))
+        self.corpus = ChangesetCorpus(self.repo, min_len=0,
+                                      remove_stops=False)
+        self.model = LdaModel(list(self.corpus), id2word=self.corpus.id2word,
+                              num_topics=3, passes=2)
+        self.service = TopicService(self.model, self.corpus, top_words=3,
+                                    eps=0.0, max_wait=0.05)
+        self.server = TopicServer(('127.0.0.1', 0), self.service)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def post(self, body):
+        request = urllib2.Request(self.url + '/topics', json.dumps(body),
+                                  {'Content-Type': 'application/json'})
+        return json.loads(urllib2.urlopen(request).read())
+
+    def test_text(self):
+        response = self.post(dict(text=u'graph minors survey'))
+        self.assertEqual(len(response['topics']), 3)
+        self.assertAlmostEqual(sum(p for _, p in response['topics']), 1.0,
+                               places=4)
+        for topicid, _ in response['topics']:
+            self.assertEqual(len(response['words'][str(topicid)]), 3)
+
+    def test_commit(self):
+        commit = u'2aeb2e7c78259833e1218b69f99dab3acd00970c'
+        by_commit = self.post(dict(commit=commit))
+        by_text = self.post(dict(text=u' '.join(
+            self.corpus.commit_words(str(commit)))))
+        self.assertEqual([t for t, _ in by_commit['topics']],
+                         [t for t, _ in by_text['topics']])
+
+    def test_diff(self):
+        diff = '--- a/x.txt\n+++ b/x.txt\n@@ -1 +1 @@\n-graph\n+minors\n'
+        by_diff = self.post(dict(diff=diff))
+        by_text = self.post(dict(text=u'graph minors'))
+        self.assertEqual([t for t, _ in by_diff['topics']],
+                         [t for t, _ in by_text['topics']])
+
+    def test_bad_request(self):
+        with self.assertRaises(urllib2.HTTPError) as cm:
+            self.post(dict(nothing=True))
+        self.assertEqual(cm.exception.code, 400)
+
+    def test_server_error(self):
+        self.service.batcher.model = BrokenModel()
+        with self.assertRaises(urllib2.HTTPError) as cm:
+            self.post(dict(text=u'graph minors'))
+        self.assertEqual(cm.exception.code, 500)
+        self.assertIn('inference failed', json.loads(cm.exception.read())[
+            'error'])
+
+    def test_health(self):
+        response = json.loads(urllib2.urlopen(self.url + '/health').read())
+        self.assertEqual(response, dict(status='ok'))
+
+    def test_micro_batching(self):
+        # everything is queued before batching starts, so the batches do
+        # not depend on thread timing
+        batcher = Batcher(self.model, batch_size=4, max_wait=60, start=False)
+        bow = self.model.id2word.doc2bow([u'graph', u'trees'])
+        requests = [batcher.submit(bow) for _ in range(8)]
+        batcher.start()
+
+        thetas = [batcher.wait(request) for request in requests]
+        self.assertEqual(batcher.batches, 2)
+        for theta in thetas:
+            self.assertAlmostEqual(theta.sum(), 1.0, places=4)
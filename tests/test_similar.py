@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import shutil
+import tempfile
+
+import numpy
+from nose.tools import *
+
+from src import utils
+from src.similar import SimilarityIndex
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.RandomState(1)
+        self.theta = rng.dirichlet([0.1] * 20, 500)
+        self.ids = [u'%040x' % i for i in range(500)]
+        self.index = SimilarityIndex(self.ids, self.theta, bits=64,
+                                     block_size=64)
+
+    def brute_force(self, vector, k, fn):
+        distances = [(id_, fn(vector, row, filter_by=0.0))
+                     for id_, row in zip(self.ids, self.theta)]
+        return sorted(distances, key=lambda x: x[1])[:k]
+
+    def assertSameResults(self, results, expected):
+        self.assertEqual([r[0] for r in results], [e[0] for e in expected])
+        for (_, a), (_, b) in zip(results, expected):
+            self.assertAlmostEqual(a, b, places=4)
+
+    def test_hellinger(self):
+        vector = self.theta[42]
+        expected = self.brute_force(vector, 10, utils.hellinger_distance)
+        self.assertSameResults(self.index.query(vector, k=10), expected)
+
+    def test_cosine(self):
+        vector = self.theta[7]
+        expected = self.brute_force(vector, 5, utils.cosine_distance)
+        self.assertSameResults(self.index.query(vector, k=5,
+                                                metric='cosine'), expected)
+
+    def test_exclude(self):
+        results = self.index.query(self.index.vector(self.ids[3]), k=3,
+                                   exclude=self.ids[3])
+        self.assertEqual(len(results), 3)
+        self.assertNotIn(self.ids[3], [r[0] for r in results])
+
+    def test_approximate(self):
+        results = self.index.query(self.theta[9], k=1, approximate=True)
+        self.assertEqual(results[0][0], self.ids[9])
+        self.assertAlmostEqual(results[0][1], 0.0, places=3)
+
+    def test_save_load(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            self.index.save(tmpdir + '/index')
+            index = SimilarityIndex.load(tmpdir + '/index')
+            self.assertEqual(index.ids, self.ids)
+            for matrix in index.matrices.values() + [index.codes]:
+                self.assertIsInstance(matrix, numpy.memmap)
+
+            self.assertEqual(index.query(self.theta[1], k=5),
+                             self.index.query(self.theta[1], k=5))
+            self.assertEqual(index.query(self.theta[1], approximate=True),
+                             self.index.query(self.theta[1],
+                                              approximate=True))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_bad_metric(self):
+        self.assertRaises(ValueError, self.index.query, self.theta[0],
+                          metric='euclidean')
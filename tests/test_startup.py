@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import os.path
+import subprocess
+import sys
+
+from nose.tools import *
+
+module_path = os.path.dirname(__file__)
+
+HEAVY = ['numpy', 'scipy', 'gensim', 'dulwich']
+
+
+class TestStartup(unittest.TestCase):
+    def run_fresh(self, code):
+        """ Run `code` in a new interpreter from outside the repository. """
+        root = os.path.abspath(os.path.join(module_path, os.pardir))
+        return subprocess.check_output(
+            [sys.executable, '-c',
+             'import sys; sys.path.insert(0, %r); %s' % (root, code)],
+            cwd=os.path.dirname(root))
+
+    def test_no_heavy_imports(self):
+        loaded = self.run_fresh(
+            'import src.main; '
+            'print(sorted(set(m.split(".")[0] for m in sys.modules) & '
+            'set(%r)))' % HEAVY)
+        self.assertEqual(loaded.strip(), '[]')
+
+    def test_stops_found_from_anywhere(self):
+        stops = self.run_fresh(
+            'from src.preprocessing import get_stops; '
+            'print("while" in get_stops() and "the" in get_stops())')
+        self.assertEqual(stops.strip(), 'True')
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import json
+import os.path
+from collections import Counter
+
+from nose.tools import *
+import dulwich.repo
+
+from src.corpora import ChangesetCorpus
+from src.stats import CorpusStats
+from tests import extract_repo
+
+# datapath is now a useful function for building paths to test files
+module_path = os.path.dirname(__file__)
+datapath = lambda fname: os.path.join(module_path, u'test_data', fname)
+
+
+def setup_module():
+    extract_repo()
+
+
+class TestCorpusStats(unittest.TestCase):
+    def setUp(self):
+        repo = dulwich.repo.Repo(datapath(u'multitext_git/'))
+        corpus = ChangesetCorpus(repo, min_len=0, remove_stops=False)
+        self.id2word = corpus.id2word
+        self.docs = list(corpus) + [[]]
+        self.stats = CorpusStats.of(self.docs, len(self.id2word))
+
+    def test_frequencies(self):
+        cf = Counter()
+        df = Counter()
+        for doc in self.docs:
+            for id_, count in doc:
+                cf[id_] += count
+                df[id_] += 1
+
+        self.assertEqual(self.stats.documents, len(self.docs))
+        self.assertEqual(self.stats.tokens, sum(cf.values()))
+        self.assertEqual(self.stats.vocabulary, len(cf))
+        self.assertEqual(dict((i, c) for i, c in enumerate(self.stats.cf)
+                              if c), dict(cf))
+        self.assertEqual(dict((i, c) for i, c in enumerate(self.stats.df)
+                              if c), dict(df))
+        self.assertEqual([cf[i] for i in self.stats.top(5)],
+                         sorted(cf.values(), reverse=True)[:5])
+        self.assertEqual([cf[i] for i in self.stats.bottom(5)],
+                         sorted(cf.values())[:5])
+
+    def test_lengths(self):
+        lengths = sorted(sum(count for _, count in doc) for doc in self.docs)
+        self.assertEqual(self.stats.median_length(),
+                         lengths[(len(lengths) - 1) // 2])
+
+        histogram = self.stats.histogram()
+        self.assertEqual(sum(b['documents'] for b in histogram),
+                         len(self.docs))
+        self.assertEqual(histogram[0], dict(min=0, max=0, documents=1))
+        for b in histogram:
+            self.assertEqual(b['documents'],
+                             len([n for n in lengths
+                                  if b['min'] <= n <= b['max']]))
+
+    def test_zipf(self):
+        stats = CorpusStats(4)
+        stats.add([(0, 120), (1, 60), (2, 40), (3, 30)])
+        zipf = stats.zipf()
+        self.assertAlmostEqual(zipf['exponent'], 1.0)
+        self.assertAlmostEqual(zipf['top'], 120.0)
+        self.assertAlmostEqual(zipf['r_squared'], 1.0)
+
+        self.assertIsNone(CorpusStats(1).zipf())
+
+    def test_report(self):
+        report = json.loads(json.dumps(self.stats.report(self.id2word, 3)))
+        self.assertEqual(len(report['top']), 3)
+        word, cf, df = report['top'][0]
+        self.assertEqual(cf, self.stats.cf.max())
+        self.assertEqual(report['document_frequency'][word], df)
+        self.assertEqual(len(report['document_frequency']),
+                         report['vocabulary'])
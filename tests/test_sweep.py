@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import os.path
+import shutil
+import tempfile
+
+from nose.tools import *
+from gensim.corpora import Dictionary
+from gensim.models import LdaModel
+
+from src.sweep import Sweep
+from src.utils import parse_alpha
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        texts = [[u'human', u'interface', u'computer'],
+                 [u'survey', u'user', u'computer', u'system', u'response'],
+                 [u'eps', u'user', u'interface', u'system'],
+                 [u'system', u'human', u'system', u'eps'],
+                 [u'user', u'response', u'time'],
+                 [u'trees'],
+                 [u'graph', u'trees'],
+                 [u'graph', u'minors', u'trees'],
+                 [u'graph', u'minors', u'survey']] * 3
+        self.id2word = Dictionary(texts)
+        self.corpus = [self.id2word.doc2bow(text) for text in texts]
+
+    def test_grid(self):
+        sweep = Sweep([2, 3], ['symmetric', 0.5], [2, 1], held_out=0.2)
+        results = list(sweep.run(self.corpus, self.id2word))
+
+        self.assertEqual(len(sweep), 8)
+        self.assertEqual(len(results), 8)
+        self.assertEqual(set((r.num_topics, r.alpha, r.passes)
+                             for r in results),
+                         set([(k, a, p) for k in [2, 3]
+                              for a in ['symmetric', 0.5] for p in [1, 2]]))
+        for result in results:
+            if result.passes == 1:
+                self.assertIsNone(result.warm_start)
+            else:
+                self.assertEqual(result.warm_start, 1)
+
+            self.assertGreater(result.perplexity, 1.0)
+            self.assertGreater(result.distinctiveness, 0.0)
+
+    def test_split(self):
+        training, held_out = Sweep([2], [0.1], [1], held_out=0.2).split(
+            self.corpus)
+        self.assertEqual(len(held_out), 5)
+        self.assertEqual(len(training) + len(held_out), len(self.corpus))
+
+    def test_workers(self):
+        sequential = Sweep([2, 3], ['symmetric'], [1, 2], seed=7)
+        parallel = Sweep([2, 3], ['symmetric'], [1, 2], seed=7, workers=2)
+
+        key = lambda r: (r.num_topics, r.passes)
+        expected = sorted(sequential.run(self.corpus, self.id2word), key=key)
+        results = sorted(parallel.run(self.corpus, self.id2word), key=key)
+        for a, b in zip(expected, results):
+            self.assertEqual(key(a), key(b))
+            self.assertAlmostEqual(a.bound, b.bound, places=6)
+
+    def test_save(self):
+        path = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(path, '%(num_topics)dtopics-%(passes)d.lda')
+            list(Sweep([2], ['symmetric'], [1, 3], fname=fname).run(
+                self.corpus, self.id2word))
+            model = LdaModel.load(os.path.join(path, '2topics-3.lda'))
+            self.assertEqual(model.num_topics, 2)
+            self.assertTrue(os.path.exists(os.path.join(path,
+                                                        '2topics-1.lda')))
+        finally:
+            shutil.rmtree(path)
+
+    def test_parse_alpha(self):
+        self.assertEqual(parse_alpha('0.5'), 0.5)
+        self.assertEqual(parse_alpha('auto'), 'auto')
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import shutil
+import tempfile
+
+from nose.tools import *
+
+from src.synthetic import generate, Vocabulary
+from src.corpora import MultiTextCorpus, ChangesetCorpus, CommitLogCorpus
+
+
+class TestSynthetic(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.repo = generate(self.tmpdir + '/repo', commits=40, files=15,
+                             merge_ratio=0.2, rename_ratio=0.2,
+                             max_lines=30, batch_size=100)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_history(self):
+        commits = [entry.commit for entry in self.repo.get_walker()]
+        self.assertEqual(len(commits), 40)
+        self.assertEqual(len([c for c in commits if not c.parents]), 1)
+        self.assertGreater(len([c for c in commits if len(c.parents) == 2]),
+                           0)
+
+    def test_snapshot(self):
+        head = self.repo[self.repo.head()]
+        entries = list(self.repo.object_store.iter_tree_contents(head.tree))
+        self.assertGreater(len(entries), 1)
+        self.assertLessEqual(len(entries), 15)
+        for entry in entries:
+            self.assertTrue(entry.path.endswith('.java'))
+
+    def test_deterministic(self):
+        again = generate(self.tmpdir + '/again', commits=40, files=15,
+                         merge_ratio=0.2, rename_ratio=0.2, max_lines=30)
+        self.assertEqual(again.head(), self.repo.head())
+
+    def test_corpora(self):
+        for Kind, length in [(ChangesetCorpus, 40), (CommitLogCorpus, 40)]:
+            corpus = Kind(self.repo)
+            self.assertEqual(len(list(corpus)), length)
+            self.assertEqual(len(corpus), length)
+
+        corpus = MultiTextCorpus(self.repo)
+        self.assertGreater(len(list(corpus)), 1)
+
+    def test_vocabulary(self):
+        vocabulary = Vocabulary(50)
+        self.assertEqual(len(vocabulary.words), 50)
+        for _ in range(100):
+            self.assertIn(vocabulary.identifier(), vocabulary.words)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import os
+import os.path
+import shutil
+import tempfile
+from collections import OrderedDict
+
+import numpy
+from nose.tools import *
+import dulwich.repo
+from gensim.corpora import MalletCorpus
+
+from src.corpora import MultiTextCorpus, ChangesetCorpus, CommitLogCorpus
+from src.vocab import count_terms, load_terms, Vocabulary
+from tests import extract_repo
+
+# datapath is now a useful function for building paths to test files
+module_path = os.path.dirname(__file__)
+datapath = lambda fname: os.path.join(module_path, u'test_data', fname)
+
+
+def setup_module():
+    extract_repo()
+
+
+class TestVocabulary(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        repo = dulwich.repo.Repo(datapath(u'multitext_git/'))
+        self.fnames = OrderedDict()
+        self.words = dict()
+        for Kind in [MultiTextCorpus, ChangesetCorpus, CommitLogCorpus]:
+            corpus = Kind(repo, min_len=0, remove_stops=False)
+            corpus.metadata = True
+            fname = os.path.join(self.path, Kind.__name__ + '.mallet')
+            MalletCorpus.serialize(fname, corpus, id2word=corpus.id2word,
+                                   metadata=True)
+            self.fnames[Kind.__name__] = fname
+            self.words[Kind.__name__] = set(
+                word.encode('utf-8') for word in corpus.id2word.values())
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_count_terms(self):
+        terms, counts = count_terms(self.fnames['ChangesetCorpus'])
+        self.assertEqual(list(terms), sorted(self.words['ChangesetCorpus']))
+        corpus = MalletCorpus(self.fnames['ChangesetCorpus'])
+        self.assertEqual(counts.sum(),
+                         sum(count for doc in corpus for _, count in doc))
+
+    def test_table_kept(self):
+        fname = self.fnames['MultiTextCorpus']
+        terms, counts = load_terms(fname)
+        self.assertTrue(os.path.exists(fname + '.tf.npz'))
+
+        kept_terms, kept_counts = load_terms(fname)
+        numpy.testing.assert_array_equal(kept_terms, terms)
+        numpy.testing.assert_array_equal(kept_counts, counts)
+
+    def test_overlap(self):
+        vocabulary = Vocabulary.from_corpora(self.fnames)
+        labels = list(self.fnames)
+        self.assertEqual(vocabulary.labels, labels)
+        self.assertEqual(len(vocabulary),
+                         len(set.union(*self.words.values())))
+
+        overlap = vocabulary.overlap()
+        for i, first in enumerate(labels):
+            for j, second in enumerate(labels):
+                self.assertEqual(overlap[i, j],
+                                 len(self.words[first] & self.words[second]))
+
+        jaccard = vocabulary.jaccard(overlap)
+        numpy.testing.assert_allclose(numpy.diag(jaccard), 1.0)
+        numpy.testing.assert_allclose(jaccard, jaccard.T)
+
+        others = self.words['MultiTextCorpus'] | self.words['CommitLogCorpus']
+        self.assertEqual(set(vocabulary.unique('ChangesetCorpus')),
+                         self.words['ChangesetCorpus'] - others)
+
+    def test_workers(self):
+        single = Vocabulary.from_corpora(self.fnames)
+        for fname in self.fnames.values():
+            os.remove(fname + '.tf.npz')
+
+        pooled = Vocabulary.from_corpora(self.fnames, workers=3)
+        numpy.testing.assert_array_equal(pooled.terms, single.terms)
+        numpy.testing.assert_array_equal(pooled.counts, single.counts)
+        numpy.testing.assert_array_equal(pooled.overlap(), single.overlap())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# [The "New BSD" license]
+# Copyright (c) 2014 The Board of Trustees of The University of Alabama
+# All rights reserved.
+#
+# See LICENSE for details.
+
+if __name__ == '__main__':
+    import nose
+    nose.main()
+
+import unittest
+import os
+import os.path
+import shutil
+import tempfile
+
+from nose.tools import *
+import dulwich.repo
+from gensim.corpora import MalletCorpus
+
+from src.corpora import ChangesetCorpus
+from src.docindex import CorpusView
+from src.windows import DAY, assign, build, WindowModels
+from tests import extract_repo
+
+# datapath is now a useful function for building paths to test files
+module_path = os.path.dirname(__file__)
+datapath = lambda fname: os.path.join(module_path, u'test_data', fname)
+
+
+def setup_module():
+    extract_repo()
+
+
+class TestAssign(unittest.TestCase):
+    def setUp(self):
+        self.times = [('c', 3 * DAY), ('a', 0), ('b', DAY), ('d', 9 * DAY)]
+
+    def test_days(self):
+        windows = assign(self.times, days=2)
+        self.assertEqual([[id_ for id_, _ in w] for w in windows],
+                         [['a', 'b'], ['c'], ['d']])
+
+    def test_commits(self):
+        windows = assign(self.times, commits=3)
+        self.assertEqual([[id_ for id_, _ in w] for w in windows],
+                         [['a', 'b', 'c'], ['d']])
+
+    def test_longer_history_keeps_windows(self):
+        longer = assign(self.times + [('e', 10 * DAY)], commits=3)
+        self.assertEqual(longer[0], assign(self.times, commits=3)[0])
+
+    def test_days_or_commits(self):
+        self.assertRaises(ValueError, assign, self.times)
+        self.assertRaises(ValueError, assign, self.times, days=1, commits=1)
+
+
+class TestWindows(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.repo = dulwich.repo.Repo(datapath(u'multitext_git/'))
+        corpus = ChangesetCorpus(self.repo, min_len=0, remove_stops=False)
+        corpus.metadata = True
+        self.id2word = corpus.id2word
+        self.fname = os.path.join(self.path, 'corpus.mallet')
+        MalletCorpus.serialize(self.fname, corpus, id2word=self.id2word,
+                               metadata=True)
+        self.expected = dict((meta[0], doc) for doc, meta in
+                             MalletCorpus(self.fname, id2word=self.id2word,
+                                          metadata=True))
+        self.corpus = CorpusView(self.fname, self.id2word)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def commit_time(self, id_):
+        return self.repo[str(id_)].commit_time
+
+    def test_build(self):
+        windows = build(self.corpus.index, self.commit_time, commits=2)
+        ids = [id_ for window in windows for id_ in window.ids]
+        self.assertEqual(sorted(ids), sorted(self.expected))
+        self.assertEqual(len(set(w.key for w in windows)), len(windows))
+
+        for window in windows:
+            docs = list(self.corpus.subset(window.positions))
+            self.assertEqual(docs, [self.expected[id_] for id_ in window.ids])
+            self.assertLessEqual(window.start, window.end)
+
+    def test_train_only_missing(self):
+        windows = build(self.corpus.index, self.commit_time, commits=2)
+        model_fname = os.path.join(self.path, 'window-%s.lda')
+        models = WindowModels(self.corpus, model_fname,
+                              num_topics=2, alpha='symmetric', passes=1)
+
+        fnames = models.train(windows[:-1])
+        self.assertTrue(all(os.path.exists(f) for f in fnames))
+        mtimes = [os.path.getmtime(f) for f in fnames]
+
+        fnames = models.train(windows)
+        self.assertTrue(os.path.exists(fnames[-1]))
+        self.assertEqual([os.path.getmtime(f) for f in fnames[:-1]], mtimes)